@@ -1,9 +1,9 @@
 from openai import OpenAI
 import os
 import requests
-import json
 from dotenv import load_dotenv
 import wikipedia
+from tool_runner import OpenAIToolRunner
 
 load_dotenv()
 # APIキーの設定
@@ -116,68 +116,34 @@ tools = [
     }
 ]
 
-def process_query(question: str):
-    """ユーザーの質問を処理して回答を生成"""
-    input_messages = [{"role": "user", "content": question}]
-
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=input_messages,
-        tools=tools,
-    )
-
-    message = response.choices[0].message
-
-    if message.tool_calls:
-        tool_call = message.tool_calls[0]
-        function_name = tool_call.function.name
-        function_args = json.loads(tool_call.function.arguments)
-
-        if function_name == "get_weather":
-            weather_data = get_weather(function_args["city"])
-            
-            if "error" in weather_data:
-                return f"申し訳ありません。天気情報の取得に失敗しました: {weather_data['error']}"
-            
-            weather_info = {
-                "city": function_args["city"],
-                "temperature": weather_data["main"]["temp"],
-                "description": weather_data["weather"][0]["description"],
-                "humidity": weather_data["main"]["humidity"],
-                "wind_speed": weather_data["wind"]["speed"]
-            }
+def summarize_weather(city: str) -> dict:
+    """天気情報から回答に必要な項目だけを取り出す"""
+    weather_data = get_weather(city)
+    if "error" in weather_data:
+        return weather_data
+    return {
+        "city": city,
+        "temperature": weather_data["main"]["temp"],
+        "description": weather_data["weather"][0]["description"],
+        "humidity": weather_data["main"]["humidity"],
+        "wind_speed": weather_data["wind"]["speed"]
+    }
 
-            second_response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "あなたは天気情報を自然な日本語の文章に変換するアシスタントです。"},
-                    {"role": "user", "content": question},
-                    message,
-                    {"role": "tool", "tool_call_id": tool_call.id, "name": "get_weather", "content": json.dumps(weather_info, ensure_ascii=False)},
-                ]
-            )
-            
-            return second_response.choices[0].message.content
+# ツール名 → 関数（モデルが同時に要求したツールはすべて並列に実行する）
+runner = OpenAIToolRunner(
+    client,
+    "gpt-4",
+    tools,
+    {"get_weather": summarize_weather, "get_food_info": get_food_info},
+    max_steps=3
+)
 
-        elif function_name == "get_food_info":
-            food_info = get_food_info(function_args["city"])
-            
-            if "error" in food_info:
-                return f"申し訳ありません。料理情報の取得に失敗しました: {food_info['error']}"
-            
-            second_response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "あなたは料理情報を自然な日本語の文章に変換するアシスタントです。"},
-                    {"role": "user", "content": question},
-                    message,
-                    {"role": "tool", "tool_call_id": tool_call.id, "name": "get_food_info", "content": json.dumps(food_info, ensure_ascii=False)},
-                ]
-            )
-            
-            return second_response.choices[0].message.content
-    else:
-        return "申し訳ありません。情報を取得できませんでした。"
+def process_query(question: str):
+    """ユーザーの質問を処理して回答を生成"""
+    return runner.run([
+        {"role": "system", "content": "あなたは天気情報と料理情報を取得し、自然な日本語の文章で回答するアシスタントです。質問に必要な情報はすべてツールで取得してください。"},
+        {"role": "user", "content": question}
+    ])
 
 # 使用例
 if __name__ == "__main__":
@@ -190,4 +156,10 @@ if __name__ == "__main__":
     # 料理情報の取得例
     food_question = "東京発祥の有名な料理について教えてください。"
     print("料理情報の取得:")
-    print(process_query(food_question)) 
\ No newline at end of file
+    print(process_query(food_question))
+    print("\n" + "="*50 + "\n")
+
+    # 天気と料理の両方を尋ねる例（2つのツールを1回のラウンドで並列に呼び出す）
+    both_question = "大阪の今日の天気と、大阪発祥の料理を教えてください。"
+    print("天気と料理情報の取得:")
+    print(process_query(both_question)) 
\ No newline at end of file
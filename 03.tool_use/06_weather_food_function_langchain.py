@@ -2,9 +2,9 @@ from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
 import os
 import requests
-import json
 import wikipedia
 from dotenv import load_dotenv
+from tool_runner import LangChainToolRunner
 
 load_dotenv()
 # APIキーの設定
@@ -44,7 +44,7 @@ def get_weather(city: str) -> dict:
     try:
         response = requests.get(base_url, params=params)
         response.raise_for_status()
-        return response.json()
+        return summarize_weather(city, response.json())
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
@@ -130,6 +130,18 @@ def get_food_info(city: str) -> dict:
     except Exception as e:
         return {"error": f"エラーが発生しました: {str(e)}"}
 
+def summarize_weather(city: str, weather_data: dict) -> dict:
+    """天気情報から回答に必要な項目だけを取り出す"""
+    if "error" in weather_data:
+        return weather_data
+    return {
+        "city": city,  # 日本語の都市名を保持
+        "temperature": weather_data["main"]["temp"],
+        "description": weather_data["weather"][0]["description"],
+        "humidity": weather_data["main"]["humidity"],
+        "wind_speed": weather_data["wind"]["speed"]
+    }
+
 def process_query(question: str) -> str:
     # LLMの初期化
     llm = ChatOpenAI(
@@ -138,72 +150,15 @@ def process_query(question: str) -> str:
         temperature=0
     )
     
-    # ツールの設定
-    tools = [get_weather, get_food_info]
-    
-    # ツールをモデルに紐づけ
-    model_with_tools = llm.bind_tools(tools)
+    # ツールの設定（モデルが同時に要求したツールはすべて並列に実行する）
+    runner = LangChainToolRunner(llm, [get_weather, get_food_info], max_steps=3)
     
-    # 最初のLLM呼び出し
-    response = model_with_tools.invoke(
+    return runner.run(
         [
-            {"role": "system", "content": "あなたは天気情報と料理情報を取得するアシスタントです。ユーザーの質問から適切な情報を取得してください。天気情報を取得する場合は、日本語の都市名をそのまま渡してください。内部で英語に変換されます。"},
+            {"role": "system", "content": "あなたは天気情報と料理情報を取得し、自然な日本語の文章で回答するアシスタントです。質問に必要な情報はすべてツールで取得してください。天気情報を取得する場合は、日本語の都市名をそのまま渡してください。内部で英語に変換されます。"},
             {"role": "user", "content": question}
         ]
     )
-    
-    # ツール呼び出しの処理
-    if response.tool_calls:
-        tool_call = response.tool_calls[0]
-        function_name = tool_call["name"]
-        function_args = tool_call["args"]
-        
-        if function_name == "get_weather":
-            weather_data = get_weather.invoke(function_args["city"])
-            
-            if "error" in weather_data:
-                return f"申し訳ありません。天気情報の取得に失敗しました: {weather_data['error']}"
-            
-            # 天気情報を自然な文章に変換
-            weather_info = {
-                "city": function_args["city"],  # 日本語の都市名を保持
-                "temperature": weather_data["main"]["temp"],
-                "description": weather_data["weather"][0]["description"],
-                "humidity": weather_data["main"]["humidity"],
-                "wind_speed": weather_data["wind"]["speed"]
-            }
-            
-            # 天気情報を自然な文章に変換するためのLLM呼び出し
-            format_response = model_with_tools.invoke(
-                [
-                    {"role": "system", "content": "あなたは天気情報を自然な日本語の文章に変換するアシスタントです。"},
-                    {"role": "user", "content": question},
-                    response,
-                    {"role": "tool", "tool_call_id": tool_call["id"], "name": "get_weather", "content": json.dumps(weather_info, ensure_ascii=False)}
-                ]
-            )
-            
-            return format_response.content
-            
-        elif function_name == "get_food_info":
-            food_info = get_food_info.invoke(function_args["city"])
-            
-            if "error" in food_info:
-                return f"申し訳ありません。料理情報の取得に失敗しました: {food_info['error']}"
-            
-            # 料理情報を自然な文章に変換するためのLLM呼び出し
-            format_response = model_with_tools.invoke(
-                [
-                    {"role": "system", "content": "あなたは料理情報を自然な日本語の文章に変換するアシスタントです。"},
-                    {"role": "user", "content": question},
-                    response,
-                    {"role": "tool", "tool_call_id": tool_call["id"], "name": "get_food_info", "content": json.dumps(food_info, ensure_ascii=False)}
-                ]
-            )
-            
-            return format_response.content
-    
-    return "申し訳ありません。情報を取得できませんでした。"
 
 # 使用例
 if __name__ == "__main__":
@@ -216,4 +171,10 @@ if __name__ == "__main__":
     # 料理情報の取得例
     food_question = "東京発祥の有名な料理について教えてください。"
     print("料理情報の取得:")
-    print(process_query(food_question)) 
\ No newline at end of file
+    print(process_query(food_question))
+    print("\n" + "="*50 + "\n")
+
+    # 天気と料理の両方を尋ねる例（2つのツールを1回のラウンドで並列に呼び出す）
+    both_question = "大阪の今日の天気と、大阪発祥の料理を教えてください。"
+    print("天気と料理情報の取得:")
+    print(process_query(both_question))
\ No newline at end of file
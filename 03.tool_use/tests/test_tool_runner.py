@@ -0,0 +1,94 @@
+"""
+tool_runner.py のテスト（モデルの応答を差し替え、ツール実行のループだけを確認する）
+"""
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tool_runner import NO_ANSWER_MESSAGE, OpenAIToolRunner, ToolCall, ToolRunner, execute_tool_calls
+
+
+def test_results_keep_tool_call_order():
+    running = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def slow(arguments):
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(arguments["delay"])
+        with lock:
+            running["now"] -= 1
+        return {"delay": arguments["delay"]}
+
+    tool_calls = [ToolCall(str(i), "slow", {"delay": delay}) for i, delay in enumerate([0.2, 0.05, 0.1])]
+    results = execute_tool_calls(tool_calls, {"slow": slow})
+    # 完了した順ではなく tool_calls の順に返し、すべて同時に実行する
+    assert [json.loads(result)["delay"] for result in results] == [0.2, 0.05, 0.1]
+    assert running["peak"] == 3
+
+
+def test_unknown_tool_and_exception_become_errors():
+    def fail(arguments):
+        raise ValueError("boom")
+
+    results = execute_tool_calls(
+        [ToolCall("a", "missing", {}), ToolCall("b", "fail", {}), ToolCall("c", "text", {})],
+        {"fail": fail, "text": lambda arguments: "そのまま"}
+    )
+    assert "missing" in json.loads(results[0])["error"]
+    assert "boom" in json.loads(results[1])["error"]
+    assert results[2] == "そのまま"
+
+
+class FakeClient:
+    """chat.completions.create の呼び出しを記録し、用意した応答を順に返すクライアント"""
+
+    def __init__(self, messages):
+        self.messages = iter(messages)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append({**kwargs, "messages": list(kwargs["messages"])})
+        return SimpleNamespace(choices=[SimpleNamespace(message=next(self.messages))])
+
+
+def _tool_message(*cities):
+    return SimpleNamespace(content=None, tool_calls=[
+        SimpleNamespace(id=f"call_{city}", function=SimpleNamespace(name="get_weather", arguments=json.dumps({"city": city})))
+        for city in cities
+    ])
+
+
+def _runner(client, max_steps=5):
+    return OpenAIToolRunner(client, "gpt-4", [], {"get_weather": lambda city: {"city": city}}, max_steps=max_steps)
+
+
+def test_runner_returns_results_of_all_tool_calls_in_one_request():
+    client = FakeClient([_tool_message("Tokyo", "Osaka"), SimpleNamespace(content="晴れです", tool_calls=None)])
+    assert _runner(client).run([{"role": "user", "content": "東京と大阪の天気"}]) == "晴れです"
+
+    tool_results = [message for message in client.requests[1]["messages"] if isinstance(message, dict) and message["role"] == "tool"]
+    assert [message["tool_call_id"] for message in tool_results] == ["call_Tokyo", "call_Osaka"]
+    assert [json.loads(message["content"])["city"] for message in tool_results] == ["Tokyo", "Osaka"]
+
+
+def test_runner_answers_without_tools_after_max_steps():
+    client = FakeClient([_tool_message("Tokyo"), _tool_message("Tokyo"), SimpleNamespace(content="最終回答", tool_calls=None)])
+    assert _runner(client, max_steps=2).run([{"role": "user", "content": "東京の天気"}]) == "最終回答"
+    assert [request["tool_choice"] for request in client.requests] == ["auto", "auto", "none"]
+
+
+def test_runner_returns_fallback_for_empty_answer():
+    client = FakeClient([SimpleNamespace(content=None, tool_calls=None)])
+    assert _runner(client).run([{"role": "user", "content": "?"}]) == NO_ANSWER_MESSAGE
+
+
+def test_tool_runner_is_abstract():
+    with pytest.raises(TypeError):
+        ToolRunner({})
@@ -0,0 +1,218 @@
+"""
+ツール呼び出し（Function Calling）のループを実行するランナー
+
+モデルが1回の応答で要求したツール呼び出しをすべて同時に実行し、結果をまとめて
+次のリクエストで返す。モデルがツールを呼び出さなくなるまで（最大 max_steps 回）繰り返す。
+ツールは名前 → 関数の辞書（レジストリ）から呼び出すため、ツールごとの分岐は不要。
+
+使い方（OpenAI SDK）:
+    runner = OpenAIToolRunner(client, "gpt-4", tools, {"get_weather": get_weather})
+    answer = runner.run([{"role": "user", "content": question}])
+
+使い方（LangChain）:
+    runner = LangChainToolRunner(llm, [get_weather, get_food_info])
+    answer = runner.run([{"role": "user", "content": question}])
+"""
+
+import json
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+NO_ANSWER_MESSAGE = "申し訳ありません。情報を取得できませんでした。"
+
+
+class ToolCall(NamedTuple):
+    """モデルが要求したツール呼び出し"""
+    id: str
+    name: str
+    arguments: dict
+
+
+def execute_tool_calls(
+    tool_calls: List[ToolCall],
+    registry: Dict[str, Callable[[dict], Any]],
+    max_workers: int = 8
+) -> List[str]:
+    """
+    ツール呼び出しをすべて同時に実行し、結果（JSON文字列）を tool_calls の順序で返す
+
+    存在しないツールや実行中の例外は {"error": ...} を結果として返し、モデルに伝える。
+
+    Args:
+        tool_calls: 実行するツール呼び出し
+        registry: ツール名 → 引数の辞書を受け取る関数
+        max_workers: 同時に実行する数の上限
+
+    Returns:
+        List[str]: 各ツール呼び出しの結果
+    """
+    def run(tool_call: ToolCall) -> str:
+        function = registry.get(tool_call.name)
+        if function is None:
+            result = {"error": f"ツール {tool_call.name} はありません"}
+        else:
+            try:
+                result = function(tool_call.arguments)
+            except Exception as e:
+                result = {"error": f"エラーが発生しました: {str(e)}"}
+        return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+
+    if len(tool_calls) == 1:
+        return [run(tool_calls[0])]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tool_calls))) as executor:
+        return list(executor.map(run, tool_calls))
+
+
+def _parse_arguments(arguments: Any) -> dict:
+    if isinstance(arguments, dict):
+        return arguments
+    try:
+        return json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        return {}
+
+
+class ToolRunner(ABC):
+    def __init__(self, registry: Dict[str, Callable[[dict], Any]], max_steps: int = 5, max_workers: int = 8):
+        """
+        ツール呼び出しのループの共通部分
+
+        Args:
+            registry: ツール名 → 引数の辞書を受け取る関数
+            max_steps: ツールを呼び出すラウンド数の上限（超えた場合はツールなしで回答させる）
+            max_workers: 1ラウンドで同時に実行するツール数の上限
+        """
+        self.registry = registry
+        self.max_steps = max_steps
+        self.max_workers = max_workers
+
+    def run(self, messages: List[Any]) -> str:
+        """
+        モデルがツールを呼び出さなくなるまでツールを実行し、最終的な回答を返す
+
+        Args:
+            messages: 最初に送るメッセージ（ツール呼び出しと結果を追加していく）
+
+        Returns:
+            str: モデルの回答
+        """
+        messages = list(messages)
+        for _ in range(self.max_steps):
+            message = self._chat(messages, allow_tools=True)
+            tool_calls = self._tool_calls(message)
+            if not tool_calls:
+                return self._content(message) or NO_ANSWER_MESSAGE
+
+            # 1回の応答のツール呼び出しをすべて同時に実行し、結果をまとめて返す
+            results = execute_tool_calls(tool_calls, self.registry, self.max_workers)
+            messages.append(message)
+            messages.extend(self._result_message(tool_call, result) for tool_call, result in zip(tool_calls, results))
+
+        # 上限に達した場合は、それまでの結果からツールを使わずに回答させる
+        return self._content(self._chat(messages, allow_tools=False)) or NO_ANSWER_MESSAGE
+
+    @abstractmethod
+    def _chat(self, messages: List[Any], allow_tools: bool) -> Any:
+        """モデルにメッセージを送り、応答のメッセージを返す（allow_tools が False の場合はツールを使わせない）"""
+
+    @abstractmethod
+    def _tool_calls(self, message: Any) -> List[ToolCall]:
+        """応答のメッセージからツール呼び出しを取り出す"""
+
+    @abstractmethod
+    def _result_message(self, tool_call: ToolCall, result: str) -> Any:
+        """ツールの結果をモデルに返すメッセージを作る"""
+
+    @abstractmethod
+    def _content(self, message: Any) -> Optional[str]:
+        """応答のメッセージの本文を返す"""
+
+
+class OpenAIToolRunner(ToolRunner):
+    def __init__(
+        self,
+        client,
+        model: str,
+        tools: List[dict],
+        functions: Dict[str, Callable[..., Any]],
+        max_steps: int = 5,
+        max_workers: int = 8
+    ):
+        """
+        OpenAI SDK（chat.completions）用のランナー
+
+        Args:
+            client: OpenAI クライアント
+            model: 使用するモデルの名前
+            tools: ツールの定義（chat.completions の tools）
+            functions: ツール名 → キーワード引数で呼び出す関数
+            max_steps: ツールを呼び出すラウンド数の上限
+            max_workers: 1ラウンドで同時に実行するツール数の上限
+        """
+        registry = {name: (lambda arguments, function=function: function(**arguments)) for name, function in functions.items()}
+        super().__init__(registry, max_steps, max_workers)
+        self.client = client
+        self.model = model
+        self.tools = tools
+
+    def _chat(self, messages: List[Any], allow_tools: bool) -> Any:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            tools=self.tools,
+            tool_choice="auto" if allow_tools else "none"
+        )
+        return response.choices[0].message
+
+    def _tool_calls(self, message: Any) -> List[ToolCall]:
+        return [
+            ToolCall(tool_call.id, tool_call.function.name, _parse_arguments(tool_call.function.arguments))
+            for tool_call in message.tool_calls or []
+        ]
+
+    def _result_message(self, tool_call: ToolCall, result: str) -> dict:
+        return {"role": "tool", "tool_call_id": tool_call.id, "name": tool_call.name, "content": result}
+
+    def _content(self, message: Any) -> Optional[str]:
+        return message.content
+
+
+class LangChainToolRunner(ToolRunner):
+    def __init__(self, llm, tools: List[Any], max_steps: int = 5, max_workers: int = 8):
+        """
+        LangChain のチャットモデル用のランナー
+
+        Args:
+            llm: チャットモデル（ChatOpenAI など）
+            tools: ツール（@tool で定義したものなど。名前で呼び出す）
+            max_steps: ツールを呼び出すラウンド数の上限
+            max_workers: 1ラウンドで同時に実行するツール数の上限
+        """
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
+        super().__init__({tool.name: tool.invoke for tool in tools}, max_steps, max_workers)
+        schemas = [convert_to_openai_tool(tool) for tool in tools]
+        self.model = llm.bind(tools=schemas)
+        self.final_model = llm.bind(tools=schemas, tool_choice="none")
+
+    def _chat(self, messages: List[Any], allow_tools: bool) -> Any:
+        return (self.model if allow_tools else self.final_model).invoke(messages)
+
+    def _tool_calls(self, message: Any) -> List[ToolCall]:
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            return [ToolCall(tool_call["id"], tool_call["name"], tool_call["args"]) for tool_call in tool_calls]
+        # tool_calls 属性がない版の langchain-openai では additional_kwargs に入る
+        return [
+            ToolCall(tool_call["id"], tool_call["function"]["name"], _parse_arguments(tool_call["function"]["arguments"]))
+            for tool_call in message.additional_kwargs.get("tool_calls") or []
+        ]
+
+    def _result_message(self, tool_call: ToolCall, result: str) -> Any:
+        from langchain_core.messages import ToolMessage
+
+        return ToolMessage(content=result, tool_call_id=tool_call.id)
+
+    def _content(self, message: Any) -> Optional[str]:
+        return message.content
@@ -0,0 +1,3 @@
+"""
+偽APIサーバーを使ったベンチマーク
+"""
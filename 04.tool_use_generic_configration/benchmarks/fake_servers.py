@@ -0,0 +1,388 @@
+"""
+ベンチマーク用の偽APIサーバー
+
+OpenAI（Chat Completions）・OpenWeather・Wikipedia（MediaWiki API）を1つのHTTPサーバーで模倣し、
+fixtures/ に記録した応答を返す。各APIの応答には指定した遅延を加え、呼び出し回数を数える。
+
+OpenAIの応答は質問文から決める:
+    - ツール（functions / tools）が渡され、ツールの実行結果がまだない場合はツール呼び出しを返す
+    - ツールの実行結果がある場合や、天気・料理情報の整形を頼まれた場合は記録した回答文を返す
+    - 都市名の抽出・英語変換を頼まれた場合は都市名を返す
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SERVICES = ("openai", "openweather", "wikipedia")
+
+# 質問文から都市名を取り出すパターン（「大阪の天気」「質問文: 大阪の…」など）
+_CITY_PATTERN = re.compile(r"([^\s、。？?：:「」]+?)(?:の|で|は)(?:天気|気温|料理|名物|郷土料理|食べ物)")
+_LABELED_PATTERN = re.compile(r"(?:質問文?|都市名)\s*[:：]\s*(.+)")
+_FOOD_KEYWORDS = ("料理", "名物", "食べ物", "グルメ", "郷土料理")
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeAPI:
+    def __init__(self, latency: Optional[Dict[str, float]] = None, jitter: float = 0.0):
+        """
+        偽APIの応答と呼び出し回数の管理
+
+        Args:
+            latency: サービスごとの遅延（秒）。例: {"openai": 0.5, "openweather": 0.05}
+            jitter: 遅延に加えるゆらぎの割合（0.1 なら ±10%）
+        """
+        self.latency = {service: 0.0 for service in SERVICES}
+        self.latency.update(latency or {})
+        self.jitter = jitter
+        self.openai = load_fixture("openai.json")
+        self.weather = load_fixture("openweather.json")
+        self.wikipedia = load_fixture("wikipedia.json")
+        self._calls = {service: 0 for service in SERVICES}
+        self._lock = threading.Lock()
+        self._ids = 0
+
+    # 呼び出し回数
+
+    def record(self, service: str) -> None:
+        with self._lock:
+            self._calls[service] += 1
+
+    def calls(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._calls)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls = {service: 0 for service in SERVICES}
+
+    def delay(self, service: str) -> None:
+        """サービスの遅延だけ待つ（ゆらぎは呼び出し回数から決めるため実行ごとに再現できる）"""
+        latency = self.latency.get(service, 0.0)
+        if latency <= 0:
+            return
+        if self.jitter:
+            with self._lock:
+                self._ids += 1
+                step = (self._ids * 7919) % 201 / 100 - 1  # -1.0 〜 1.0
+            latency *= 1 + self.jitter * step
+        time.sleep(latency)
+
+    # OpenWeather
+
+    def weather_response(self, params: Dict[str, str]) -> dict:
+        data = json.loads(json.dumps(self.weather))
+        data["name"] = params.get("q", data["name"])
+        return data
+
+    # Wikipedia
+
+    def wikipedia_response(self, params: Dict[str, str], lang: str) -> dict:
+        if params.get("list") == "search":
+            query = params.get("srsearch", "")
+            limit = int(params.get("srlimit", 10) or 10)
+            titles = [template.format(query=query) for template in self.wikipedia["search_titles"]][:limit]
+            return {
+                "batchcomplete": "",
+                "query": {
+                    # searchinfo は wikipedia ライブラリが suggestion を必ず含むものとして扱うため返さない
+                    "search": [{"ns": 0, "title": title, "pageid": abs(hash(title)) % 10 ** 8} for title in titles]
+                }
+            }
+
+        title = params.get("titles", "")
+        page_id = str(abs(hash(title)) % 10 ** 8)
+        return {
+            "batchcomplete": "",
+            "query": {
+                "pages": {
+                    page_id: {
+                        "pageid": int(page_id),
+                        "ns": 0,
+                        "title": title,
+                        "extract": self.wikipedia["page_extract"].format(title=title),
+                        "fullurl": self.wikipedia["page_url"].format(lang=lang, title=title.replace(" ", "_")),
+                        "revisions": [{"revid": 1, "parentid": 0}]
+                    }
+                }
+            }
+        }
+
+    # OpenAI
+
+    def _find_city(self, text: str) -> Optional[str]:
+        match = _CITY_PATTERN.search(text)
+        return match.group(1) if match else None
+
+    def _english(self, city: str) -> str:
+        return self.openai["english_city_names"].get(city, city)
+
+    def _answer(self, kind: str, city: Optional[str]) -> str:
+        return self.openai["tool_answers"][kind].format(city=city or self.openai["default_city"])
+
+    @staticmethod
+    def _text(message: dict) -> str:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        return content
+
+    def chat_message(self, request: dict) -> dict:
+        """リクエストに対するアシスタントのメッセージ（content / function_call / tool_calls）を決める"""
+        messages: List[dict] = request.get("messages", [])
+        user_text = "\n".join(self._text(m) for m in messages if m.get("role") == "user")
+        results = [m for m in messages if m.get("role") in ("function", "tool")]
+
+        functions = request.get("functions") or []
+        tools = [tool.get("function", {}) for tool in request.get("tools") or []]
+        available = [f.get("name", "") for f in functions or tools]
+        if request.get("tool_choice") == "none":
+            available = []
+
+        if results:
+            # ツールの実行結果を踏まえた最終回答（複数のツールの結果はまとめて回答する）
+            # tool メッセージに name がない場合は、対応するツール呼び出しから名前を引く
+            called = {call.get("id"): call.get("function", {}).get("name")
+                      for m in messages for call in m.get("tool_calls") or []}
+            names = [m.get("name") or called.get(m.get("tool_call_id")) or "" for m in results]
+            kinds = dict.fromkeys("food" if "food" in name else "weather" for name in names)
+            city = self._find_city(user_text)
+            return {"role": "assistant", "content": "\n\n".join(self._answer(kind, city) for kind in kinds)}
+
+        if available:
+            wants_food = any(keyword in user_text for keyword in _FOOD_KEYWORDS)
+            wants_weather = "天気" in user_text or not wants_food
+            preferred = ["weather"] if wants_weather else []
+            if wants_food and (not wants_weather or tools):
+                # tools では天気と料理の両方を1回の応答で呼び出す（functions は1回に1つ）
+                preferred.append("food")
+            names = list(dict.fromkeys(next((n for n in available if kind in n), available[0]) for kind in preferred))
+            city = self._find_city(user_text) or self.openai["default_city"]
+            arguments = json.dumps({"city": city}, ensure_ascii=False)
+            if functions:
+                return {"role": "assistant", "content": None, "function_call": {"name": names[0], "arguments": arguments}}
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                                "function": {"name": name, "arguments": arguments}} for name in names]
+            }
+
+        return {"role": "assistant", "content": self._complete(user_text)}
+
+    def _complete(self, text: str) -> str:
+        """ツールを使わない呼び出し（都市名の抽出・変換、回答の整形）の応答"""
+        if "天気情報" in text and "変換" in text:
+            city = re.search(r'"city"\s*:\s*"([^"]+)"', text)
+            return self._answer("weather", city.group(1) if city else None)
+        if "料理情報" in text:
+            title = re.search(r'"title"\s*:\s*"([^"]+)"', text)
+            return self._answer("food", title.group(1) if title else None)
+        labeled = _LABELED_PATTERN.findall(text)
+        if labeled:
+            value = labeled[-1].strip()
+            city = self._find_city(value) or value
+            return self._english(city) if "英語" in text else city
+        return self.openai["default_answer"]
+
+    def chat_completion(self, request: dict) -> Tuple[dict, str]:
+        """(メッセージ, finish_reason) を返す"""
+        message = self.chat_message(request)
+        if message.get("function_call"):
+            return message, "function_call"
+        if message.get("tool_calls"):
+            return message, "tool_calls"
+        return message, "stop"
+
+
+def _usage(request: dict, message: dict) -> dict:
+    """トークン数の概算（日本語1文字を約1トークンとする）"""
+    prompt_tokens = max(1, len(json.dumps(request.get("messages", []), ensure_ascii=False)) // 2)
+    completion_tokens = max(1, len(json.dumps(message, ensure_ascii=False)) // 2)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def _stream_chunks(message: dict, finish_reason: str) -> List[dict]:
+    """メッセージをストリーミング形式の差分に分割する"""
+    deltas = [{"role": "assistant", "content": "" if message.get("content") is not None else None}]
+    if message.get("function_call"):
+        call = message["function_call"]
+        deltas.append({"function_call": {"name": call["name"], "arguments": ""}})
+        deltas.append({"function_call": {"arguments": call["arguments"]}})
+    elif message.get("tool_calls"):
+        for index, call in enumerate(message["tool_calls"]):
+            deltas.append({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                           "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            deltas.append({"tool_calls": [{"index": index, "function": {"arguments": call["function"]["arguments"]}}]})
+    else:
+        content = message.get("content") or ""
+        deltas.extend({"content": content[i:i + 4]} for i in range(0, len(content), 4))
+    chunks = [{"index": 0, "delta": delta, "finish_reason": None, "logprobs": None} for delta in deltas]
+    chunks.append({"index": 0, "delta": {}, "finish_reason": finish_reason, "logprobs": None})
+    return chunks
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, content: dict) -> None:
+        body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        api = self.server.api
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+
+        if url.path.endswith("/data/2.5/weather"):
+            api.record("openweather")
+            api.delay("openweather")
+            self._send_json(200, api.weather_response(params))
+        elif url.path.endswith("/w/api.php"):
+            api.record("wikipedia")
+            api.delay("wikipedia")
+            match = re.search(r"/wiki/([a-z-]+)/w/api\.php$", url.path)
+            self._send_json(200, api.wikipedia_response(params, match.group(1) if match else "en"))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        api = self.server.api
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+
+        api.record("openai")
+        api.delay("openai")
+        message, finish_reason = api.chat_completion(request)
+        response_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        base = {"id": response_id, "created": int(time.time()), "model": request.get("model", "gpt-3.5-turbo"),
+                "system_fingerprint": None}
+
+        if not request.get("stream"):
+            self._send_json(200, dict(
+                base,
+                object="chat.completion",
+                choices=[{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+                usage=_usage(request, message)
+            ))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for choice in _stream_chunks(message, finish_reason):
+            chunk = dict(base, object="chat.completion.chunk", choices=[choice])
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 同時接続数が多い負荷でも接続を取りこぼさないようにする
+    request_queue_size = 256
+
+    def __init__(self, api: FakeAPI, host: str = "127.0.0.1", port: int = 0):
+        """
+        偽APIサーバー（別スレッドで起動する）
+
+        Args:
+            api: 応答と呼び出し回数を管理する FakeAPI
+            host: 待ち受けるホスト
+            port: 待ち受けるポート（0 なら空いているポート）
+        """
+        super().__init__((host, port), _Handler)
+        self.api = api
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def openweather_url(self) -> str:
+        return f"{self.base_url}/data/2.5/weather"
+
+    @property
+    def wikipedia_url(self) -> str:
+        """言語を {lang} で埋め込むURL（src.tools.wikipedia_client.API_URL と同じ形式）"""
+        return f"{self.base_url}/wiki/{{lang}}/w/api.php"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-api-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def redirect_requests(server: FakeServer) -> None:
+    """
+    requests で送る OpenWeather・Wikipedia への通信を偽APIサーバーに向ける
+
+    03.tool_use のスクリプトはURLを直接書いているため、送信直前にホストを書き換える。
+    """
+    import requests.adapters
+
+    original_send = requests.adapters.HTTPAdapter.send
+    if getattr(original_send, "_fake_server", None) is server:
+        return
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        host = url.hostname or ""
+        if host == "api.openweathermap.org":
+            request.url = server.base_url + url.path + (f"?{url.query}" if url.query else "")
+        elif host.endswith(".wikipedia.org"):
+            lang = host.split(".")[0]
+            request.url = f"{server.base_url}/wiki/{lang}{url.path}" + (f"?{url.query}" if url.query else "")
+        return original_send(self, request, **kwargs)
+
+    send._fake_server = server
+    requests.adapters.HTTPAdapter.send = send
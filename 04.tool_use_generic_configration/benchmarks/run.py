@@ -0,0 +1,395 @@
+"""
+ベンチマークの実行
+
+外部API（OpenAI・OpenWeather・Wikipedia）を偽APIサーバー（fake_servers.py）に置き換え、
+指定した遅延のもとで N 並列のクライアントから質問を送り、以下を計測する:
+    - 応答時間の p50 / p95 / p99（ストリーミングは最初のトークンまでの時間も）
+    - スループット（件/秒）
+    - 1質問あたりのAPI呼び出し回数（LLM・OpenWeather・Wikipedia）
+    - メモリ使用量（最大RSS、--trace-memory 指定時は tracemalloc のピーク）
+    - イベントループのスレッドのCPU時間（1質問あたり・LLM呼び出し1回あたり）と
+      LLM呼び出し1回あたりの応答時間（エージェントの1ステップあたりのオーバーヘッドの比較用）
+
+結果はJSONで出力するため、変更の前後で比較できる。
+
+シナリオ:
+    coordinator         CoordinatorAgent.aprocess_query
+    coordinator_stream  CoordinatorAgent.astream_query（最初のトークンまでの時間も計測）
+    tools               get_weather / get_food_info ツールの単体呼び出し
+    tool_use_03         03.tool_use のスクリプトの process_query / get_weather_info
+                        （--script で指定、requests が必要。料理情報を扱うスクリプトは wikipedia も必要）
+
+使い方（04.tool_use_generic_configration ディレクトリで実行）:
+    python -m benchmarks.run coordinator --clients 8 --requests 200 --openai-latency 0.5
+    python -m benchmarks.run coordinator --executor native --openai-latency 0
+    python -m benchmarks.run tool_use_03 --script 03_weather_food_function_vanilla.py --output result.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.fake_servers import FakeAPI, FakeServer, load_fixture, redirect_requests
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL_USE_03_DIR = os.path.join(os.path.dirname(PROJECT_DIR), "03.tool_use")
+
+SCENARIOS = ("coordinator", "coordinator_stream", "tools", "tool_use_03")
+
+# キャッシュの保存方式を切り替える設定（src.config）
+CACHE_SETTINGS = (
+    "WEATHER_CACHE_BACKEND",
+    "CITY_NAME_CACHE_BACKEND",
+    "WIKIPEDIA_CACHE_BACKEND",
+    "RESPONSE_CACHE_BACKEND",
+    "LLM_CACHE_BACKEND"
+)
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """最近傍順位法によるパーセンタイル（値がない場合はNone）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """秒単位の計測値をミリ秒の統計値にまとめる"""
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "p50": ms(percentile(values, 50)),
+        "p95": ms(percentile(values, 95)),
+        "p99": ms(percentile(values, 99)),
+        "mean": ms(sum(values) / len(values)) if values else None,
+        "min": ms(min(values)) if values else None,
+        "max": ms(max(values)) if values else None
+    }
+
+
+def _rss_peak_mb() -> Optional[float]:
+    """プロセスの最大RSS（MB、取得できない環境ではNone）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_app(server: FakeServer, cache: str) -> None:
+    """
+    アプリケーションの外部APIの接続先を偽APIサーバーに向ける
+
+    キャッシュはモジュールの読み込み時に生成されるため、src.tools などより先に呼び出すこと。
+
+    Args:
+        server: 起動済みの偽APIサーバー
+        cache: "memory"（メモリキャッシュを使う）/ "none"（キャッシュを使わない）
+    """
+    # 本物のAPIキーで本物のAPIを呼ばないよう、常に偽の値で上書きする
+    os.environ["OPEN_AI_KEY"] = "sk-benchmark"
+    os.environ["OPENWEATHER_KEY"] = "benchmark"
+    os.environ["OPENAI_BASE_URL"] = server.openai_base_url
+    os.environ["OPENAI_API_BASE"] = server.openai_base_url
+
+    from src import config
+
+    for name in CACHE_SETTINGS:
+        setattr(config, name, cache)
+    config.RESPONSE_CACHE_SEMANTIC = False
+    # オフライン索引があるとWikipediaを呼ばなくなるため、存在しないディレクトリを指定する
+    config.FOOD_INDEX_DIR = os.path.join(PROJECT_DIR, "benchmarks", "fixtures", "no_food_index")
+
+    from src.tools import weather_tools, wikipedia_client
+
+    weather_tools.OPENWEATHER_URL = server.openweather_url
+    wikipedia_client.API_URL = server.wikipedia_url
+
+
+async def run_load(
+    call: Callable[[str], Awaitable[Optional[float]]],
+    inputs: List[str],
+    total: int,
+    clients: int
+) -> dict:
+    """
+    N 並列のクライアントから入力を順に送り、応答時間を計測する
+
+    Args:
+        call: 入力1件を処理するコルーチン関数（最初のトークンまでの秒数を返してもよい）
+        inputs: 入力のリスト（total 件に達するまで繰り返し使う）
+        total: 送信する件数
+        clients: 同時に送信するクライアント数
+
+    Returns:
+        dict: latencies / first_token / errors / duration
+    """
+    latencies: List[float] = []
+    first_token: List[float] = []
+    errors: List[str] = []
+    next_index = 0
+
+    async def client() -> None:
+        nonlocal next_index
+        while next_index < total:
+            item = inputs[next_index % len(inputs)]
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                ttft = await call(item)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - start)
+            if ttft is not None:
+                first_token.append(ttft)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return {
+        "latencies": latencies,
+        "first_token": first_token,
+        "errors": errors,
+        "duration": time.perf_counter() - start
+    }
+
+
+def _threaded(func: Callable[[str], object], executor: ThreadPoolExecutor) -> Callable[[str], Awaitable[None]]:
+    """同期関数をスレッドプールで実行するコルーチン関数に変換する"""
+    async def call(item: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(executor, func, item)
+
+    return call
+
+
+def _load_tool_use_03(script: str):
+    """03.tool_use のスクリプトを読み込み、質問を処理する関数を返す"""
+    path = script if os.path.isabs(script) else os.path.join(TOOL_USE_03_DIR, script)
+    # スクリプトと同じディレクトリのモジュール（tool_runner など）を読み込めるようにする
+    script_dir = os.path.dirname(os.path.abspath(path))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    spec = importlib.util.spec_from_file_location("tool_use_03_" + os.path.basename(path).split("_")[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    entry = getattr(module, "process_query", None) or getattr(module, "get_weather_info", None)
+    if entry is None:
+        raise SystemExit(f"{script} には process_query / get_weather_info がありません")
+    if hasattr(entry, "invoke"):
+        return entry.invoke
+    return entry
+
+
+def build_scenario(args: argparse.Namespace, queries: List[str]):
+    """シナリオに応じて (入力のリスト, 入力1件を処理するコルーチン関数, 後始末の関数) を返す"""
+    if args.scenario in ("coordinator", "coordinator_stream"):
+        from src.agents.coordinator_agent import CoordinatorAgent
+
+        coordinator = CoordinatorAgent(dispatch_mode=args.dispatch_mode)
+        if args.scenario == "coordinator":
+            async def call(query: str) -> None:
+                await coordinator.aprocess_query(query)
+        else:
+            async def call(query: str) -> Optional[float]:
+                start = time.perf_counter()
+                ttft = None
+                async for event in coordinator.astream_query(query):
+                    if event.type == "token" and ttft is None:
+                        ttft = time.perf_counter() - start
+                    elif event.type == "error":
+                        raise RuntimeError(event.data)
+                return ttft
+        return queries, call, coordinator.close
+
+    if args.scenario == "tools":
+        from src.tools import get_food_info, get_weather
+
+        cities = list(load_fixture("openai.json")["english_city_names"])
+        inputs = [f"{kind}:{city}" for city in cities for kind in ("weather", "food")]
+
+        async def call(item: str) -> None:
+            kind, city = item.split(":", 1)
+            tool = get_weather if kind == "weather" else get_food_info
+            await tool.ainvoke({"city": city})
+        return inputs, call, lambda: None
+
+    try:
+        func = _load_tool_use_03(args.script)
+    except ImportError as e:
+        raise SystemExit(f"03.tool_use のスクリプトを読み込めません: {e}")
+    executor = ThreadPoolExecutor(max_workers=args.clients, thread_name_prefix="benchmark-client")
+    return queries, _threaded(func, executor), executor.shutdown
+
+
+async def _benchmark(args: argparse.Namespace, api: FakeAPI, queries: List[str]) -> dict:
+    inputs, call, close = build_scenario(args, queries)
+    try:
+        if args.warmup:
+            await run_load(call, inputs, args.warmup, args.clients)
+        api.reset()
+
+        if args.trace_memory:
+            tracemalloc.start()
+        # 偽APIサーバーのスレッドを含めないよう、イベントループのスレッドのCPU時間を計測する
+        cpu_start = time.thread_time()
+        result = await run_load(call, inputs, args.requests, args.clients)
+        cpu_time = time.thread_time() - cpu_start
+        traced_peak = None
+        if args.trace_memory:
+            traced_peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+    finally:
+        close()
+
+    completed = len(result["latencies"])
+    calls = api.calls()
+    llm_calls = calls.get("openai", 0)
+    latency_total = sum(result["latencies"])
+    metrics = {
+        "requests": args.requests,
+        "completed": completed,
+        "errors": len(result["errors"]),
+        "error_samples": sorted(set(result["errors"]))[:5],
+        "duration_s": round(result["duration"], 3),
+        "throughput_rps": round(completed / result["duration"], 2) if result["duration"] else None,
+        "latency_ms": summarize(result["latencies"]),
+        "calls": calls,
+        "calls_per_query": {service: round(count / args.requests, 3) for service, count in calls.items()},
+        "cpu_ms": {
+            "total": round(cpu_time * 1000, 2),
+            "per_query": round(cpu_time * 1000 / completed, 3) if completed else None,
+            "per_llm_call": round(cpu_time * 1000 / llm_calls, 3) if llm_calls else None
+        },
+        # 1質問の応答時間をLLM呼び出し回数で割った値（エージェントの1ステップあたりの応答時間）
+        "latency_ms_per_llm_call": round(latency_total * 1000 / llm_calls, 3) if llm_calls else None,
+        "memory": {"rss_peak_mb": _rss_peak_mb(), "tracemalloc_peak_mb": traced_peak}
+    }
+    if result["first_token"]:
+        metrics["first_token_ms"] = summarize(result["first_token"])
+    return metrics
+
+
+def run(args: argparse.Namespace) -> dict:
+    """ベンチマークを1回実行し、設定と結果をまとめた辞書を返す"""
+    latency = {
+        "openai": args.openai_latency,
+        "openweather": args.weather_latency,
+        "wikipedia": args.wikipedia_latency
+    }
+    api = FakeAPI(latency=latency, jitter=args.jitter)
+    queries = load_fixture("queries.json")
+
+    with FakeServer(api) as server:
+        configure_app(server, args.cache)
+        # エージェントは build_scenario で生成されるため、それより前に設定する
+        from src import config
+
+        config.AGENT_EXECUTOR = args.executor
+        if args.scenario == "tool_use_03":
+            redirect_requests(server)
+        started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        metrics = asyncio.run(_benchmark(args, api, queries))
+
+    return {
+        "scenario": args.scenario,
+        "started_at": started_at,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "clients": args.clients,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "cache": args.cache,
+            "dispatch_mode": args.dispatch_mode if args.scenario.startswith("coordinator") else None,
+            "executor": args.executor if args.scenario.startswith("coordinator") else None,
+            "script": args.script if args.scenario == "tool_use_03" else None,
+            "latency_s": latency,
+            "jitter": args.jitter
+        },
+        "results": metrics
+    }
+
+
+def _print_summary(report: dict) -> None:
+    results = report["results"]
+    latency = results["latency_ms"]
+    lines = [
+        f"scenario: {report['scenario']}  clients: {report['settings']['clients']}  requests: {results['requests']}",
+        f"latency (ms): p50={latency['p50']}  p95={latency['p95']}  p99={latency['p99']}",
+        f"throughput: {results['throughput_rps']} req/s  errors: {results['errors']}",
+        "calls/query: " + "  ".join(f"{service}={count}" for service, count in results["calls_per_query"].items()),
+        f"cpu (ms): per query={results['cpu_ms']['per_query']}  per llm call={results['cpu_ms']['per_llm_call']}"
+        f"  latency per llm call (ms): {results['latency_ms_per_llm_call']}",
+        f"rss peak: {results['memory']['rss_peak_mb']} MB"
+    ]
+    if "first_token_ms" in results:
+        first_token = results["first_token_ms"]
+        lines.insert(2, f"first token (ms): p50={first_token['p50']}  p95={first_token['p95']}  p99={first_token['p99']}")
+    print("\n".join(lines), file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="偽APIサーバーを使ったベンチマーク")
+    parser.add_argument("scenario", choices=SCENARIOS, help="計測するシナリオ")
+    parser.add_argument("--clients", type=int, default=4, help="同時に送信するクライアント数")
+    parser.add_argument("--requests", type=int, default=48, help="計測する件数")
+    parser.add_argument("--warmup", type=int, default=0, help="計測前に送信する件数（キャッシュを温める場合など）")
+    parser.add_argument("--cache", choices=("none", "memory"), default="none",
+                        help="キャッシュの保存方式（none: 毎回APIを呼ぶ）")
+    parser.add_argument("--dispatch-mode", choices=("agent", "direct"), default="agent",
+                        help="coordinator シナリオの処理方式")
+    parser.add_argument("--executor", choices=("langchain", "native"), default="langchain",
+                        help="coordinator シナリオのサブエージェントのツール呼び出しの実行方式")
+    parser.add_argument("--script", default="06_weather_food_function_langchain.py",
+                        help="tool_use_03 シナリオで実行する 03.tool_use のスクリプト")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="OpenAI APIの遅延（秒）")
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="OpenWeather APIの遅延（秒）")
+    parser.add_argument("--wikipedia-latency", type=float, default=0.08, help="Wikipedia APIの遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="遅延のゆらぎの割合（0.1 なら ±10%%）")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="tracemalloc でPythonのメモリ確保量のピークを計測する（処理は遅くなる）")
+    parser.add_argument("--output", help="結果のJSONの出力先（省略時は標準出力）")
+    args = parser.parse_args(argv)
+    if args.clients < 1 or args.requests < 1:
+        parser.error("--clients と --requests は1以上を指定してください")
+
+    report = run(args)
+    _print_summary(report)
+
+    content = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(content + "\n")
+    else:
+        print(content)
+
+
+if __name__ == "__main__":
+    main()
@@ -43,9 +43,7 @@ class AdvancedExample:
         """非同期でクエリを処理"""
         try:
             self.logger.info(f"Processing query asynchronously: {query}")
-            # 実際の処理は同期的ですが、非同期処理の例として実装
-            await asyncio.sleep(0.1)  # 非同期処理のシミュレーション
-            return self.coordinator.process_query(query)
+            return await self.coordinator.aprocess_query(query)
         except Exception as e:
             self.logger.error("Error in async processing", exc_info=e)
             raise
@@ -92,13 +90,17 @@ async def main():
     ]
     
     print("\n=== 非同期処理の例 ===")
-    for query in examples:
-        try:
-            response = await example.process_query_async(query)
-            print(f"\n質問: {query}")
-            print(f"回答: {response}")
-        except Exception as e:
-            print(f"エラー: {str(e)}")
+    # すべてのクエリを同時に処理
+    responses = await asyncio.gather(
+        *(example.process_query_async(query) for query in examples),
+        return_exceptions=True
+    )
+    for query, response in zip(examples, responses):
+        if isinstance(response, Exception):
+            print(f"エラー: {str(response)}")
+            continue
+        print(f"\n質問: {query}")
+        print(f"回答: {response}")
     
     print("\n=== エラーハンドリングの例 ===")
     for query in examples:
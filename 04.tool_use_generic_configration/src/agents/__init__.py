@@ -2,9 +2,20 @@
 Agents package for weather and food information retrieval system.
 """
 
-from .base_agent import BaseAgent
-from .weather_agent import WeatherAgent
-from .food_agent import FoodAgent
-from .coordinator_agent import CoordinatorAgent
+import importlib
 
-__all__ = ['BaseAgent', 'WeatherAgent', 'FoodAgent', 'CoordinatorAgent'] 
\ No newline at end of file
+# 各エージェントは LangChain を読み込むため、参照されたときに読み込む
+_EXPORTS = {
+    'BaseAgent': '.base_agent',
+    'WeatherAgent': '.weather_agent',
+    'FoodAgent': '.food_agent',
+    'CoordinatorAgent': '.coordinator_agent'
+}
+
+__all__ = ['BaseAgent', 'WeatherAgent', 'FoodAgent', 'CoordinatorAgent']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,23 +2,59 @@
 基本的なエージェントの実装
 """
 
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.tools import BaseTool
-from typing import List, Optional
+import threading
+from langchain_core.tools import BaseTool
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional
+from src import config
+from src import llm_router
+from src.agents.native_executor import STOPPED_MESSAGE
+from src.llm_registry import get_chat_model
 from src.utils.logger import CustomLogger
-from src.utils.exceptions import AgentError
-import os
+from src.utils.exceptions import AgentError, BudgetExceededError
+from src.utils.tracing import span
+from src.utils.usage import UsageAccountant
+
+class AgentResponse(str):
+    """
+    エージェントの回答（str として扱える）
+
+    usage にはこの回答を作るまでのLLMの使用量（トークン数・推定料金）を持つ。
+    """
+    usage: Optional[UsageAccountant]
+
+    def __new__(cls, text: str, usage: Optional[UsageAccountant] = None):
+        response = super().__new__(cls, text)
+        response.usage = usage
+        return response
+
+
+class StreamEvent(NamedTuple):
+    """
+    ストリーミング中のイベント
+
+    type は次のいずれか:
+        "city": 抽出した都市名（data: str）
+        "tool_start": ツールの呼び出し開始（data: {"tool", "input"}）
+        "tool_end": ツールの呼び出し終了（data: {"tool"}）
+        "token": 回答の断片（data: str。すべてを連結すると回答全体になる）
+        "error": エラー（data: str）
+        "usage": LLMの使用量（data: UsageAccountant.to_dict() の辞書。"final" の直前に送られる）
+        "final": 回答全体（data: str。最後に1回だけ送られる）
+    """
+    type: str
+    data: Any
+    intent: Optional[str] = None
+
 
 class BaseAgent:
     def __init__(
         self,
         tools: List[BaseTool],
         system_prompt: str,
-        model_name: str = "gpt-4",
-        temperature: float = 0.7,
-        verbose: bool = False
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        verbose: bool = False,
+        executor: Optional[str] = None
     ):
         """
         基本的なエージェントの初期化
@@ -26,44 +62,110 @@ class BaseAgent:
         Args:
             tools: エージェントが使用するツールのリスト
             system_prompt: システムプロンプト
-            model_name: 使用するモデルの名前
-            temperature: 生成時の温度パラメータ
+            model_name: 使用するモデルの名前（省略時は config.MODEL_ROUTES の "tool_selection" のモデルを順に試す）
+            temperature: 生成時の温度パラメータ（省略時は "tool_selection" の温度）
             verbose: 詳細なログ出力を行うかどうか
+            executor: ツール呼び出しのループの実行方式（"langchain" / "native"。省略時は config.AGENT_EXECUTOR）
         """
+        executor = executor or config.AGENT_EXECUTOR
+        if executor not in ("langchain", "native"):
+            raise ValueError(f"Unknown agent executor: {executor}")
+        route = llm_router.get_route("tool_selection")
         self.logger = CustomLogger(self.__class__.__name__)
-        self.logger.info(f"BaseAgent initialized with model: {model_name}")
-        
-        # モデルの初期化
-        self.llm = ChatOpenAI(
-            model_name=model_name,
-            temperature=temperature,
-            api_key=os.environ["OPEN_AI_KEY"]
-        )
-        
+
+        # モデルとエージェントは初回利用時に生成する（直接呼び出しのみの場合は生成しない）
+        self.tools = tools
+        self.system_prompt = system_prompt
+        # 試す順のモデル（回答が反復の上限で止まった場合などは次のモデルで処理し直す）
+        self.models = (model_name,) if model_name else route.models
+        self.model_name = self.models[0]
+        self.temperature = route.temperature if temperature is None else temperature
+        self.verbose = verbose
+        self.executor_backend = executor
+        # モデル名 → エージェントエグゼキューター
+        self._agent_executors: Dict[str, Any] = {}
+        self._build_lock = threading.Lock()
+        self.logger.info(f"BaseAgent initialized with models: {', '.join(self.models)}")
+
+    @property
+    def llm(self):
+        """使用するモデル（プロセス内で共有）"""
+        return get_chat_model(self.model_name, self.temperature)
+
+    @property
+    def agent_executor(self):
+        """先頭のモデルのエージェントエグゼキューター（初回アクセス時に生成）"""
+        return self._get_agent_executor(self.model_name)
+
+    def _get_agent_executor(self, model_name: str):
+        """モデルごとのエージェントエグゼキューター（初回利用時に生成）"""
+        agent_executor = self._agent_executors.get(model_name)
+        if agent_executor is None:
+            with self._build_lock:
+                agent_executor = self._agent_executors.get(model_name)
+                if agent_executor is None:
+                    agent_executor = self._create_agent_executor(model_name)
+                    self._agent_executors[model_name] = agent_executor
+        return agent_executor
+
+    @staticmethod
+    def _is_valid_output(output: str) -> bool:
+        """回答を採用してよいか（空の回答や反復の上限で止まった場合は次のモデルで処理し直す）"""
+        return llm_router.is_non_empty(output) and output != STOPPED_MESSAGE
+
+    def _create_agent_executor(self, model_name: str):
+        """
+        プロンプト・エージェント・エグゼキューターを生成
+
+        Args:
+            model_name: 使用するモデルの名前
+        """
+        if self.executor_backend == "native":
+            from src.agents.native_executor import NativeToolExecutor
+
+            agent_executor = NativeToolExecutor(
+                tools=self.tools,
+                system_prompt=self.system_prompt,
+                model_name=model_name,
+                temperature=self.temperature,
+                max_iterations=config.AGENT_MAX_ITERATIONS,
+                max_execution_time=config.TIMEOUT
+            )
+            self.logger.info(f"Native tool executor created successfully ({model_name})")
+            return agent_executor
+
+        # langchain.agents は読み込みに時間がかかるため、必要になるまで読み込まない
+        from langchain.agents import AgentExecutor, create_openai_functions_agent
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
         # プロンプトの設定
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", self.system_prompt),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ])
         
         # エージェントの作成
-        self.agent = create_openai_functions_agent(
-            llm=self.llm,
-            tools=tools,
-            prompt=self.prompt
+        agent = create_openai_functions_agent(
+            llm=get_chat_model(model_name, self.temperature),
+            tools=self.tools,
+            prompt=prompt
         )
         
         # エージェントエグゼキューターの作成
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=tools,
-            verbose=verbose,
+        agent_executor = AgentExecutor(
+            agent=agent,
+            tools=self.tools,
+            verbose=self.verbose,
+            max_iterations=config.AGENT_MAX_ITERATIONS,
+            # 調整役が待ち時間を打ち切った後も、裏でLLMを呼び出し続けないようにする
+            max_execution_time=config.TIMEOUT,
             handle_parsing_errors=True
         )
         
-        self.logger.info("Agent created successfully")
+        self.logger.info(f"Agent created successfully ({model_name})")
+        return agent_executor
     
     def process_query(self, query: str, chat_history: Optional[List] = None) -> str:
         """
@@ -76,19 +178,109 @@ class BaseAgent:
         Returns:
             str: 処理結果
         """
-        try:
-            # チャット履歴がNoneの場合は空のリストを使用
-            if chat_history is None:
-                chat_history = []
+        with span(f"{self.__class__.__name__}.process_query"):
+            try:
+                # チャット履歴がNoneの場合は空のリストを使用
+                if chat_history is None:
+                    chat_history = []
                 
-            # エージェントの実行
-            response = self.agent_executor.invoke({
-                "input": query,
-                "chat_history": chat_history
-            })
+                # エージェントの実行（回答が検証に通らない場合は次のモデルで処理し直す）
+                inputs = {"input": query, "chat_history": chat_history}
+                return llm_router.escalate(
+                    "tool_selection",
+                    lambda model: self._get_agent_executor(model).invoke(inputs)["output"],
+                    self._is_valid_output,
+                    models=self.models
+                )
             
-            return response["output"]
+            except BudgetExceededError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error processing query - Error: {str(e)}", exc_info=e)
+                raise AgentError(f"Error processing query: {str(e)}")
+
+    async def aprocess_query(self, query: str, chat_history: Optional[List] = None) -> str:
+        """
+        クエリを非同期に処理する
+        
+        Args:
+            query: 処理するクエリ
+            chat_history: チャット履歴（オプション）
+            
+        Returns:
+            str: 処理結果
+        """
+        with span(f"{self.__class__.__name__}.process_query"):
+            try:
+                # チャット履歴がNoneの場合は空のリストを使用
+                if chat_history is None:
+                    chat_history = []
+                
+                # エージェントの非同期実行（回答が検証に通らない場合は次のモデルで処理し直す）
+                inputs = {"input": query, "chat_history": chat_history}
+
+                async def run(model: str) -> str:
+                    response = await self._get_agent_executor(model).ainvoke(inputs)
+                    return response["output"]
+
+                return await llm_router.aescalate("tool_selection", run, self._is_valid_output, models=self.models)
             
+            except BudgetExceededError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error processing query - Error: {str(e)}", exc_info=e)
+                raise AgentError(f"Error processing query: {str(e)}") 
+
+    async def astream_query(self, query: str, chat_history: Optional[List] = None) -> AsyncIterator[StreamEvent]:
+        """
+        クエリを処理し、ツールの呼び出しと回答の断片を順に返す
+
+        送った断片は取り消せないため、ストリーミングでは先頭のモデルのみを使う。
+
+        Args:
+            query: 処理するクエリ
+            chat_history: チャット履歴（オプション）
+
+        Yields:
+            StreamEvent: "tool_start" / "tool_end" / "token" イベント
+        """
+        if chat_history is None:
+            chat_history = []
+
+        if self.executor_backend == "native":
+            try:
+                async for event in self.agent_executor.astream(query, chat_history):
+                    yield event
+            except BudgetExceededError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error streaming query - Error: {str(e)}", exc_info=e)
+                raise AgentError(f"Error processing query: {str(e)}")
+            return
+
+        streamed = False
+        try:
+            async for event in self.agent_executor.astream_events(
+                {"input": query, "chat_history": chat_history},
+                version="v1"
+            ):
+                kind = event["event"]
+                if kind == "on_tool_start":
+                    yield StreamEvent("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+                elif kind == "on_tool_end":
+                    yield StreamEvent("tool_end", {"tool": event["name"]})
+                elif kind == "on_chat_model_stream":
+                    content = event["data"]["chunk"].content
+                    if content:
+                        streamed = True
+                        yield StreamEvent("token", content)
+                elif kind == "on_chain_end" and event["name"] == "AgentExecutor" and not streamed:
+                    # キャッシュから応答した場合などトークンが届かなかったときは回答をまとめて返す
+                    output = (event["data"].get("output") or {}).get("output")
+                    if output:
+                        yield StreamEvent("token", output)
+        except BudgetExceededError:
+            raise
         except Exception as e:
-            self.logger.error(f"Error processing query - Error: {str(e)}", exc_info=e)
-            raise AgentError(f"Error processing query: {str(e)}") 
\ No newline at end of file
+            self.logger.error(f"Error streaming query - Error: {str(e)}", exc_info=e)
+            raise AgentError(f"Error processing query: {str(e)}")
@@ -1,88 +1,785 @@
-from src.agents.base_agent import BaseAgent
+from src.agents.base_agent import AgentResponse, BaseAgent, StreamEvent
 from src.agents.weather_agent import WeatherAgent
 from src.agents.food_agent import FoodAgent
+from src.agents.native_executor import STOPPED_MESSAGE
+from src.agents.registry import get_agent
 from src.prompts.coordinator_prompts import COORDINATOR_SYSTEM_PROMPT
+from src import llm_router
 from src.utils.logger import CustomLogger
-from src.tools.weather_tools import get_weather
+from src.tools.weather_tools import aconvert_to_english_city_names, aprefetch_weather, get_weather
 from src.tools.food_tools import get_food_info
-import re
+from src.tools.city_extractor import city_extractor
+from src.tools.city_names import lookup_english_city_name, normalize_city_name
+from src.tools.weather_refresher import hot_cities
+from src.utils.response_cache import ResponseCache, SemanticIndex
+from src.utils.exceptions import BudgetExceededError
+from src.utils.tracing import propagate, set_attribute, span, tracer
+from src.utils.usage import UsageAccountant, agent_scope, track_usage
+from src import config
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import os
-from langchain_openai import ChatOpenAI
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+import asyncio
+import re
+import time
 
 class CoordinatorAgent(BaseAgent):
-    def __init__(self):
+    # 意図判定に使うキーワード
+    WEATHER_KEYWORDS = ["天気", "気温", "温度", "降水", "雨", "晴れ"]
+    FOOD_KEYWORDS = ["料理", "食べ物", "名物", "郷土料理", "食"]
+    # 文章での回答を求めるキーワード（direct モードでテンプレートの代わりにLLMを使う）
+    PROSE_KEYWORDS = ["文章で", "詳しく", "説明して", "解説して"]
+    # 回答に含める情報の見出し（この順序で結合する）
+    INTENT_LABELS = {"weather": "天気情報", "food": "料理情報"}
+    # 使用量の集計に使う、情報の種類ごとのエージェント名
+    INTENT_AGENTS = {"weather": "WeatherAgent", "food": "FoodAgent"}
+    # 回答キャッシュに保存しない、取得に失敗した結果の書き出し
+    FAILURE_PREFIXES = tuple(
+        config.ERROR_MESSAGES[name].rstrip("。")
+        for name in ("weather_api_error", "food_api_error", "timeout", "budget_exceeded")
+    ) + (STOPPED_MESSAGE, "申し訳ありません。エラーが発生しました")
+
+    def __init__(
+        self,
+        parallel: bool = config.PARALLEL_AGENTS,
+        max_workers: int = config.MAX_AGENT_WORKERS,
+        dispatch_mode: str = config.DISPATCH_MODE,
+        response_cache: Optional[ResponseCache] = None,
+        token_budget: Optional[int] = config.QUERY_TOKEN_BUDGET,
+        cost_budget: Optional[float] = config.QUERY_COST_BUDGET
+    ):
+        """
+        調整役エージェントの初期化
+
+        Args:
+            parallel: サブエージェントを並列に実行するかどうか
+            max_workers: サブエージェント実行用のスレッド数の上限（タイムアウトを適用するため、並列でない場合もスレッドで実行する）
+            dispatch_mode: "agent"（サブエージェントのAgentExecutorで処理）または
+                "direct"（ツールを直接呼び出し、結果をテンプレートまたは1回のLLM呼び出しで文章にする）
+            response_cache: 回答キャッシュ（省略時は config の RESPONSE_CACHE_* から生成）
+            token_budget: 1クエリあたりのトークン数の上限（None の場合は制限しない）
+            cost_budget: 1クエリあたりの推定料金の上限（USD。None の場合は制限しない）
+        """
+        if dispatch_mode not in ("agent", "direct"):
+            raise ValueError(f"Unknown dispatch mode: {dispatch_mode}")
         tools = [get_weather, get_food_info]
         super().__init__(
             tools=tools,
             system_prompt=COORDINATOR_SYSTEM_PROMPT,
-            model_name="gpt-4",
-            temperature=0.7,
             verbose=False
         )
         self.logger = CustomLogger(self.__class__.__name__)
-        self.weather_agent = WeatherAgent()
-        self.food_agent = FoodAgent()
+        self.parallel = parallel
+        self.dispatch_mode = dispatch_mode
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.response_cache = response_cache if response_cache is not None else self._create_response_cache()
+        self.max_workers = max_workers
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._stream_loop: Optional[asyncio.AbstractEventLoop] = None
         self.logger.info("CoordinatorAgent initialized")
 
-    def _extract_city(self, query: str) -> str:
-        """クエリから都市名を抽出（OpenAI APIを利用）"""
-        try:
-            llm = ChatOpenAI(
-                model="gpt-3.5-turbo",
-                api_key=os.environ["OPEN_AI_KEY"],
-                temperature=0
+    def _create_response_cache(self) -> ResponseCache:
+        """設定値から回答キャッシュを生成"""
+        semantic_index = None
+        if config.RESPONSE_CACHE_SEMANTIC and config.RESPONSE_CACHE_BACKEND != "none":
+            from langchain_openai import OpenAIEmbeddings
+
+            embedder = OpenAIEmbeddings(model=config.RESPONSE_CACHE_EMBEDDING_MODEL, api_key=os.environ["OPEN_AI_KEY"])
+            semantic_index = SemanticIndex(
+                embedder,
+                threshold=config.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+                maxsize=config.RESPONSE_CACHE_MAXSIZE
             )
-            prompt = f"""次の日本語の質問文から都市名だけを抽出してください。都市名が複数ある場合は最も関連性が高いものを1つだけ返してください。都市名以外は一切含めず、都市名が見つからない場合は「東京」とだけ返してください。
+        return ResponseCache(
+            config.RESPONSE_CACHE_TTLS,
+            maxsize=config.RESPONSE_CACHE_MAXSIZE,
+            backend=config.RESPONSE_CACHE_BACKEND,
+            cache_dir=config.CACHE_DIR,
+            semantic_index=semantic_index
+        )
+
+    @property
+    def weather_agent(self) -> WeatherAgent:
+        """天気エージェント（初回利用時に生成し、調整役エージェント間で共有）"""
+        return get_agent(WeatherAgent)
+
+    @property
+    def food_agent(self) -> FoodAgent:
+        """料理エージェント（初回利用時に生成し、調整役エージェント間で共有）"""
+        return get_agent(FoodAgent)
+
+    def _new_accountant(self) -> UsageAccountant:
+        """1クエリ分の使用量の集計先を生成"""
+        return UsageAccountant(token_budget=self.token_budget, cost_budget=self.cost_budget)
+
+    def cache_stats(self) -> dict:
+        """回答キャッシュの統計情報を返す"""
+        return self.response_cache.stats()
+
+    def _city_prompt(self, query: str) -> str:
+        """都市名抽出用のプロンプトを生成"""
+        return f"""次の日本語の質問文から都市名だけを抽出してください。都市名が複数ある場合は最も関連性が高いものを1つだけ返してください。都市名以外は一切含めず、都市名が見つからない場合は「東京」とだけ返してください。
 
 質問文: {query}
 都市名:"""
-            response = llm.invoke(prompt)
-            city = response.content.strip()
+
+    @staticmethod
+    def _is_valid_city(text: str) -> bool:
+        """LLMの抽出結果が都市名1つとして妥当か（文章や複数の候補を返した場合は次のモデルで抽出し直す）"""
+        city = text.strip()
+        return 0 < len(city) <= 30 and not any(c in city for c in "\n。、，,：:？?「」")
+
+    def _match_city(self, query: str):
+        """辞書照合で都市名を抽出する。見つからない場合はNone"""
+        match = city_extractor.extract(query)
+        if match is not None:
+            self.logger.debug(f"Extracted city (via dictionary): {match.text} [{match.start}:{match.end}]")
+            return match.text
+        return None
+
+    def _extract_city(self, query: str) -> str:
+        """辞書で都市名が見つからなかったクエリから、OpenAI APIで都市名を抽出"""
+        try:
+            response = llm_router.invoke("extraction", self._city_prompt(query), self._is_valid_city)
+            city = response.strip()
             self.logger.debug(f"Extracted city (via API): {city}")
             return city
         except Exception as e:
             self.logger.error("Error extracting city via API", exc_info=e)
             return "東京"
 
-    def process_query(self, query: str) -> str:
+    async def _aextract_city(self, query: str) -> str:
+        """_extract_city の非同期版"""
         try:
-            self.logger.info(f"Processing query: {query}")
-            
-            # 都市名の抽出
-            city = self._extract_city(query)
+            response = await llm_router.ainvoke("extraction", self._city_prompt(query), self._is_valid_city)
+            city = response.strip()
+            self.logger.debug(f"Extracted city (via API): {city}")
+            return city
+        except Exception as e:
+            self.logger.error("Error extracting city via API", exc_info=e)
+            return "東京"
+
+    def _resolve_city(self, query: str):
+        """
+        都市名を決める（辞書照合、類似した過去の質問の都市名、LLMでの抽出の順に試す）
+
+        辞書で見つかる場合は埋め込みAPIを呼ばない。言い回しが同じで都市名だけ異なる質問
+        （大阪の天気は？ / 京都の天気は？）は類似度が高いため、辞書の結果を優先する。
+
+        Returns:
+            Tuple[str, Optional[ndarray]]: 都市名と、類似質問の索引に登録するベクトル
+                （LLMで抽出した場合のみ。それ以外はNone）
+        """
+        city = self._match_city(query)
+        if city is not None:
+            self.logger.info(f"Extracted city: {city}")
+            return city, None
+
+        index = self.response_cache.semantic_index
+        vector = None
+        if index is not None:
+            try:
+                vector = index.embed(query)
+                city = index.search(vector)
+                if city is not None:
+                    self.logger.info(f"City from similar query: {city}")
+                    return city, None
+            except Exception as e:
+                self.logger.error("Error searching similar queries", exc_info=e)
+
+        city = self._extract_city(query)
+        self.logger.info(f"Extracted city: {city}")
+        return city, vector
+
+    async def _aresolve_city(self, query: str):
+        """_resolve_city の非同期版"""
+        city = self._match_city(query)
+        if city is not None:
             self.logger.info(f"Extracted city: {city}")
-            
-            # 必要な情報の取得
-            weather_info = ""
-            food_info = ""
-            
-            # 天気情報が必要か判断
-            if any(keyword in query for keyword in ["天気", "気温", "温度", "降水", "雨", "晴れ"]):
-                self.logger.info("Weather information requested")
-                weather_info = self.weather_agent.get_weather_info(city)
-            
-            # 料理情報が必要か判断
-            if any(keyword in query for keyword in ["料理", "食べ物", "名物", "郷土料理", "食"]):
-                self.logger.info("Food information requested")
-                food_info = self.food_agent.get_food_info(city)
-            
-            # 情報の組み合わせ
-            combined_info = []
-            if weather_info:
-                combined_info.append(f"天気情報:\n{weather_info}")
-            if food_info:
-                combined_info.append(f"料理情報:\n{food_info}")
-            
-            if not combined_info:
+            return city, None
+
+        index = self.response_cache.semantic_index
+        vector = None
+        if index is not None:
+            try:
+                vector = await index.aembed(query)
+                city = index.search(vector)
+                if city is not None:
+                    self.logger.info(f"City from similar query: {city}")
+                    return city, None
+            except Exception as e:
+                self.logger.error("Error searching similar queries", exc_info=e)
+
+        city = await self._aextract_city(query)
+        self.logger.info(f"Extracted city: {city}")
+        return city, vector
+
+    def _remember_city(self, vector, city: str, intents: List[str]) -> None:
+        """LLMで都市名を抽出し、回答できた質問のベクトルを類似質問の索引に登録"""
+        if vector is not None and intents:
+            self.response_cache.semantic_index.add(vector, city)
+
+    def _detect_intents(self, query: str) -> List[str]:
+        """
+        クエリに必要な情報の種類を判定する
+
+        Args:
+            query: ユーザーのクエリ
+
+        Returns:
+            List[str]: 必要な情報の種類（INTENT_LABELS の順序）
+        """
+        intents = []
+
+        # 天気情報が必要か判断
+        if any(keyword in query for keyword in self.WEATHER_KEYWORDS):
+            self.logger.info("Weather information requested")
+            intents.append("weather")
+
+        # 料理情報が必要か判断
+        if any(keyword in query for keyword in self.FOOD_KEYWORDS):
+            self.logger.info("Food information requested")
+            intents.append("food")
+
+        return intents
+
+    def _wants_prose(self, query: str) -> bool:
+        """文章での回答を求められているか判定"""
+        return any(keyword in query for keyword in self.PROSE_KEYWORDS)
+
+    def _city_key(self, city: str) -> str:
+        """回答キャッシュのキーに使う都市名（表記ゆれを吸収するため英語名に揃える）"""
+        return normalize_city_name(lookup_english_city_name(city) or city)
+
+    def _record_request(self, intent: str, city: str, city_key: str) -> None:
+        """天気の問い合わせを記録する（よく問い合わされる都市の天気情報の先行更新に使う）"""
+        if intent == "weather":
+            hot_cities.record(city_key, city)
+
+    def _is_cacheable(self, result: str) -> bool:
+        """取得に失敗した結果（エラー・タイムアウト・使用量の上限・反復の打ち切り）はキャッシュしない"""
+        return bool(result and result.strip()) and not result.startswith(self.FAILURE_PREFIXES)
+
+    def _run_intent(self, intent: str, city: str, prose: bool = False) -> str:
+        """指定された種類の情報を回答キャッシュまたはサブエージェントから取得"""
+        with span("CoordinatorAgent.run_intent", intent=intent, city=city), agent_scope(self.INTENT_AGENTS[intent]):
+            city_key = self._city_key(city)
+            self._record_request(intent, city, city_key)
+            result = self.response_cache.get(intent, city_key, prose)
+            if result is not None:
+                self.logger.info(f"{intent} response served from cache: {city_key}")
+                return result
+
+            try:
+                result = self._dispatch_intent(intent, city, prose)
+            except BudgetExceededError:
+                self.logger.warning(f"{intent} agent stopped: usage budget exceeded")
+                return config.ERROR_MESSAGES["budget_exceeded"]
+            if self._is_cacheable(result):
+                self.response_cache.set(intent, city_key, result, prose)
+            return result
+
+    async def _arun_intent(self, intent: str, city: str, prose: bool = False) -> str:
+        """_run_intent の非同期版"""
+        with span("CoordinatorAgent.run_intent", intent=intent, city=city):
+            city_key = self._city_key(city)
+            self._record_request(intent, city, city_key)
+            result = self.response_cache.get(intent, city_key, prose)
+            if result is not None:
+                self.logger.info(f"{intent} response served from cache: {city_key}")
+                return result
+            return await self._adispatch_and_cache(intent, city, city_key, prose)
+
+    async def _adispatch_and_cache(self, intent: str, city: str, city_key: str, prose: bool = False) -> str:
+        """サブエージェントから取得し、成功した結果を回答キャッシュに保存"""
+        with agent_scope(self.INTENT_AGENTS[intent]):
+            try:
+                result = await self._adispatch_intent(intent, city, prose)
+            except BudgetExceededError:
+                self.logger.warning(f"{intent} agent stopped: usage budget exceeded")
+                return config.ERROR_MESSAGES["budget_exceeded"]
+        if self._is_cacheable(result):
+            self.response_cache.set(intent, city_key, result, prose)
+        return result
+
+    def _dispatch_intent(self, intent: str, city: str, prose: bool = False) -> str:
+        """指定された種類の情報をサブエージェントから取得"""
+        direct = self.dispatch_mode == "direct"
+        if intent == "weather":
+            if direct:
+                return self.weather_agent.get_weather_info_direct(city, prose)
+            return self.weather_agent.get_weather_info(city)
+        if direct:
+            return self.food_agent.get_food_info_direct(city)
+        return self.food_agent.get_food_info(city)
+
+    async def _adispatch_intent(self, intent: str, city: str, prose: bool = False) -> str:
+        """指定された種類の情報をサブエージェントから非同期に取得"""
+        direct = self.dispatch_mode == "direct"
+        if intent == "weather":
+            if direct:
+                return await self.weather_agent.aget_weather_info_direct(city, prose)
+            return await self.weather_agent.aget_weather_info(city)
+        if direct:
+            return await self.food_agent.aget_food_info_direct(city)
+        return await self.food_agent.aget_food_info(city)
+
+    def _astream_dispatch(self, intent: str, city: str, prose: bool = False) -> AsyncIterator[StreamEvent]:
+        """指定された種類の情報をサブエージェントからストリーミングで取得"""
+        direct = self.dispatch_mode == "direct"
+        if intent == "weather":
+            if direct:
+                return self.weather_agent.astream_weather_info_direct(city, prose)
+            return self.weather_agent.astream_weather_info(city)
+        if direct:
+            return self.food_agent.astream_food_info_direct(city)
+        return self.food_agent.astream_food_info(city)
+
+    async def _astream_intent(self, intent: str, city: str, prose: bool = False) -> AsyncIterator[StreamEvent]:
+        """_arun_intent のストリーミング版（回答キャッシュにあればまとめて返す）"""
+        city_key = self._city_key(city)
+        self._record_request(intent, city, city_key)
+        result = self.response_cache.get(intent, city_key, prose)
+        if result is not None:
+            self.logger.info(f"{intent} response served from cache: {city_key}")
+            yield StreamEvent("token", result, intent)
+            return
+
+        parts = []
+        async for event in self._astream_dispatch(intent, city, prose):
+            if event.type == "token":
+                parts.append(event.data)
+            yield event._replace(intent=intent)
+
+        result = "".join(parts)
+        if self._is_cacheable(result):
+            self.response_cache.set(intent, city_key, result, prose)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """サブエージェント実行用のスレッドプール（初回利用時に生成）"""
+        if self.executor is None:
+            with self._build_lock:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="coordinator")
+        return self.executor
+
+    def _wait_intent(self, intent: str, future: Future, deadline: float) -> str:
+        """サブエージェントの結果を deadline まで待つ（過ぎた場合はタイムアウトのメッセージを返す）"""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self.logger.warning(f"{intent} agent timed out after {config.TIMEOUT} seconds")
+            return config.ERROR_MESSAGES["timeout"]
+
+    def _run_intents(self, intents: List[str], city: str, prose: bool = False) -> List[str]:
+        """
+        サブエージェントを実行し、結果を intents の順序どおりに返す
+
+        サブエージェントはスレッドで実行し、各エージェントの待ち時間を config.TIMEOUT で打ち切る。
+        並列モードではすべてのサブエージェントを同時に開始し、そうでない場合は1件ずつ順に実行する。
+
+        スレッドは外から止められないため、打ち切ったサブエージェントは裏で実行を続け（スレッドを
+        1つ使い続け）、その結果は捨てられる。LLMの呼び出しはエグゼキューターの max_execution_time
+        （config.TIMEOUT）で止まるまで続き、使用量はこのクエリの集計に加算される。
+
+        Args:
+            intents: 必要な情報の種類
+            city: 都市名
+            prose: 文章での回答を求められているかどうか
+
+        Returns:
+            List[str]: 各サブエージェントの結果
+        """
+        executor = self._get_executor()
+        # 現在のスパン（process_query）と使用量の集計先をスレッドに引き継ぐ
+        run_intent = propagate(self._run_intent)
+        if not self.parallel:
+            return [
+                self._wait_intent(intent, executor.submit(run_intent, intent, city, prose), time.monotonic() + config.TIMEOUT)
+                for intent in intents
+            ]
+
+        futures = [(intent, executor.submit(run_intent, intent, city, prose)) for intent in intents]
+        deadline = time.monotonic() + config.TIMEOUT
+        return [self._wait_intent(intent, future, deadline) for intent, future in futures]
+
+    async def _arun_intents(self, intents: List[str], city: str, prose: bool = False) -> List[str]:
+        """サブエージェントを非同期に並行実行し、結果を intents の順序どおりに返す"""
+        return list(await asyncio.gather(*(
+            self._with_timeout(intent, self._arun_intent(intent, city, prose)) for intent in intents
+        )))
+
+    async def _with_timeout(self, intent: str, coroutine) -> str:
+        """サブエージェントの処理を config.TIMEOUT で打ち切る"""
+        try:
+            return await asyncio.wait_for(coroutine, timeout=config.TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"{intent} agent timed out after {config.TIMEOUT} seconds")
+            return config.ERROR_MESSAGES["timeout"]
+
+    def _combine_results(self, intents: List[str], results: List[str]) -> str:
+        """各サブエージェントの結果を固定の順序で結合する"""
+        combined_info = []
+        for intent, info in zip(intents, results):
+            if info:
+                combined_info.append(f"{self.INTENT_LABELS[intent]}:\n{info}")
+
+        if not combined_info:
+            self.logger.warning("No specific information requested")
+            return "申し訳ありません。具体的な情報の種類を指定してください。"
+
+        # 情報を自然な文章にまとめる
+        final_response = "\n\n".join(combined_info)
+        self.logger.info("Query processed successfully")
+        return final_response
+
+    def process_query(self, query: str) -> AgentResponse:
+        """
+        クエリを処理する
+
+        Args:
+            query: ユーザーのクエリ
+
+        Returns:
+            AgentResponse: 回答（usage にこのクエリのLLMの使用量を持つ）
+        """
+        accountant = self._new_accountant()
+        with span("CoordinatorAgent.process_query"), track_usage(accountant, agent="CoordinatorAgent"):
+            try:
+                self.logger.info(f"Processing query: {query}")
+
+                # 都市名の抽出
+                with span("CoordinatorAgent.resolve_city"):
+                    city, vector = self._resolve_city(query)
+                    set_attribute("city", city)
+                intents = self._detect_intents(query)
+                set_attribute("intents", ",".join(intents))
+
+                # 必要な情報の取得
+                results = self._run_intents(intents, city, self._wants_prose(query))
+                self._remember_city(vector, city, intents)
+
+                # 情報の組み合わせ
+                return AgentResponse(self._combine_results(intents, results), accountant)
+
+            except Exception as e:
+                self.logger.error("Error processing query", exc_info=e)
+                set_attribute("error", str(e))
+                return AgentResponse(f"申し訳ありません。エラーが発生しました: {str(e)}", accountant)
+
+    async def aprocess_query(self, query: str) -> AgentResponse:
+        """process_query の非同期版"""
+        accountant = self._new_accountant()
+        with span("CoordinatorAgent.process_query"), track_usage(accountant, agent="CoordinatorAgent"):
+            try:
+                self.logger.info(f"Processing query asynchronously: {query}")
+
+                # 都市名の抽出
+                with span("CoordinatorAgent.resolve_city"):
+                    city, vector = await self._aresolve_city(query)
+                    set_attribute("city", city)
+                intents = self._detect_intents(query)
+                set_attribute("intents", ",".join(intents))
+
+                # 必要な情報の取得
+                results = await self._arun_intents(intents, city, self._wants_prose(query))
+                self._remember_city(vector, city, intents)
+
+                # 情報の組み合わせ
+                return AgentResponse(self._combine_results(intents, results), accountant)
+
+            except Exception as e:
+                self.logger.error("Error processing query", exc_info=e)
+                set_attribute("error", str(e))
+                return AgentResponse(f"申し訳ありません。エラーが発生しました: {str(e)}", accountant)
+
+    async def astream_query(self, query: str) -> AsyncIterator[StreamEvent]:
+        """
+        クエリを処理し、途中経過と回答の断片を届いた順に返す
+
+        サブエージェントは並行に実行し、イベントは情報の種類の順序どおりに返す
+        （先頭の情報を返している間、後続の情報のイベントは溜めておく）。
+        "token" イベントを連結すると process_query と同じ形式の回答になる。
+
+        Args:
+            query: ユーザーのクエリ
+
+        Yields:
+            StreamEvent: "city" / "tool_start" / "tool_end" / "token" / "error" と、最後に "usage" と "final"
+                （"final" の data は AgentResponse）
+        """
+        parts = []
+        tasks = []
+        # yield をまたぐため現在のスパン・集計先には設定せず、子スパンの親・子の処理の集計先として明示的に渡す
+        root = tracer.start_span("CoordinatorAgent.stream_query")
+        accountant = self._new_accountant()
+        try:
+            self.logger.info(f"Streaming query: {query}")
+
+            # 都市名の抽出
+            with span("CoordinatorAgent.resolve_city", parent=root), track_usage(accountant, agent="CoordinatorAgent"):
+                city, vector = await self._aresolve_city(query)
+                set_attribute("city", city)
+            yield StreamEvent("city", city)
+
+            intents = self._detect_intents(query)
+            if not intents:
                 self.logger.warning("No specific information requested")
-                return "申し訳ありません。具体的な情報の種類を指定してください。"
-            
-            # 情報を自然な文章にまとめる
-            final_response = "\n\n".join(combined_info)
-            self.logger.info("Query processed successfully")
-            
-            return final_response
-            
+                message = "申し訳ありません。具体的な情報の種類を指定してください。"
+                yield StreamEvent("token", message)
+                yield StreamEvent("usage", accountant.to_dict())
+                yield StreamEvent("final", AgentResponse(message, accountant))
+                return
+
+            prose = self._wants_prose(query)
+            queues = [asyncio.Queue() for _ in intents]
+
+            async def pump(intent: str, queue: asyncio.Queue) -> None:
+                try:
+                    with span("CoordinatorAgent.run_intent", parent=root, intent=intent, city=city), \
+                            track_usage(accountant, agent=self.INTENT_AGENTS[intent]):
+                        async for event in self._astream_intent(intent, city, prose):
+                            await queue.put(event)
+                except BudgetExceededError:
+                    self.logger.warning(f"{intent} agent stopped: usage budget exceeded")
+                    await queue.put(StreamEvent("token", config.ERROR_MESSAGES["budget_exceeded"], intent))
+                except Exception as e:
+                    self.logger.error(f"Error streaming {intent} info", exc_info=e)
+                    await queue.put(StreamEvent("error", str(e), intent))
+                    await queue.put(StreamEvent("token", f"申し訳ありません。エラーが発生しました: {str(e)}", intent))
+                finally:
+                    await queue.put(None)
+
+            # すべてのサブエージェントを同時に開始し、各情報を順に返す
+            tasks = [asyncio.create_task(pump(intent, queue)) for intent, queue in zip(intents, queues)]
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + config.TIMEOUT
+            for intent, queue, task in zip(intents, queues, tasks):
+                # 見出しは最初の断片の直前に返す（_combine_results と同じく空の情報は省く）
+                heading = f"{self.INTENT_LABELS[intent]}:\n"
+                if parts:
+                    heading = "\n\n" + heading
+                started = False
+                timed_out = False
+
+                while not timed_out:
+                    try:
+                        # 届いているイベントは期限を過ぎていても返す
+                        event = queue.get_nowait() if not queue.empty() else await asyncio.wait_for(
+                            queue.get(), timeout=max(0.0, deadline - loop.time())
+                        )
+                    except asyncio.TimeoutError:
+                        task.cancel()
+                        self.logger.warning(f"{intent} agent timed out after {config.TIMEOUT} seconds")
+                        event = StreamEvent("token", config.ERROR_MESSAGES["timeout"], intent)
+                        timed_out = True
+                    if event is None:
+                        break
+                    if event.type == "token":
+                        if not started:
+                            started = True
+                            parts.append(heading)
+                            yield StreamEvent("token", heading, intent)
+                        parts.append(event.data)
+                    yield event
+
+            self._remember_city(vector, city, intents)
+            self.logger.info("Query streamed successfully")
+
         except Exception as e:
-            self.logger.error("Error processing query", exc_info=e)
-            return f"申し訳ありません。エラーが発生しました: {str(e)}" 
\ No newline at end of file
+            self.logger.error("Error streaming query", exc_info=e)
+            message = f"申し訳ありません。エラーが発生しました: {str(e)}"
+            parts.append(message)
+            yield StreamEvent("error", str(e))
+            yield StreamEvent("token", message)
+
+        finally:
+            for task in tasks:
+                task.cancel()
+            tracer.end_span(root)
+
+        yield StreamEvent("usage", accountant.to_dict())
+        yield StreamEvent("final", AgentResponse("".join(parts), accountant))
+
+    def stream_query(self, query: str) -> Iterator[StreamEvent]:
+        """
+        astream_query の同期版（ジェネレーター）
+
+        このインスタンス専用のイベントループで実行し、呼び出しをまたいでループを使い回す。
+        共有の非同期クライアント（LLM・HTTP）はイベントループごとに作られるため、
+        他のインスタンスや asyncio.run の呼び出し元とループが異なっても安全に使える。
+        """
+        return self._iterate(self.astream_query(query))
+
+    def _iterate(self, stream: AsyncIterator) -> Iterator:
+        """非同期イテレーターを、このインスタンス専用のイベントループで同期的に回す"""
+        if self._stream_loop is None:
+            self._stream_loop = asyncio.new_event_loop()
+        loop = self._stream_loop
+
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(stream.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(stream.aclose())
+
+    async def _aextract_cities(self, queries: List[str], max_concurrency: int) -> List[str]:
+        """複数のクエリから都市名を抽出（辞書にないクエリのみ、重複を除いてまとめてLLMに問い合わせる）"""
+        cities = {}
+        pending = []
+        for query in dict.fromkeys(queries):
+            city = self._match_city(query)
+            if city is not None:
+                cities[query] = city
+            else:
+                pending.append(query)
+
+        if pending:
+            self.logger.info(f"Extracting cities for {len(pending)} queries in batch")
+            responses = await llm_router.abatch(
+                "extraction",
+                [self._city_prompt(query) for query in pending],
+                self._is_valid_city,
+                max_concurrency=max_concurrency
+            )
+            for query, response in zip(pending, responses):
+                if isinstance(response, Exception):
+                    self.logger.error("Error extracting city via API", exc_info=response)
+                    cities[query] = "東京"
+                else:
+                    cities[query] = response.strip()
+
+        return [cities[query] for query in queries]
+
+    async def aprocess_batch(
+        self,
+        queries: List[str],
+        max_concurrency: int = config.BATCH_MAX_CONCURRENCY,
+        ordered: bool = True
+    ) -> AsyncIterator[Tuple[int, AgentResponse]]:
+        """
+        複数のクエリをまとめて処理する
+
+        同じ (情報の種類, 都市) の処理はバッチ全体で1回だけ行い、都市名の抽出・英語変換と
+        天気情報の取得は重複を除いてまとめて先に行う。処理はクエリ間で共有されるため、
+        LLMの使用量はバッチ全体で1つに集計し（クエリごとの上限は適用しない）、すべての回答の
+        usage に同じ集計を持たせる。
+
+        Args:
+            queries: ユーザーのクエリ
+            max_concurrency: 同時に実行する処理数の上限
+            ordered: True の場合は入力の順序で、False の場合は完了した順に返す
+
+        Yields:
+            Tuple[int, AgentResponse]: (クエリの位置, 回答)。回答の usage はバッチ全体の使用量
+        """
+        tasks = {}
+        answers = []
+        # yield をまたぐため現在のスパン・集計先には設定せず、子スパンの親・子の処理の集計先として明示的に渡す
+        root = tracer.start_span("CoordinatorAgent.process_batch", queries=len(queries))
+        accountant = UsageAccountant()
+        try:
+            self.logger.info(f"Processing batch of {len(queries)} queries")
+            loop = asyncio.get_running_loop()
+
+            with span("CoordinatorAgent.prepare_batch", parent=root), track_usage(accountant, agent="CoordinatorAgent"):
+                cities = await self._aextract_cities(queries, max_concurrency)
+
+                # 各クエリに必要な (情報の種類, 都市) の処理を洗い出し、重複を除く
+                plans = []
+                units = {}
+                for query, city in zip(queries, cities):
+                    intents = self._detect_intents(query)
+                    prose = self._wants_prose(query)
+                    keys = [(intent, self._city_key(city), prose) for intent in intents]
+                    for key in keys:
+                        units.setdefault(key, city)
+                        self._record_request(key[0], city, key[1])
+                    plans.append((intents, keys))
+
+                # 回答キャッシュにない処理について、都市名の変換と天気情報の取得をまとめて行う
+                cached = {}
+                for key in units:
+                    result = self.response_cache.get(*key)
+                    if result is not None:
+                        cached[key] = result
+                pending = {key: city for key, city in units.items() if key not in cached}
+                self.logger.info(f"Batch has {len(units)} unique tasks ({len(cached)} cached)")
+                set_attribute("units", len(units))
+                set_attribute("cached", len(cached))
+
+                weather_cities = [city for (intent, _, _), city in pending.items() if intent == "weather"]
+                food_cities = [city for (intent, _, _), city in pending.items() if intent == "food"]
+                if weather_cities:
+                    await aprefetch_weather(weather_cities, max_concurrency)
+                if food_cities:
+                    await aconvert_to_english_city_names(food_cities, max_concurrency)
+
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def run_unit(key: tuple, city: str) -> str:
+                intent, city_key, prose = key
+                async with semaphore:
+                    with span("CoordinatorAgent.run_intent", parent=root, intent=intent, city=city), \
+                            track_usage(accountant, agent=self.INTENT_AGENTS[intent]):
+                        return await self._with_timeout(intent, self._adispatch_and_cache(intent, city, city_key, prose))
+
+            for key in units:
+                if key in cached:
+                    tasks[key] = loop.create_future()
+                    tasks[key].set_result(cached[key])
+                else:
+                    tasks[key] = asyncio.ensure_future(run_unit(key, pending[key]))
+
+            async def answer(index: int) -> Tuple[int, AgentResponse]:
+                intents, keys = plans[index]
+                try:
+                    results = await asyncio.gather(*(tasks[key] for key in keys))
+                except Exception as e:
+                    self.logger.error("Error processing query in batch", exc_info=e)
+                    return index, AgentResponse(f"申し訳ありません。エラーが発生しました: {str(e)}", accountant)
+                return index, AgentResponse(self._combine_results(intents, list(results)), accountant)
+
+            answers = [asyncio.ensure_future(answer(index)) for index in range(len(queries))]
+            if ordered:
+                for future in answers:
+                    yield await future
+            else:
+                for future in asyncio.as_completed(answers):
+                    yield await future
+        finally:
+            for future in list(tasks.values()) + answers:
+                future.cancel()
+            tracer.end_span(root)
+
+    def process_batch(
+        self,
+        queries: List[str],
+        max_concurrency: int = config.BATCH_MAX_CONCURRENCY,
+        ordered: bool = True
+    ) -> Iterator[Tuple[int, AgentResponse]]:
+        """
+        aprocess_batch の同期版（ジェネレーター）
+
+        Args:
+            queries: ユーザーのクエリ
+            max_concurrency: 同時に実行する処理数の上限
+            ordered: True の場合は入力の順序で、False の場合は完了した順に返す
+
+        Yields:
+            Tuple[int, AgentResponse]: (クエリの位置, 回答)。回答の usage はバッチ全体の使用量
+        """
+        return self._iterate(self.aprocess_batch(queries, max_concurrency, ordered))
+
+    def close(self):
+        """サブエージェント実行用のスレッドプールとストリーミング用のイベントループを解放する"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        if self._stream_loop is not None:
+            self._stream_loop.close()
+            self._stream_loop = None
@@ -1,17 +1,21 @@
-from src.agents.base_agent import BaseAgent
+import json
+from typing import AsyncIterator, Optional
+from src import llm_router
+from src.agents.base_agent import BaseAgent, StreamEvent
 from src.tools.food_tools import get_food_info
-from src.prompts.food_prompts import FOOD_SYSTEM_PROMPT
+from src.prompts.food_prompts import FOOD_SYSTEM_PROMPT, FOOD_FORMAT_PROMPT
+from src.utils.exceptions import BudgetExceededError
 from src.utils.logger import CustomLogger
+from src.utils.tracing import span
 
 class FoodAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, executor: Optional[str] = None):
         tools = [get_food_info]
         super().__init__(
             tools=tools,
             system_prompt=FOOD_SYSTEM_PROMPT,
-            model_name="gpt-4",
-            temperature=0.7,
-            verbose=False
+            verbose=False,
+            executor=executor
         )
         self.logger = CustomLogger(self.__class__.__name__)
         self.logger.info("FoodAgent initialized")
@@ -23,6 +27,83 @@ class FoodAgent(BaseAgent):
             result = self.process_query(query)
             self.logger.info("Food info retrieved successfully")
             return result
+        except BudgetExceededError:
+            raise
         except Exception as e:
             self.logger.error("Error getting food info", exc_info=e)
-            return f"料理情報の取得に失敗しました: {str(e)}" 
\ No newline at end of file
+            return f"料理情報の取得に失敗しました: {str(e)}" 
+
+    async def aget_food_info(self, city: str) -> str:
+        try:
+            self.logger.info(f"Getting food info for city: {city}")
+            query = f"{city}の料理情報を教えてください"
+            result = await self.aprocess_query(query)
+            self.logger.info("Food info retrieved successfully")
+            return result
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error("Error getting food info", exc_info=e)
+            return f"料理情報の取得に失敗しました: {str(e)}"
+
+    def _format_prompt(self, food_data: dict) -> str:
+        """料理情報を文章にするためのプロンプトを生成"""
+        return FOOD_FORMAT_PROMPT.format(food_info=json.dumps(food_data, ensure_ascii=False, indent=2))
+
+    def get_food_info_direct(self, city: str) -> str:
+        """エージェントを介さずにツールを直接呼び出し、結果をLLM（config.MODEL_ROUTES の "formatting"）で文章にする"""
+        try:
+            self.logger.info(f"Getting food info directly for city: {city}")
+            food_data = get_food_info.invoke({"city": city})
+            with span("FoodAgent.format"):
+                result = llm_router.invoke("formatting", self._format_prompt(food_data), llm_router.is_non_empty)
+            self.logger.info("Food info retrieved successfully")
+            return result
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error("Error getting food info", exc_info=e)
+            return f"料理情報の取得に失敗しました: {str(e)}"
+
+    async def aget_food_info_direct(self, city: str) -> str:
+        """get_food_info_direct の非同期版"""
+        try:
+            self.logger.info(f"Getting food info directly for city: {city}")
+            food_data = await get_food_info.ainvoke({"city": city})
+            with span("FoodAgent.format"):
+                response = await llm_router.ainvoke("formatting", self._format_prompt(food_data), llm_router.is_non_empty)
+            self.logger.info("Food info retrieved successfully")
+            return response
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error("Error getting food info", exc_info=e)
+            return f"料理情報の取得に失敗しました: {str(e)}"
+
+    async def astream_food_info(self, city: str) -> AsyncIterator[StreamEvent]:
+        """指定された都市の料理情報をエージェントで取得し、回答の断片を順に返す"""
+        try:
+            self.logger.info(f"Streaming food info for city: {city}")
+            async for event in self.astream_query(f"{city}の料理情報を教えてください"):
+                yield event
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error("Error getting food info", exc_info=e)
+            yield StreamEvent("token", f"料理情報の取得に失敗しました: {str(e)}")
+
+    async def astream_food_info_direct(self, city: str) -> AsyncIterator[StreamEvent]:
+        """get_food_info_direct のストリーミング版"""
+        try:
+            self.logger.info(f"Streaming food info directly for city: {city}")
+            yield StreamEvent("tool_start", {"tool": get_food_info.name, "input": {"city": city}})
+            food_data = await get_food_info.ainvoke({"city": city})
+            yield StreamEvent("tool_end", {"tool": get_food_info.name})
+            async for chunk in llm_router.get_model("formatting").astream(self._format_prompt(food_data)):
+                if chunk.content:
+                    yield StreamEvent("token", chunk.content)
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error("Error getting food info", exc_info=e)
+            yield StreamEvent("token", f"料理情報の取得に失敗しました: {str(e)}")
@@ -0,0 +1,315 @@
+"""
+AgentExecutor を介さずにツール呼び出しのループを実行するエグゼキューター
+
+OpenAI の tools API（chat.completions）を直接呼び出し、モデルが要求したツールを実行して
+結果を返すことを、モデルがツールを呼び出さなくなるまで繰り返す。AgentExecutor と同じく
+invoke / ainvoke は {"input", "chat_history"} を受け取り {"output": 回答} を返すため、
+BaseAgent から入れ替えて使える（config.AGENT_EXECUTOR = "native"）。
+
+ツールのスキーマとリクエストの共通部分は生成時に一度だけ作り、各ステップでは
+メッセージのリストに辞書を追加するだけにする（プロンプトテンプレートの展開や
+中間ステップからのメッセージの組み立て直しを行わない）。
+
+LangChain のコールバックを通らないため、使用量の集計・スパン・メトリクスは
+src.llm_registry の start_llm_call / end_llm_call で記録する。
+
+1回の応答で要求された複数のツールは、ainvoke / astream では asyncio.gather で、
+invoke ではスレッドプールで同時に実行する。
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src import config
+from src.llm_registry import end_llm_call, get_openai_clients, start_llm_call
+from src.utils.tracing import propagate
+from src.utils.usage import estimate_tokens
+
+# AgentExecutor が反復の上限に達したときと同じ回答
+STOPPED_MESSAGE = "Agent stopped due to iteration limit or time limit."
+
+# LangChain のメッセージの種類 → OpenAI のロール
+_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+# invoke でツールを同時に実行するためのスレッドプール（初回利用時に生成し、エグゼキューター間で共有）
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(max_workers=config.MAX_AGENT_WORKERS, thread_name_prefix="native-tools")
+        return _tool_executor
+
+
+def _to_message_dict(message: Any) -> dict:
+    """チャット履歴の1件（BaseMessage / (ロール, 内容) / 辞書）をAPIのメッセージに変換"""
+    if isinstance(message, dict):
+        return message
+    if isinstance(message, BaseMessage):
+        return {"role": _ROLES.get(message.type, message.type), "content": message.content}
+    role, content = message
+    return {"role": _ROLES.get(role, role), "content": content}
+
+
+def _observation(result: Any) -> str:
+    """ツールの結果をモデルに返す文字列にする（AgentExecutor と同じくJSONにする）"""
+    return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+
+
+def _tool_message(tool_call_id: str, content: str) -> dict:
+    return {"role": "tool", "tool_call_id": tool_call_id, "content": content}
+
+
+def _assistant_message(content: Optional[str], tool_calls: List[Tuple[str, str, str]]) -> dict:
+    return {
+        "role": "assistant",
+        "content": content,
+        "tool_calls": [
+            {"id": tool_call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+            for tool_call_id, name, arguments in tool_calls
+        ]
+    }
+
+
+class NativeToolExecutor:
+    def __init__(
+        self,
+        tools: List[BaseTool],
+        system_prompt: str,
+        model_name: str,
+        temperature: float,
+        max_iterations: int = 15,
+        max_execution_time: Optional[float] = None
+    ):
+        """
+        ツール呼び出しのループを OpenAI SDK で直接実行するエグゼキューター
+
+        Args:
+            tools: エージェントが使用するツールのリスト
+            system_prompt: システムプロンプト
+            model_name: 使用するモデルの名前
+            temperature: 生成時の温度パラメータ
+            max_iterations: LLM呼び出しの回数の上限
+            max_execution_time: 処理時間の上限（秒）。超えた後は次のLLM呼び出しを行わずに止める
+        """
+        self.tools_by_name: Dict[str, BaseTool] = {tool.name: tool for tool in tools}
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_iterations = max_iterations
+        self.max_execution_time = max_execution_time
+        self._system_message = {"role": "system", "content": system_prompt}
+        # 各リクエストで共通の引数（ツールのスキーマの変換は生成時の一度だけ）
+        tool_schemas = [convert_to_openai_tool(tool) for tool in tools]
+        self._request = {"model": model_name, "temperature": temperature, "tools": tool_schemas}
+        # ストリーミング時のプロンプトのトークン数の概算に使う
+        self._tools_tokens = estimate_tokens(json.dumps(tool_schemas, ensure_ascii=False))
+
+    def _messages(self, query: str, chat_history: Optional[List]) -> List[dict]:
+        """最初のリクエストのメッセージ（以降はツール呼び出しと結果を追加していく）"""
+        messages = [self._system_message]
+        if chat_history:
+            messages.extend(map(_to_message_dict, chat_history))
+        messages.append({"role": "user", "content": query})
+        return messages
+
+    def _prepare_tool(self, name: str, arguments: str) -> Tuple[Optional[BaseTool], Any]:
+        """
+        ツールと引数を求める
+
+        Returns:
+            tuple: (ツール, 引数の辞書)。実行できない場合は (None, モデルに返すエラー文)
+        """
+        tool = self.tools_by_name.get(name)
+        if tool is None:
+            return None, f"{name} is not a valid tool, try one of [{', '.join(self.tools_by_name)}]."
+        try:
+            return tool, json.loads(arguments or "{}")
+        except json.JSONDecodeError as e:
+            return None, f"Could not parse tool input: {arguments} because {str(e)}"
+
+    def _run_tool(self, name: str, arguments: str) -> str:
+        tool, tool_input = self._prepare_tool(name, arguments)
+        if tool is None:
+            return tool_input
+        return _observation(tool.invoke(tool_input))
+
+    def _run_tools(self, tool_calls: List[Tuple[str, str, str]]) -> List[str]:
+        """ツールを実行し、結果を tool_calls の順に返す（複数の場合はスレッドプールで同時に実行する）"""
+        if len(tool_calls) == 1:
+            _, name, arguments = tool_calls[0]
+            return [self._run_tool(name, arguments)]
+        # 現在のスパンと使用量の集計先をスレッドに引き継ぐ
+        run_tool = propagate(self._run_tool)
+        futures = [_get_tool_executor().submit(run_tool, name, arguments) for _, name, arguments in tool_calls]
+        return [future.result() for future in futures]
+
+    def _steps(self) -> Iterator[int]:
+        """LLM呼び出しの回数（max_iterations）のうち、処理時間の上限までの分を順に返す"""
+        deadline = None if self.max_execution_time is None else time.monotonic() + self.max_execution_time
+        for step in range(self.max_iterations):
+            if deadline is not None and step and time.monotonic() > deadline:
+                return
+            yield step
+
+    async def _aexecute(self, tool: Optional[BaseTool], tool_input: Any) -> str:
+        if tool is None:
+            return tool_input
+        return _observation(await tool.ainvoke(tool_input))
+
+    async def _arun_tool(self, name: str, arguments: str) -> str:
+        return await self._aexecute(*self._prepare_tool(name, arguments))
+
+    @staticmethod
+    def _end_call(span, model: str, response: Any) -> None:
+        usage = response.usage
+        if usage is None:
+            end_llm_call(span, model)
+        else:
+            end_llm_call(span, model, usage.prompt_tokens, usage.completion_tokens)
+
+    def _create(self, client: Any, messages: List[dict]) -> Any:
+        """LLMを1回呼び出し、アシスタントのメッセージを返す"""
+        span = start_llm_call(self.model_name, self.temperature)
+        try:
+            response = client.chat.completions.create(messages=messages, **self._request)
+        except Exception as e:
+            end_llm_call(span, self.model_name, error=e)
+            raise
+        self._end_call(span, self.model_name, response)
+        return response.choices[0].message
+
+    async def _acreate(self, client: Any, messages: List[dict]) -> Any:
+        """_create の非同期版"""
+        span = start_llm_call(self.model_name, self.temperature)
+        try:
+            response = await client.chat.completions.create(messages=messages, **self._request)
+        except Exception as e:
+            end_llm_call(span, self.model_name, error=e)
+            raise
+        self._end_call(span, self.model_name, response)
+        return response.choices[0].message
+
+    def invoke(self, inputs: dict) -> dict:
+        """
+        クエリを処理する（AgentExecutor.invoke と同じ入出力。1回の応答で要求されたツールは同時に実行する）
+
+        Args:
+            inputs: {"input": クエリ, "chat_history": チャット履歴}
+
+        Returns:
+            dict: {"output": 回答}
+        """
+        client = get_openai_clients()[0]
+        messages = self._messages(inputs["input"], inputs.get("chat_history"))
+        for _ in self._steps():
+            message = self._create(client, messages)
+            if not message.tool_calls:
+                return {"output": message.content or ""}
+
+            tool_calls = [(call.id, call.function.name, call.function.arguments) for call in message.tool_calls]
+            messages.append(_assistant_message(message.content, tool_calls))
+            results = self._run_tools(tool_calls)
+            messages.extend(_tool_message(tool_call[0], result) for tool_call, result in zip(tool_calls, results))
+        return {"output": STOPPED_MESSAGE}
+
+    async def ainvoke(self, inputs: dict) -> dict:
+        """
+        クエリを非同期に処理する（1回の応答で要求されたツールは同時に実行する）
+
+        Args:
+            inputs: {"input": クエリ, "chat_history": チャット履歴}
+
+        Returns:
+            dict: {"output": 回答}
+        """
+        client = get_openai_clients()[1]
+        messages = self._messages(inputs["input"], inputs.get("chat_history"))
+        for _ in self._steps():
+            message = await self._acreate(client, messages)
+            if not message.tool_calls:
+                return {"output": message.content or ""}
+
+            tool_calls = [(call.id, call.function.name, call.function.arguments) for call in message.tool_calls]
+            messages.append(_assistant_message(message.content, tool_calls))
+            results = await asyncio.gather(*(self._arun_tool(name, arguments) for _, name, arguments in tool_calls))
+            messages.extend(_tool_message(tool_call[0], result) for tool_call, result in zip(tool_calls, results))
+        return {"output": STOPPED_MESSAGE}
+
+    def _estimate_prompt_tokens(self, messages: List[dict]) -> int:
+        return self._tools_tokens + sum(
+            estimate_tokens(message["content"]) for message in messages if message.get("content")
+        )
+
+    async def astream(self, query: str, chat_history: Optional[List] = None) -> AsyncIterator:
+        """
+        クエリを処理し、ツールの呼び出しと回答の断片を順に返す
+
+        ストリーミングではAPIがトークン数を返さないため、使用量は概算で記録する。
+
+        Args:
+            query: 処理するクエリ
+            chat_history: チャット履歴（オプション）
+
+        Yields:
+            StreamEvent: "tool_start" / "tool_end" / "token" イベント
+        """
+        # base_agent が本モジュールを読み込むため、循環しないようここで読み込む
+        from src.agents.base_agent import StreamEvent
+
+        client = get_openai_clients()[1]
+        messages = self._messages(query, chat_history)
+        for _ in self._steps():
+            span = start_llm_call(self.model_name, self.temperature)
+            prompt_tokens = self._estimate_prompt_tokens(messages)
+            chunks = 0
+            content: List[str] = []
+            # index → [id, 名前, 引数の断片のリスト]
+            tool_calls: Dict[int, list] = {}
+            try:
+                stream = await client.chat.completions.create(messages=messages, stream=True, **self._request)
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    chunks += 1
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        content.append(delta.content)
+                        yield StreamEvent("token", delta.content)
+                    for call in delta.tool_calls or ():
+                        entry = tool_calls.setdefault(call.index, [None, "", []])
+                        if call.id:
+                            entry[0] = call.id
+                        if call.function is not None:
+                            if call.function.name:
+                                entry[1] += call.function.name
+                            if call.function.arguments:
+                                entry[2].append(call.function.arguments)
+            except Exception as e:
+                end_llm_call(span, self.model_name, error=e)
+                raise
+            end_llm_call(span, self.model_name, prompt_tokens, chunks, estimated=True)
+
+            if not tool_calls:
+                return
+
+            calls = [(entry[0], entry[1], "".join(entry[2])) for _, entry in sorted(tool_calls.items())]
+            messages.append(_assistant_message("".join(content) or None, calls))
+            prepared = [self._prepare_tool(name, arguments) for _, name, arguments in calls]
+            for (_, name, arguments), (tool, tool_input) in zip(calls, prepared):
+                yield StreamEvent("tool_start", {"tool": name, "input": arguments if tool is None else tool_input})
+            results = await asyncio.gather(*(self._aexecute(tool, tool_input) for tool, tool_input in prepared))
+            for (tool_call_id, name, _), result in zip(calls, results):
+                messages.append(_tool_message(tool_call_id, result))
+                yield StreamEvent("tool_end", {"tool": name})
+        yield StreamEvent("token", STOPPED_MESSAGE)
@@ -0,0 +1,48 @@
+"""
+プロセス全体で共有するサブエージェントの管理
+"""
+
+import threading
+from typing import Dict, Tuple, Type, TypeVar
+
+from src.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__)
+
+AgentType = TypeVar("AgentType")
+
+_lock = threading.Lock()
+_agents: Dict[Tuple[type, tuple], object] = {}
+
+
+def get_agent(agent_class: Type[AgentType], **kwargs) -> AgentType:
+    """
+    (エージェントのクラス, 引数) ごとに共有されるエージェントを返す
+
+    初回の呼び出し時に生成し、以降は同じインスタンスを返す。
+
+    Args:
+        agent_class: エージェントのクラス
+        **kwargs: エージェントの初期化引数
+
+    Returns:
+        エージェント（スレッドセーフ）
+    """
+    key = (agent_class, tuple(sorted(kwargs.items())))
+    agent = _agents.get(key)
+    if agent is not None:
+        return agent
+
+    with _lock:
+        agent = _agents.get(key)
+        if agent is None:
+            logger.info(f"Creating shared agent: {agent_class.__name__}")
+            agent = agent_class(**kwargs)
+            _agents[key] = agent
+        return agent
+
+
+def clear() -> None:
+    """共有のエージェントを破棄する（次回の get_agent で作り直される）"""
+    with _lock:
+        _agents.clear()
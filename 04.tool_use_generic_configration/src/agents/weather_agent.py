@@ -2,20 +2,42 @@
 天気情報を取得するエージェント
 """
 
-from .base_agent import BaseAgent
-from ..tools.weather_tools import get_weather
-from ..prompts.weather_prompts import WEATHER_SYSTEM_PROMPT
+import json
+from typing import AsyncIterator, Optional
+from .base_agent import BaseAgent, StreamEvent
+from .. import config, llm_router
+from ..formatters.weather_formatter import WEATHER_TEMPLATES, format_weather
+from ..tools.weather_tools import get_weather, summarize_weather
+from ..prompts.weather_prompts import WEATHER_SYSTEM_PROMPT, WEATHER_FORMAT_PROMPT
+from ..utils.exceptions import BudgetExceededError
 from ..utils.logger import CustomLogger
+from ..utils.tracing import span
 
 class WeatherAgent(BaseAgent):
-    def __init__(self, model_name: str = "gpt-4", temperature: float = 0.7):
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        formatter: str = config.WEATHER_FORMATTER,
+        locale: str = config.WEATHER_LOCALE,
+        executor: Optional[str] = None
+    ):
         """
         天気エージェントの初期化
         
         Args:
-            model_name: 使用するモデルの名前
-            temperature: 生成時の温度パラメータ
+            model_name: 使用するモデルの名前（省略時は config.MODEL_ROUTES の "tool_selection" の設定）
+            temperature: 生成時の温度パラメータ（省略時は "tool_selection" の温度）
+            formatter: 直接呼び出し時の文章化の方式（"template" / "llm"）
+            locale: テンプレートのロケール
+            executor: ツール呼び出しのループの実行方式（"langchain" / "native"。省略時は config.AGENT_EXECUTOR）
         """
+        if formatter not in ("template", "llm"):
+            raise ValueError(f"Unknown weather formatter: {formatter}")
+        if locale not in WEATHER_TEMPLATES:
+            raise ValueError(f"Unknown weather template locale: {locale}")
+        self.formatter = formatter
+        self.locale = locale
         self.logger = CustomLogger(self.__class__.__name__)
         
         # ツールの設定
@@ -27,7 +49,8 @@ class WeatherAgent(BaseAgent):
             system_prompt=WEATHER_SYSTEM_PROMPT,
             model_name=model_name,
             temperature=temperature,
-            verbose=False
+            verbose=False,
+            executor=executor
         )
         
         self.logger.info("WeatherAgent initialized")
@@ -46,6 +69,111 @@ class WeatherAgent(BaseAgent):
             self.logger.info(f"Getting weather info for city: {city}")
             query = f"{city}の天気を教えてください"
             return self.process_query(query)
+        except BudgetExceededError:
+            raise
         except Exception as e:
             self.logger.error(f"Error getting weather info for {city}", exc_info=e)
-            raise 
\ No newline at end of file
+            raise 
+
+    async def aget_weather_info(self, city: str) -> str:
+        """
+        指定された都市の天気情報を非同期に取得する
+        
+        Args:
+            city: 天気情報を取得する都市名
+            
+        Returns:
+            str: 天気情報
+        """
+        try:
+            self.logger.info(f"Getting weather info for city: {city}")
+            query = f"{city}の天気を教えてください"
+            return await self.aprocess_query(query)
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error getting weather info for {city}", exc_info=e)
+            raise
+
+    def _format_prompt(self, city: str, weather_data: dict) -> str:
+        """天気情報を文章にするためのプロンプトを生成"""
+        weather_info = json.dumps(summarize_weather(weather_data, city), ensure_ascii=False, indent=2)
+        return WEATHER_FORMAT_PROMPT.format(weather_info=weather_info)
+
+    def _use_template(self, prose: bool) -> bool:
+        """テンプレートで文章にするか判定（文章での回答を求められた場合はLLMを使う）"""
+        return self.formatter == "template" and not prose
+
+    def get_weather_info_direct(self, city: str, prose: bool = False) -> str:
+        """
+        エージェントを介さずにツールを直接呼び出し、結果を文章にする
+
+        文章化はテンプレートで行い、formatter が "llm" の場合か prose が指定された場合のみ
+        LLM（config.MODEL_ROUTES の "formatting"）で行う。
+        
+        Args:
+            city: 天気情報を取得する都市名
+            prose: LLMによる文章での回答を求めるかどうか
+            
+        Returns:
+            str: 天気情報
+        """
+        try:
+            self.logger.info(f"Getting weather info directly for city: {city}")
+            weather_data = get_weather.invoke({"city": city})
+            with span("WeatherAgent.format", template=self._use_template(prose)):
+                if self._use_template(prose):
+                    return format_weather(summarize_weather(weather_data, city), self.locale)
+                return llm_router.invoke("formatting", self._format_prompt(city, weather_data), llm_router.is_non_empty)
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error getting weather info for {city}", exc_info=e)
+            raise
+
+    async def aget_weather_info_direct(self, city: str, prose: bool = False) -> str:
+        """get_weather_info_direct の非同期版"""
+        try:
+            self.logger.info(f"Getting weather info directly for city: {city}")
+            weather_data = await get_weather.ainvoke({"city": city})
+            with span("WeatherAgent.format", template=self._use_template(prose)):
+                if self._use_template(prose):
+                    return format_weather(summarize_weather(weather_data, city), self.locale)
+                return await llm_router.ainvoke(
+                    "formatting",
+                    self._format_prompt(city, weather_data),
+                    llm_router.is_non_empty
+                )
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error getting weather info for {city}", exc_info=e)
+            raise
+
+    async def astream_weather_info(self, city: str) -> AsyncIterator[StreamEvent]:
+        """
+        指定された都市の天気情報をエージェントで取得し、回答の断片を順に返す
+        
+        Args:
+            city: 天気情報を取得する都市名
+            
+        Yields:
+            StreamEvent: ツールの呼び出しと回答の断片
+        """
+        self.logger.info(f"Streaming weather info for city: {city}")
+        async for event in self.astream_query(f"{city}の天気を教えてください"):
+            yield event
+
+    async def astream_weather_info_direct(self, city: str, prose: bool = False) -> AsyncIterator[StreamEvent]:
+        """get_weather_info_direct のストリーミング版"""
+        self.logger.info(f"Streaming weather info directly for city: {city}")
+        yield StreamEvent("tool_start", {"tool": get_weather.name, "input": {"city": city}})
+        weather_data = await get_weather.ainvoke({"city": city})
+        yield StreamEvent("tool_end", {"tool": get_weather.name})
+
+        if self._use_template(prose):
+            yield StreamEvent("token", format_weather(summarize_weather(weather_data, city), self.locale))
+            return
+        async for chunk in llm_router.get_model("formatting").astream(self._format_prompt(city, weather_data)):
+            if chunk.content:
+                yield StreamEvent("token", chunk.content)
@@ -12,6 +12,23 @@ OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_KEY")
 DEFAULT_MODEL = "gpt-4"
 DEFAULT_TEMPERATURE = 0
 
+# 呼び出しの種類ごとのモデルの選択（src/llm_router.py）
+# models は試す順。先頭の（安く速い）モデルの結果が検証に通らない場合は次のモデルで呼び出し直す
+# （都市名として不正な形式、空の回答、反復の上限での停止など）。ストリーミングでは先頭のモデルのみを使う
+MODEL_ROUTES = {
+    "extraction": {"models": ["gpt-3.5-turbo", "gpt-4"], "temperature": 0},  # 質問文からの都市名の抽出
+    "translation": {"models": ["gpt-3.5-turbo", "gpt-4"], "temperature": 0},  # 都市名の英語への変換
+    "tool_selection": {"models": ["gpt-3.5-turbo", "gpt-4"], "temperature": 0.7},  # サブエージェントのツール選択と回答作成
+    "formatting": {"models": ["gpt-3.5-turbo", "gpt-4"], "temperature": 0.7}  # direct モードでの回答の文章化
+}
+MODEL_ESCALATION_ENABLED = True  # 検証に通らない場合に次のモデルで呼び出し直すかどうか
+
+# LLMクライアント設定（src/llm_registry.py の接続プール）
+LLM_MAX_CONNECTIONS = 20  # 同時接続数の上限
+LLM_MAX_KEEPALIVE_CONNECTIONS = 10  # 保持するアイドル接続数の上限
+LLM_KEEPALIVE_EXPIRY = 60  # アイドル接続を保持する時間（秒）
+LLM_REQUEST_TIMEOUT = 30  # 秒
+
 # ログ設定
 LOG_LEVEL = "DEBUG"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -21,11 +38,103 @@ DEFAULT_CITY = "東京"
 MAX_RETRIES = 3
 TIMEOUT = 30  # 秒
 
+# ツールのHTTP設定（src/utils/http_client.py）
+HTTP_MAX_CONNECTIONS = 20  # 接続先ごとではなくプール全体の上限
+HTTP_BACKOFF_BASE = 0.5  # 再試行の待ち時間の基準値（秒）
+HTTP_BACKOFF_MAX = 8  # 再試行の待ち時間の上限（秒）
+HTTP_MAX_RETRY_AFTER = 30  # Retry-After がこれより長い場合は再試行しない（秒）
+HTTP_USER_AGENT = "practice-langchain-weather-food/1.0"
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # 連続失敗がこの回数に達すると遮断
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30  # 遮断後、試行を再開するまでの時間（秒）
+
+# 並列実行設定
+PARALLEL_AGENTS = True  # サブエージェントを並列に実行するかどうか
+MAX_AGENT_WORKERS = 4  # サブエージェント実行用スレッドの上限
+# "agent": サブエージェントのAgentExecutorがツール選択から回答作成まで行う
+# "direct": 調整役がツールを直接呼び出し、結果をテンプレートまたは1回のLLM呼び出しで文章にする
+DISPATCH_MODE = "agent"
+# direct モードでの天気情報の文章化
+# "template": src/formatters のテンプレートで作成（LLMを呼び出さない）
+# "llm": WEATHER_FORMAT_PROMPT で作成
+# template でも、質問に PROSE_KEYWORDS が含まれる場合はLLMで作成する
+WEATHER_FORMATTER = "template"
+WEATHER_LOCALE = "ja"  # テンプレートのロケール（"ja" / "en"）
+# サブエージェントのツール呼び出しのループの実行方式
+# "langchain": LangChain の AgentExecutor（functions API）
+# "native": src/agents/native_executor.py（OpenAI の tools API を直接呼び出す。1ステップあたりのCPU時間が少ない）
+AGENT_EXECUTOR = "langchain"
+AGENT_MAX_ITERATIONS = 15  # 1クエリでのLLM呼び出しの回数の上限
+
+# バッチ処理設定（CoordinatorAgent.process_batch）
+BATCH_MAX_CONCURRENCY = 8  # 同時に実行する (情報の種類, 都市) の処理数
+
+# サーバー設定（src/server.py）
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+SERVER_MAX_CONCURRENCY = 8  # 同時に処理するクエリ数の上限
+SERVER_MAX_QUEUE = 32  # 処理待ちのクエリ数の上限（超えた場合は429）
+SERVER_QUEUE_TIMEOUT = 10  # 処理待ちの上限（秒、超えた場合は429）
+SERVER_REQUEST_TIMEOUT = 60  # クエリ1件の処理時間の上限（秒、超えた場合は504）
+SERVER_SHUTDOWN_TIMEOUT = 30  # 終了時に処理中のクエリを待つ時間（秒）
+
+# キャッシュ設定
+CACHE_DIR = ".cache"  # ディスクキャッシュの保存先
+WEATHER_CACHE_BACKEND = "memory"  # "memory" / "sqlite" / "none"
+WEATHER_CACHE_TTL = 600  # 秒
+WEATHER_CACHE_MAXSIZE = 256  # 保持する都市数の上限
+# 期限切れ後もこの秒数は古い天気情報を返し、裏で取得し直す（stale-while-revalidate。0 で無効）
+WEATHER_STALE_TTL = 0
+# よく問い合わされる都市の天気情報の先行更新（src/tools/weather_refresher.py。HTTPサーバーの起動中に動作）
+WEATHER_REFRESH_ENABLED = False
+WEATHER_REFRESH_TOP_N = 20  # 先行更新する都市数（問い合わせの多い順）
+WEATHER_REFRESH_INTERVAL = 60  # 確認の間隔（秒）
+WEATHER_REFRESH_AHEAD = 120  # 有効期限までの残りがこの秒数未満になったら取得し直す（確認の間隔より長くする）
+CITY_NAME_CACHE_BACKEND = "sqlite"  # 辞書にない都市名のLLM変換結果の保存方式
+CITY_NAME_CACHE_TTL = 60 * 60 * 24 * 30  # 秒（30日）
+CITY_NAME_CACHE_MAXSIZE = 10000
+WIKIPEDIA_CACHE_BACKEND = "sqlite"  # Wikipediaの検索結果・ページ本文の保存方式
+WIKIPEDIA_CACHE_TTL = 60 * 60 * 24 * 7  # 秒（7日）
+WIKIPEDIA_CACHE_MAXSIZE = 2000
+WIKIPEDIA_SEARCH_WORKERS = 4  # 検索を並列に実行するスレッド数
+RESPONSE_CACHE_BACKEND = "memory"  # 調整役の回答キャッシュの保存方式（"none" で無効）
+RESPONSE_CACHE_TTLS = {
+    "weather": 300,  # 秒（5分）
+    "food": 60 * 60 * 24 * 7  # 秒（7日）
+}
+RESPONSE_CACHE_MAXSIZE = 1024  # 情報の種類ごとに保持する (都市, 回答) の上限
+RESPONSE_CACHE_SEMANTIC = False  # 埋め込みベクトルで言い回しの異なる質問を対応付けるかどうか（numpy が必要）
+RESPONSE_CACHE_EMBEDDING_MODEL = "text-embedding-3-small"
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = 0.92  # 同じ質問とみなすコサイン類似度の下限
+LLM_CACHE_BACKEND = "sqlite"  # 温度0のLLM呼び出しの応答キャッシュの保存方式
+LLM_CACHE_TTL = 60 * 60 * 24  # 秒（1日）
+LLM_CACHE_MAXSIZE = 5000
+FOOD_INDEX_DIR = "data/food_index"  # 料理情報のオフライン索引（存在しない場合はWikipediaのみを使う）
+# 同じ都市・同じ入力の処理が実行中の場合は、新たに実行せずその結果を待つかどうか（src/utils/single_flight.py）
+SINGLE_FLIGHT_ENABLED = True
+
+# トレーシング・メトリクス設定
+TRACING_ENABLED = True  # 処理段階ごとの所要時間をスパンとメトリクスに記録するかどうか
+TRACING_MAX_SPANS = 2000  # メモリに保持する終了済みスパン数の上限
+TRACING_OPENTELEMETRY = False  # スパンをOpenTelemetryにも送るかどうか（opentelemetry-sdk が必要）
+METRICS_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # 所要時間のヒストグラムの境界（秒）
+
+# LLMの使用量・料金設定（src/utils/usage.py）
+# モデルごとの料金（USD / 1,000トークン）: (プロンプト, 補完)。モデル名は前方一致でも引く
+LLM_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-3.5-turbo": (0.0005, 0.0015)
+}
+QUERY_TOKEN_BUDGET = None  # 1クエリあたりのトークン数の上限（None の場合は制限しない）
+QUERY_COST_BUDGET = None  # 1クエリあたりの推定料金の上限（USD。None の場合は制限しない）
+
 # エラーメッセージ
 ERROR_MESSAGES = {
     "api_key_missing": "APIキーが設定されていません。",
     "weather_api_error": "天気情報の取得に失敗しました。",
     "food_api_error": "料理情報の取得に失敗しました。",
     "invalid_city": "指定された都市が見つかりません。",
-    "no_information": "情報が見つかりませんでした。"
+    "no_information": "情報が見つかりませんでした。",
+    "timeout": "処理がタイムアウトしました。",
+    "budget_exceeded": "使用量の上限に達したため、処理を中断しました。"
 } 
\ No newline at end of file
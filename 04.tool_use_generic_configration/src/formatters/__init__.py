@@ -0,0 +1,10 @@
+"""
+Formatters package for weather and food information retrieval system.
+"""
+
+from .weather_formatter import WEATHER_TEMPLATES, format_weather
+
+__all__ = [
+    'WEATHER_TEMPLATES',
+    'format_weather'
+]
@@ -0,0 +1,34 @@
+"""
+天気情報をテンプレートで文章にするフォーマッター
+
+summarize_weather の結果（city, temperature, description, humidity, wind_speed）を
+ロケールごとのテンプレートに当てはめる。LLMを呼び出さないため、結果は常に同じ形式になる。
+"""
+
+from typing import Dict
+
+# ロケールごとのテンプレート（str.format の書式。単位は OpenWeather の metric）
+WEATHER_TEMPLATES: Dict[str, str] = {
+    "ja": "{city}の現在の天気は{description}です。気温は{temperature:.1f}℃、湿度は{humidity}%、風速は{wind_speed:.1f}m/sです。",
+    "en": "Current weather in {city}: {description}, {temperature:.1f}°C, humidity {humidity}%, wind {wind_speed:.1f} m/s."
+}
+
+
+def format_weather(summary: dict, locale: str = "ja") -> str:
+    """
+    天気情報をテンプレートで文章にする
+
+    Args:
+        summary: summarize_weather の結果
+        locale: テンプレートのロケール（WEATHER_TEMPLATES のキー）
+
+    Returns:
+        str: 天気情報の文章
+
+    Raises:
+        ValueError: テンプレートが登録されていないロケールの場合
+    """
+    template = WEATHER_TEMPLATES.get(locale)
+    if template is None:
+        raise ValueError(f"Unknown weather template locale: {locale}")
+    return template.format(**summary)
@@ -0,0 +1,526 @@
+"""
+プロセス全体で共有するLLMクライアントの管理
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import httpx
+from langchain_core.caches import BaseCache as BaseLLMCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import ChatGeneration, ChatResult, Generation, LLMResult
+
+from src import config
+from src.utils.cache import BaseCache, create_cache
+from src.utils.logger import CustomLogger
+from src.utils.metrics import LLM_REQUESTS, LLM_TOKENS
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import Span, tracer
+from src.utils.usage import current_accountant, current_agent, estimate_tokens
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = CustomLogger(__name__)
+
+
+class LLMResponseCache(BaseLLMCache):
+    def __init__(self, cache: BaseCache):
+        """
+        LLMの応答キャッシュ（LangChainのキャッシュインターフェースを src.utils.cache で実装）
+
+        キーはプロンプト（メッセージ列）と llm_string（モデル名・パラメータ・ツール定義）の
+        ハッシュで、同じ入力に対する温度0の呼び出しの応答を再利用する。
+
+        Args:
+            cache: 応答を保存するキャッシュ
+        """
+        self.cache = cache
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        value = self.cache.get(self._key(prompt, llm_string))
+        if value is None:
+            return None
+        return [loads(generation) for generation in value]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.cache.set(self._key(prompt, llm_string), [dumps(generation) for generation in return_val])
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs) -> None:
+        self.cache.clear()
+
+
+def _model_name(invocation_params: Optional[dict]) -> str:
+    params = invocation_params or {}
+    return params.get("model") or params.get("model_name") or "unknown"
+
+
+def _start_span(model: str, temperature: Optional[float]) -> Optional[Span]:
+    return tracer.start_span(f"llm.{model}", **{"llm.model": model, "llm.temperature": temperature})
+
+
+def _end_span(span: Span, usage: dict, estimated: bool = False, error: Optional[BaseException] = None) -> None:
+    """LLM呼び出しのスパンを終了し、呼び出し回数とトークン数をメトリクスに記録する"""
+    model = span.attributes["llm.model"]
+    LLM_REQUESTS.inc(model=model)
+    if error is not None:
+        tracer.end_span(span, error)
+        return
+    if estimated:
+        span.set_attribute("llm.usage.estimated", True)
+    for token_type in ("prompt", "completion"):
+        count = usage.get(f"{token_type}_tokens")
+        if count:
+            LLM_TOKENS.inc(count, model=model, type=token_type)
+            span.set_attribute(f"llm.usage.{token_type}_tokens", count)
+    tracer.end_span(span)
+
+
+def start_llm_call(model: str, temperature: Optional[float] = None) -> Optional[Span]:
+    """
+    LangChainのコールバックを通らないLLM呼び出し（OpenAI SDKの直接呼び出し）の開始を記録する
+
+    コールバックと同じく、クエリが使用量の上限に達している場合は BudgetExceededError を送出する。
+
+    Args:
+        model: モデル名
+        temperature: 生成時の温度パラメータ
+
+    Returns:
+        Optional[Span]: 呼び出しのスパン（現在のスパンには設定しない）。トレーシングが無効の場合はNone
+    """
+    accountant = current_accountant()
+    if accountant is not None:
+        accountant.check_budget()
+    return _start_span(model, temperature)
+
+
+def end_llm_call(
+    span: Optional[Span],
+    model: str,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    estimated: bool = False,
+    error: Optional[BaseException] = None
+) -> None:
+    """
+    start_llm_call で開始した呼び出しの終了を記録する（使用量の集計・スパン・メトリクス）
+
+    Args:
+        span: start_llm_call が返したスパン
+        model: モデル名
+        prompt_tokens: プロンプトのトークン数
+        completion_tokens: 補完のトークン数
+        estimated: トークン数が概算かどうか
+        error: 呼び出しが失敗した場合の例外
+    """
+    accountant = current_accountant()
+    if accountant is not None and error is None:
+        accountant.record(model, prompt_tokens, completion_tokens, estimated=estimated)
+    if span is not None:
+        _end_span(
+            span,
+            {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+            estimated=estimated,
+            error=error
+        )
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    LLM呼び出しのトークン数と推定料金を現在のクエリの UsageAccountant に集計するコールバック
+
+    ストリーミングではAPIがトークン数を返さないため、プロンプトは文字数から概算し、
+    補完は受信した断片の数で数える。概算したトークン数は LLMResult.llm_output の
+    token_usage に書き込み（token_usage_estimated を付ける）、後続のコールバックでも使えるようにする。
+    キャッシュから応答した呼び出しはトークン数0として扱う。
+
+    クエリが使用量の上限に達している場合は、LLM呼び出しの開始時に BudgetExceededError を送出する。
+    """
+
+    # 呼び出し元と同じコンテキストで実行し、呼び出し元の集計先とエージェント名を使う
+    run_inline = True
+    # 上限に達したときの例外を呼び出し元まで伝える
+    raise_error = True
+
+    def __init__(self):
+        # run_id → [集計先, エージェント名, モデル名, プロンプトの概算トークン数, 受信した断片の数]
+        self._runs: Dict[UUID, list] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, texts: List[str], invocation_params: Optional[dict]) -> None:
+        accountant = current_accountant()
+        if accountant is not None:
+            accountant.check_budget()
+        params = invocation_params or {}
+        # 関数・ツールの定義もプロンプトとして送られる
+        definitions = [params[key] for key in ("functions", "tools") if params.get(key)]
+        prompt_tokens = sum(estimate_tokens(text) for text in texts) + estimate_tokens(json.dumps(definitions))
+        with self._lock:
+            self._runs[run_id] = [accountant, current_agent(), _model_name(params), prompt_tokens, 0]
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        texts = [str(message.content) for batch in messages for message in batch]
+        self._start(run_id, texts, kwargs.get("invocation_params"))
+
+    def on_llm_start(self, serialized: dict, prompts: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, list(prompts), kwargs.get("invocation_params"))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run[4] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        accountant, agent, model, prompt_tokens, streamed = run
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        estimated = False
+        if not usage and streamed:
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": streamed, "total_tokens": prompt_tokens + streamed}
+            response.llm_output = {**(response.llm_output or {}), "token_usage": usage, "token_usage_estimated": True}
+            estimated = True
+        if accountant is not None:
+            accountant.record(
+                model,
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                agent=agent,
+                estimated=estimated
+            )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LLM呼び出しをスパン（llm.<モデル名>）とメトリクスに記録するコールバック
+
+    トークン数は llm_output の token_usage から記録する（ストリーミングでは
+    UsageCallbackHandler が書き込んだ概算値を使う）。
+    """
+
+    # 呼び出し元と同じコンテキストで実行し、呼び出し元の現在のスパンを親にする
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, invocation_params: Optional[dict]) -> None:
+        span = _start_span(_model_name(invocation_params), (invocation_params or {}).get("temperature"))
+        if span is not None:
+            with self._lock:
+                self._spans[run_id] = span
+
+    def _pop(self, run_id: UUID) -> Optional[Span]:
+        with self._lock:
+            return self._spans.pop(run_id, None)
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, kwargs.get("invocation_params"))
+
+    def on_llm_start(self, serialized: dict, prompts: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, kwargs.get("invocation_params"))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            span = self._spans.get(run_id)
+        if span is not None and not span.events:
+            span.add_event("first_token")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._pop(run_id)
+        if span is None:
+            return
+        llm_output = response.llm_output or {}
+        _end_span(span, llm_output.get("token_usage") or {}, estimated=bool(llm_output.get("token_usage_estimated")))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._pop(run_id)
+        if span is not None:
+            _end_span(span, {}, error=error)
+
+
+_lock = threading.Lock()
+_models: Dict[Tuple[str, float], "ChatOpenAI"] = {}
+_http_client: Optional[httpx.Client] = None
+# 非同期クライアントの接続は作成したイベントループでしか使えないため、ループごとに作る
+_async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_openai_clients: Optional[tuple] = None
+_chat_model_class: Optional[type] = None
+_settings = {
+    "max_connections": config.LLM_MAX_CONNECTIONS,
+    "max_keepalive_connections": config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+    "keepalive_expiry": config.LLM_KEEPALIVE_EXPIRY,
+    "timeout": config.LLM_REQUEST_TIMEOUT
+}
+# 温度0のモデルが共有する応答キャッシュ
+llm_cache = LLMResponseCache(create_cache(
+    config.LLM_CACHE_BACKEND,
+    ttl=config.LLM_CACHE_TTL,
+    maxsize=config.LLM_CACHE_MAXSIZE,
+    path=os.path.join(config.CACHE_DIR, "llm_responses.sqlite3"),
+    name="llm"
+))
+# 温度0のモデルの、同じ入力で実行中の呼び出しに相乗りする（キー: 応答キャッシュと同じ）
+llm_flight = SingleFlight("llm")
+# すべてのモデルが共有する使用量集計・トレーシング用のコールバック（使用量を先に集計する）
+usage_callback = UsageCallbackHandler()
+tracing_callback = TracingCallbackHandler()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_settings["max_connections"],
+        max_keepalive_connections=_settings["max_keepalive_connections"],
+        keepalive_expiry=_settings["keepalive_expiry"]
+    )
+
+
+def _async_openai_client() -> Any:
+    """実行中のイベントループの AsyncOpenAI を返す（イベントループ内で呼び出す）"""
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is not None:
+        return client
+
+    import openai
+
+    with _lock:
+        client = _async_openai_clients.get(loop)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                api_key=os.environ["OPEN_AI_KEY"],
+                http_client=httpx.AsyncClient(limits=_limits(), timeout=_settings["timeout"])
+            )
+            _async_openai_clients[loop] = client
+        return client
+
+
+class _LoopLocalAsyncClient:
+    def __init__(self, path: Tuple[str, ...] = ()):
+        """
+        属性の参照を、実行中のイベントループの AsyncOpenAI（の path の属性）に委譲する
+
+        ChatOpenAI は生成時に受け取った非同期クライアントを使い続けるため、ループごとの
+        クライアントを呼び出し時に選べるよう、クライアントの代わりにこれを渡す。
+
+        Args:
+            path: 委譲先の属性の経路（("chat", "completions") など）
+        """
+        self._path = path
+
+    def __getattr__(self, name: str) -> Any:
+        # copy などによる特殊メソッドの参照はイベントループの外でも行われるため委譲しない
+        if name.startswith("__"):
+            raise AttributeError(name)
+        target = _async_openai_client()
+        for attribute in self._path:
+            target = getattr(target, attribute)
+        return getattr(target, name)
+
+
+def _create_openai_clients() -> tuple:
+    """共有のHTTP接続プールを使うOpenAIクライアント（同期・非同期）を生成（ロック取得済みで呼び出す）"""
+    global _http_client, _openai_clients
+
+    # openai は読み込みに時間がかかるため、最初のクライアント生成時に読み込む
+    import openai
+
+    if _openai_clients is None:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=_settings["timeout"])
+        _openai_clients = (
+            openai.OpenAI(api_key=os.environ["OPEN_AI_KEY"], http_client=_http_client),
+            _LoopLocalAsyncClient()
+        )
+    return _openai_clients
+
+
+def _shared_result(result: ChatResult) -> ChatResult:
+    """
+    実行中の呼び出しに相乗りした呼び出し元に返す結果
+
+    LangChain が呼び出し元ごとにメッセージを書き換えるため複製する。APIを呼び出していないので、
+    キャッシュからの応答と同じくトークン数は0とする。
+    """
+    return ChatResult(
+        generations=[
+            ChatGeneration(message=generation.message.copy(), generation_info=generation.generation_info)
+            for generation in result.generations
+        ],
+        llm_output={**(result.llm_output or {}), "token_usage": {}}
+    )
+
+
+def _chat_model_type() -> type:
+    """温度0の同じ入力の同時呼び出しを1回にまとめる ChatOpenAI のサブクラス（ロック取得済みで呼び出す）"""
+    global _chat_model_class
+
+    if _chat_model_class is not None:
+        return _chat_model_class
+
+    # langchain_openai は読み込みに時間がかかるため、最初のモデル生成時に読み込む
+    from langchain_openai import ChatOpenAI
+
+    class CoalescingChatOpenAI(ChatOpenAI):
+        def _flight_key(self, messages: list, stop: Optional[List[str]], kwargs: dict) -> str:
+            return LLMResponseCache._key(dumps(messages), self._get_llm_string(stop=stop, **kwargs))
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            if self.temperature != 0:
+                return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            executed = []
+
+            def generate() -> ChatResult:
+                executed.append(True)
+                return ChatOpenAI._generate(self, messages, stop=stop, run_manager=run_manager, **kwargs)
+
+            result = llm_flight.do(self._flight_key(messages, stop, kwargs), generate)
+            return result if executed else _shared_result(result)
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            if self.temperature != 0:
+                return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            executed = []
+
+            async def agenerate() -> ChatResult:
+                executed.append(True)
+                return await ChatOpenAI._agenerate(self, messages, stop=stop, run_manager=run_manager, **kwargs)
+
+            result = await llm_flight.ado(self._flight_key(messages, stop, kwargs), agenerate)
+            return result if executed else _shared_result(result)
+
+    _chat_model_class = CoalescingChatOpenAI
+    return _chat_model_class
+
+
+def _create_model(model_name: str, temperature: float) -> "ChatOpenAI":
+    """共有のHTTP接続プールを使うモデルを生成（ロック取得済みで呼び出す）"""
+    chat_model_type = _chat_model_type()
+    client, _ = _create_openai_clients()
+    # ChatOpenAI に同期・非同期それぞれのクライアントを渡し、接続プールを共有させる
+    # 応答が決まる温度0の呼び出しのみ応答キャッシュと同時呼び出しのまとめを使う
+    return chat_model_type(
+        model_name=model_name,
+        temperature=temperature,
+        api_key=os.environ["OPEN_AI_KEY"],
+        cache=llm_cache if temperature == 0 else False,
+        callbacks=[usage_callback, tracing_callback] if config.TRACING_ENABLED else [usage_callback],
+        client=client.chat.completions,
+        async_client=_LoopLocalAsyncClient(("chat", "completions"))
+    )
+
+
+def get_openai_clients() -> tuple:
+    """
+    LangChainを介さずにAPIを呼び出すためのOpenAIクライアントを返す
+
+    共有のモデルと同じHTTP接続プールを使う。非同期のクライアントは、呼び出し時に実行中の
+    イベントループのものに委譲する。
+
+    Returns:
+        Tuple[openai.OpenAI, openai.AsyncOpenAI]: 同期・非同期のクライアント
+    """
+    clients = _openai_clients
+    if clients is not None:
+        return clients
+    with _lock:
+        return _create_openai_clients()
+
+
+def get_chat_model(model_name: str = config.DEFAULT_MODEL, temperature: float = config.DEFAULT_TEMPERATURE) -> "ChatOpenAI":
+    """
+    (モデル名, 温度) ごとに共有されるモデルを返す
+
+    Args:
+        model_name: 使用するモデルの名前
+        temperature: 生成時の温度パラメータ
+
+    Returns:
+        ChatOpenAI: 共有のモデル（スレッドセーフ）
+    """
+    key = (model_name, float(temperature))
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            logger.info(f"Creating shared chat model: {model_name} (temperature={temperature})")
+            model = _create_model(model_name, temperature)
+            _models[key] = model
+        return model
+
+
+def configure(
+    max_connections: Optional[int] = None,
+    max_keepalive_connections: Optional[int] = None,
+    keepalive_expiry: Optional[float] = None,
+    timeout: Optional[float] = None
+) -> None:
+    """
+    接続プールの設定を変更する
+
+    既存のモデルと接続は破棄され、次回の get_chat_model で新しい設定のものが作られる。
+    指定しなかった項目は現在の値を引き継ぐ。
+
+    Args:
+        max_connections: 同時接続数の上限
+        max_keepalive_connections: 保持するアイドル接続数の上限
+        keepalive_expiry: アイドル接続を保持する時間（秒）
+        timeout: リクエストのタイムアウト（秒）
+    """
+    global _http_client, _openai_clients
+
+    overrides = {
+        "max_connections": max_connections,
+        "max_keepalive_connections": max_keepalive_connections,
+        "keepalive_expiry": keepalive_expiry,
+        "timeout": timeout
+    }
+    with _lock:
+        _settings.update({name: value for name, value in overrides.items() if value is not None})
+        _models.clear()
+        if _http_client is not None:
+            _http_client.close()
+        # 非同期クライアントはイベントループ外で閉じられないため参照のみ破棄する
+        _http_client = None
+        _async_openai_clients.clear()
+        _openai_clients = None
+    logger.info(f"LLM client registry reconfigured: {_settings}")
+
+
+def set_llm_cache(cache: BaseCache) -> None:
+    """
+    LLMの応答キャッシュの保存先を差し替える（共有のモデルすべてに反映される）
+
+    Args:
+        cache: 応答を保存するキャッシュ
+    """
+    llm_cache.cache = cache
@@ -0,0 +1,206 @@
+"""
+呼び出しの種類ごとのモデルの選択（モデルルーター）
+
+都市名の抽出・英語変換、サブエージェントのツール選択、回答の文章化など、LLM呼び出しを
+種類（call_class）ごとに分け、config.MODEL_ROUTES の (試す順のモデル, 温度) で呼び出す。
+
+多くの呼び出しは安く速いモデルで十分なため先頭のモデルで呼び出し、結果が呼び出し元の
+検証に通らない場合（都市名として不正な形式、空の回答など）のみ次のモデルで呼び出し直す。
+最後のモデルでも検証に通らない場合はその結果をそのまま返し、扱いは呼び出し元に任せる。
+API のエラーや使用量の上限の例外ではモデルを切り替えずにそのまま送出する。
+
+使い方:
+    city = invoke("extraction", prompt, validate=is_valid_city)
+    output = escalate("tool_selection", lambda model: run_agent(model), validate=is_valid_output)
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from src import config
+from src.llm_registry import get_chat_model
+from src.utils.logger import CustomLogger
+from src.utils.metrics import LLM_ESCALATIONS
+from src.utils.tracing import add_event
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = CustomLogger(__name__)
+
+
+class Route(NamedTuple):
+    """呼び出しの種類ごとの設定（models は試す順）"""
+    models: Tuple[str, ...]
+    temperature: float
+
+
+def get_route(call_class: str) -> Route:
+    """
+    呼び出しの種類の設定を返す（config.MODEL_ROUTES を呼び出しのたびに参照する）
+
+    Args:
+        call_class: 呼び出しの種類（"extraction" / "translation" / "tool_selection" / "formatting"）
+
+    Returns:
+        Route: 試す順のモデルと温度
+    """
+    route = config.MODEL_ROUTES.get(call_class)
+    if route is None or not route.get("models"):
+        raise ValueError(f"Unknown call class: {call_class}")
+    return Route(tuple(route["models"]), route.get("temperature", config.DEFAULT_TEMPERATURE))
+
+
+def _models(call_class: str, models: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """試すモデルの列（エスカレーションが無効の場合は先頭のモデルのみ）"""
+    models = tuple(models) if models else get_route(call_class).models
+    return models if config.MODEL_ESCALATION_ENABLED else models[:1]
+
+
+def get_model(call_class: str, level: int = 0) -> "ChatOpenAI":
+    """
+    呼び出しの種類の level 番目のモデルを返す（ストリーミングなど、呼び出し直せない場合に使う）
+
+    Args:
+        call_class: 呼び出しの種類
+        level: 何番目のモデルか
+
+    Returns:
+        ChatOpenAI: 共有のモデル
+    """
+    route = get_route(call_class)
+    return get_chat_model(route.models[level], route.temperature)
+
+
+def is_non_empty(text: str) -> bool:
+    """空白以外を含む回答かどうか（文章化の検証に使う）"""
+    return bool(text and text.strip())
+
+
+def _escalated(call_class: str, model: str, next_model: str) -> None:
+    logger.info(f"Output of {model} failed validation for {call_class}, escalating to {next_model}")
+    LLM_ESCALATIONS.inc(call_class=call_class, model=model)
+    add_event("llm.escalate", call_class=call_class, model=model, next_model=next_model)
+
+
+def escalate(
+    call_class: str,
+    call: Callable[[str], Any],
+    validate: Optional[Callable[[Any], bool]] = None,
+    models: Optional[Sequence[str]] = None
+) -> Any:
+    """
+    検証に通るまでモデルを順に切り替えて call を実行する
+
+    Args:
+        call_class: 呼び出しの種類
+        call: モデル名を受け取って1回分の処理を行う関数
+        validate: 結果を受け取り、採用してよいかを返す関数（省略時は先頭のモデルの結果を採用する）
+        models: 試すモデルの列（省略時は call_class の設定）
+
+    Returns:
+        検証に通った結果（どのモデルでも通らない場合は最後のモデルの結果）
+    """
+    models = _models(call_class, models)
+    for level, model in enumerate(models):
+        result = call(model)
+        if validate is None or validate(result) or level == len(models) - 1:
+            return result
+        _escalated(call_class, model, models[level + 1])
+
+
+async def aescalate(
+    call_class: str,
+    call: Callable[[str], Awaitable[Any]],
+    validate: Optional[Callable[[Any], bool]] = None,
+    models: Optional[Sequence[str]] = None
+) -> Any:
+    """escalate の非同期版（call はモデル名を受け取るコルーチン関数）"""
+    models = _models(call_class, models)
+    for level, model in enumerate(models):
+        result = await call(model)
+        if validate is None or validate(result) or level == len(models) - 1:
+            return result
+        _escalated(call_class, model, models[level + 1])
+
+
+def invoke(call_class: str, prompt: Any, validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    呼び出しの種類の設定でLLMを呼び出し、回答の文字列を返す
+
+    Args:
+        call_class: 呼び出しの種類
+        prompt: プロンプト（文字列またはメッセージのリスト）
+        validate: 回答の文字列を受け取り、採用してよいかを返す関数
+
+    Returns:
+        str: 回答
+    """
+    temperature = get_route(call_class).temperature
+    return escalate(
+        call_class,
+        lambda model: get_chat_model(model, temperature).invoke(prompt).content,
+        validate
+    )
+
+
+async def ainvoke(call_class: str, prompt: Any, validate: Optional[Callable[[str], bool]] = None) -> str:
+    """invoke の非同期版"""
+    temperature = get_route(call_class).temperature
+
+    async def call(model: str) -> str:
+        response = await get_chat_model(model, temperature).ainvoke(prompt)
+        return response.content
+
+    return await aescalate(call_class, call, validate)
+
+
+async def abatch(
+    call_class: str,
+    prompts: List[Any],
+    validate: Optional[Callable[[str], bool]] = None,
+    max_concurrency: int = config.BATCH_MAX_CONCURRENCY
+) -> List[Union[str, Exception]]:
+    """
+    複数のプロンプトを先頭のモデルでまとめて呼び出し、検証に通らなかったものだけを次のモデルで呼び出し直す
+
+    Args:
+        call_class: 呼び出しの種類
+        prompts: プロンプトのリスト
+        validate: 回答の文字列を受け取り、採用してよいかを返す関数
+        max_concurrency: 同時リクエスト数の上限
+
+    Returns:
+        List[Union[str, Exception]]: プロンプトと同じ順の回答（失敗したものは例外）
+    """
+    models = _models(call_class, None)
+    temperature = get_route(call_class).temperature
+    responses = await get_chat_model(models[0], temperature).abatch(
+        prompts,
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True
+    )
+    results = [response if isinstance(response, Exception) else response.content for response in responses]
+    if validate is None or len(models) == 1:
+        return results
+
+    retry = [i for i, result in enumerate(results) if not isinstance(result, Exception) and not validate(result)]
+    if not retry:
+        return results
+    for _ in retry:
+        _escalated(call_class, models[0], models[1])
+
+    async def call(model: str, prompt: Any) -> str:
+        response = await get_chat_model(model, temperature).ainvoke(prompt)
+        return response.content
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def retry_one(prompt: Any) -> str:
+        async with semaphore:
+            return await aescalate(call_class, lambda model: call(model, prompt), validate, models[1:])
+
+    retried = await asyncio.gather(*(retry_one(prompts[i]) for i in retry), return_exceptions=True)
+    for i, result in zip(retry, retried):
+        results[i] = result
+    return results
@@ -6,6 +6,29 @@ from src.agents.coordinator_agent import CoordinatorAgent
 from src.utils.logger import CustomLogger
 from dotenv import load_dotenv
 
+def render_stream(coordinator: CoordinatorAgent, query: str) -> None:
+    """
+    回答を届いた順に表示する
+
+    回答が始まるまではツールの呼び出し状況を表示し、回答の断片は届いたそばから出力する。
+    """
+    answering = False
+    for event in coordinator.stream_query(query):
+        if event.type == "token":
+            if not answering:
+                print("\n回答: ", end="")
+                answering = True
+            print(event.data, end="", flush=True)
+        elif answering:
+            continue
+        elif event.type == "city":
+            print(f"\n[都市: {event.data}]", flush=True)
+        elif event.type == "tool_start":
+            print(f"[{event.data['tool']} を実行中...]", flush=True)
+        elif event.type == "tool_end":
+            print(f"[{event.data['tool']} が完了しました]", flush=True)
+    print()
+
 def main():
     # 環境変数の読み込み
     load_dotenv()
@@ -32,9 +55,8 @@ def main():
             if not user_input:
                 continue
             
-            # クエリの処理
-            response = coordinator.process_query(user_input)
-            print("\n回答:", response)
+            # クエリの処理（回答を逐次表示）
+            render_stream(coordinator, user_input)
             
     except KeyboardInterrupt:
         logger.info("Application terminated by keyboard interrupt")
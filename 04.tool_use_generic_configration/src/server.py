@@ -0,0 +1,318 @@
+"""
+調整役エージェントのHTTPサーバー（ASGI）
+
+プロセスごとに1つの CoordinatorAgent を起動時に生成して使い回す。
+
+エンドポイント:
+    POST /query         {"query": "..."} -> {"query": "...", "answer": "...", "usage": {...}}
+    POST /query/stream  {"query": "..."} -> Server-Sent Events（event: イベントの種類, data: JSON）
+    GET  /health        処理中・処理待ちのクエリ数（先行更新が有効な場合はその状況も）
+    GET  /metrics       処理段階ごとの所要時間・LLMのトークン数・キャッシュのヒット数（Prometheus形式）
+
+同時に処理するクエリ数は SERVER_MAX_CONCURRENCY で制限し、処理待ちが SERVER_MAX_QUEUE 件を
+超えるか SERVER_QUEUE_TIMEOUT 秒以上待った場合は 429 を返す。
+WEATHER_REFRESH_ENABLED の場合は、起動中によく問い合わされる都市の天気情報を先行更新する。
+
+使い方:
+    python -m src.server
+    uvicorn src.server:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+from src import config
+from src.agents.coordinator_agent import CoordinatorAgent
+from src.tools.weather_refresher import WeatherRefresher, hot_cities
+from src.utils.exceptions import ServerOverloadedError
+from src.utils.logger import CustomLogger
+from src.utils.metrics import registry as metrics_registry
+
+logger = CustomLogger(__name__)
+
+MAX_BODY_SIZE = 64 * 1024  # リクエストボディの上限（バイト）
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        """
+        同時実行数の制限と処理待ちの管理
+
+        Args:
+            max_concurrency: 同時に処理するクエリ数の上限
+            max_queue: 処理待ちのクエリ数の上限
+            queue_timeout: 処理待ちの上限（秒）
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        # イベントループ内で生成する（古いPythonではモジュール読み込み時のループに紐付くため）
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        処理枠を確保する
+
+        Raises:
+            ServerOverloadedError: 処理待ちが上限に達しているか、待ち時間が上限を超えた場合
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise ServerOverloadedError("処理待ちのクエリが上限に達しています")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ServerOverloadedError("処理待ちの時間が上限を超えました")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def idle(self) -> bool:
+        return self.active == 0 and self.waiting == 0
+
+
+class CoordinatorServer:
+    def __init__(
+        self,
+        max_concurrency: int = config.SERVER_MAX_CONCURRENCY,
+        max_queue: int = config.SERVER_MAX_QUEUE,
+        queue_timeout: float = config.SERVER_QUEUE_TIMEOUT,
+        request_timeout: float = config.SERVER_REQUEST_TIMEOUT,
+        shutdown_timeout: float = config.SERVER_SHUTDOWN_TIMEOUT
+    ):
+        """
+        ASGIアプリケーションの初期化
+
+        Args:
+            max_concurrency: 同時に処理するクエリ数の上限
+            max_queue: 処理待ちのクエリ数の上限（超えた場合は429）
+            queue_timeout: 処理待ちの上限（秒、超えた場合は429）
+            request_timeout: クエリ1件の処理時間の上限（秒、超えた場合は504）
+            shutdown_timeout: 終了時に処理中のクエリを待つ時間（秒）
+        """
+        self.limiter = ConcurrencyLimiter(max_concurrency, max_queue, queue_timeout)
+        self.request_timeout = request_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.coordinator: Optional[CoordinatorAgent] = None
+        self.weather_refresher = WeatherRefresher(hot_cities) if config.WEATHER_REFRESH_ENABLED else None
+        self.accepting = True
+
+    def _get_coordinator(self) -> CoordinatorAgent:
+        """起動時に生成した調整役エージェントを返す（lifespan 非対応のサーバーでは初回に生成）"""
+        if self.coordinator is None:
+            self.coordinator = CoordinatorAgent()
+            if self.weather_refresher is not None:
+                self.weather_refresher.start()
+        return self.coordinator
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    self._get_coordinator()
+                    logger.info("Server started")
+                    await send({"type": "lifespan.startup.complete"})
+                except Exception as e:
+                    logger.error("Error starting server", exc_info=e)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def shutdown(self) -> None:
+        """新しいクエリの受け付けを止め、処理中のクエリの完了を待ってから終了する"""
+        self.accepting = False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.shutdown_timeout
+        while not self.limiter.idle() and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        if not self.limiter.idle():
+            logger.warning(f"Shutting down with {self.limiter.active} queries in progress")
+        if self.weather_refresher is not None:
+            await self.weather_refresher.stop()
+        if self.coordinator is not None:
+            self.coordinator.close()
+            self.coordinator = None
+        logger.info("Server stopped")
+
+    async def _http(self, scope: dict, receive, send) -> None:
+        method, path = scope["method"], scope["path"]
+        if path == "/health" and method == "GET":
+            health = {
+                "status": "ok" if self.accepting else "shutting_down",
+                "active": self.limiter.active,
+                "waiting": self.limiter.waiting
+            }
+            if self.weather_refresher is not None:
+                health["weather_refresher"] = self.weather_refresher.stats()
+            await self._send_json(send, 200, health)
+            return
+        if path == "/metrics" and method == "GET":
+            await self._send_text(send, 200, metrics_registry.render(), b"text/plain; version=0.0.4; charset=utf-8")
+            return
+        if path not in ("/query", "/query/stream"):
+            await self._send_json(send, 404, {"error": "見つかりません"})
+            return
+        if method != "POST":
+            await self._send_json(send, 405, {"error": "POSTで送信してください"}, [(b"allow", b"POST")])
+            return
+        if not self.accepting:
+            await self._send_json(send, 503, {"error": "サーバーを終了しています"})
+            return
+
+        query, error = await self._read_query(receive)
+        if error is not None:
+            await self._send_json(send, error[0], {"error": error[1]})
+            return
+
+        try:
+            async with self.limiter.slot():
+                if path == "/query":
+                    await self._handle_query(send, query)
+                else:
+                    await self._handle_stream(send, query)
+        except ServerOverloadedError as e:
+            logger.warning(f"Request rejected: {str(e)}")
+            retry_after = str(max(1, int(self.limiter.queue_timeout))).encode()
+            await self._send_json(send, 429, {"error": str(e)}, [(b"retry-after", retry_after)])
+
+    async def _read_query(self, receive) -> Tuple[str, Optional[Tuple[int, str]]]:
+        """リクエストボディからクエリを読み取る。不正な場合は (ステータス, メッセージ) を返す"""
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_SIZE:
+                return "", (413, "リクエストが大きすぎます")
+            if not message.get("more_body"):
+                break
+
+        try:
+            query = json.loads(body).get("query", "")
+        except (ValueError, AttributeError):
+            return "", (400, "JSON形式で送信してください")
+        if not isinstance(query, str) or not query.strip():
+            return "", (400, "query を指定してください")
+        return query.strip(), None
+
+    async def _handle_query(self, send, query: str) -> None:
+        try:
+            answer = await asyncio.wait_for(
+                self._get_coordinator().aprocess_query(query),
+                timeout=self.request_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Query timed out after {self.request_timeout} seconds: {query}")
+            await self._send_json(send, 504, {"error": config.ERROR_MESSAGES["timeout"]})
+            return
+        usage = answer.usage.to_dict() if getattr(answer, "usage", None) is not None else None
+        await self._send_json(send, 200, {"query": query, "answer": str(answer), "usage": usage})
+
+    async def _handle_stream(self, send, query: str) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no")
+            ]
+        })
+
+        stream = self._get_coordinator().astream_query(query)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_timeout
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(stream.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    logger.warning(f"Stream timed out after {self.request_timeout} seconds: {query}")
+                    await self._send_event(send, "error", config.ERROR_MESSAGES["timeout"])
+                    break
+                await self._send_event(send, event.type, event.data, event.intent)
+        finally:
+            await stream.aclose()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _send_event(send, event_type: str, data, intent: Optional[str] = None) -> None:
+        payload = json.dumps({"data": data, "intent": intent}, ensure_ascii=False)
+        await send({
+            "type": "http.response.body",
+            "body": f"event: {event_type}\ndata: {payload}\n\n".encode("utf-8"),
+            "more_body": True
+        })
+
+    @staticmethod
+    async def _send_text(send, status: int, content: str, content_type: bytes) -> None:
+        body = content.encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_json(send, status: int, content: dict, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json; charset=utf-8"),
+                (b"content-length", str(len(body)).encode())
+            ] + (headers or [])
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# uvicorn などのASGIサーバーから読み込むアプリケーション
+app = CoordinatorServer()
+
+
+def main() -> None:
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn がインストールされていません: pip install uvicorn")
+
+    uvicorn.run(
+        app,
+        host=config.SERVER_HOST,
+        port=config.SERVER_PORT,
+        timeout_graceful_shutdown=config.SERVER_SHUTDOWN_TIMEOUT
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,18 @@
 Tools package for weather and food information retrieval system.
 """
 
-from .weather_tools import get_weather
-from .food_tools import get_food_info
+import importlib
 
-__all__ = ['get_weather', 'get_food_info'] 
\ No newline at end of file
+# 各ツールは LangChain を読み込むため、参照されたときに読み込む
+_EXPORTS = {
+    'get_weather': '.weather_tools',
+    'get_food_info': '.food_tools'
+}
+
+__all__ = ['get_weather', 'get_food_info']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,154 @@
+"""
+質問文から都市名を抽出する（Aho-Corasick法による辞書照合）
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from src.tools.city_names import ADMINISTRATIVE_SUFFIXES, CITY_NAMES
+
+
+class CityMatch(NamedTuple):
+    """質問文中で見つかった都市名"""
+    text: str  # 質問文中の表記
+    english_name: str  # 英語の都市名
+    start: int  # 開始位置
+    end: int  # 終了位置（この位置の文字は含まない）
+
+
+def _is_reading(alias: str) -> bool:
+    """ひらがなだけの表記（読み）かどうか判定"""
+    return all("ぁ" <= ch <= "ゖ" or ch == "ー" for ch in alias)
+
+
+def _is_kanji(ch: str) -> bool:
+    return "\u4e00" <= ch <= "\u9fff" or ch == "々"
+
+
+def _is_katakana(ch: str) -> bool:
+    return "\u30a0" <= ch <= "\u30ff" and ch != "・"
+
+
+class CityExtractor:
+    def __init__(self, names: Dict[str, List[str]] = CITY_NAMES):
+        """
+        都市名抽出器の初期化
+
+        ひらがなの読みは一般的な語（「なら」など）と衝突しやすいため照合対象から外し、
+        漢字・カタカナ表記と英語名を照合する。
+
+        Args:
+            names: 英語の都市名 → 日本語表記のリスト
+        """
+        patterns = []
+        for english_name, aliases in names.items():
+            patterns.append((english_name.lower(), english_name))
+            patterns.extend((alias, english_name) for alias in aliases if not _is_reading(alias))
+        self._build(patterns)
+
+    def _build(self, patterns: Iterable[Tuple[str, str]]) -> None:
+        """照合用のオートマトンを構築"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, str]]] = [[]]  # (パターン長, 英語の都市名)
+
+        for pattern, english_name in patterns:
+            node = 0
+            for ch in pattern:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append((len(pattern), english_name))
+
+        # 幅優先で失敗リンクを設定
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    @staticmethod
+    def _on_word_boundary(text: str, start: int, end: int) -> bool:
+        """
+        都市名が別の語の一部でないか判定
+
+        英字は前後が英数字でないこと（"nara" と "narrative" など）。日本語は後ろに漢字・カタカナが
+        続かないこと（「日光浴」「大分前」など）。後ろが助詞・句読点・行政区分（市・都・府・県）・
+        文末の場合のみ都市名とみなす。カタカナの都市名は前にもカタカナが続かないこと。
+        """
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        if text[start].isascii():
+            return not (before.isascii() and before.isalnum()) and not (after.isascii() and after.isalnum())
+        if _is_katakana(text[start]) and _is_katakana(before):
+            return False
+        if after in ADMINISTRATIVE_SUFFIXES:
+            return True
+        return not (_is_kanji(after) or _is_katakana(after))
+
+    def _candidates(self, query: str) -> List[CityMatch]:
+        """語の境界を満たす照合結果を (開始位置, 長い順) に返す（重なりを含む）"""
+        text = query.lower()
+        matches = []
+        node = 0
+        for position, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, english_name in self._output[node]:
+                start, end = position + 1 - length, position + 1
+                if self._on_word_boundary(text, start, end):
+                    matches.append(CityMatch(query[start:end], english_name, start, end))
+        matches.sort(key=lambda match: (match.start, -(match.end - match.start)))
+        return matches
+
+    def find_all(self, query: str) -> List[CityMatch]:
+        """
+        質問文中のすべての都市名を返す（重なる場合は先に現れる最長のもの）
+
+        Args:
+            query: 質問文
+
+        Returns:
+            List[CityMatch]: 見つかった都市名（出現順）
+        """
+        matches = []
+        for match in self._candidates(query):
+            if not matches or match.start >= matches[-1].end:
+                matches.append(match)
+        return matches
+
+    def extract(self, query: str) -> Optional[CityMatch]:
+        """
+        質問文から最初に現れる都市名を返す（同じ位置では最長のもの）
+
+        最初の都市名と重なる、より長い候補がある場合はどちらか判断できないため None を返し、
+        呼び出し元の LLM による抽出に任せる。
+
+        Args:
+            query: 質問文
+
+        Returns:
+            Optional[CityMatch]: 見つかった都市名。見つからない場合や曖昧な場合はNone
+        """
+        candidates = self._candidates(query)
+        if not candidates:
+            return None
+        first = candidates[0]
+        length = first.end - first.start
+        if any(match.start < first.end and match.end - match.start > length for match in candidates[1:]):
+            return None
+        return first
+
+
+# 辞書から構築した共有インスタンス
+city_extractor = CityExtractor()
@@ -0,0 +1,196 @@
+"""
+都市名の辞書（日本語 → 英語）
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+# 英語の都市名 → 日本語の表記ゆれ（漢字・ひらがな・カタカナ）
+# ひらがなの読みを登録すればカタカナ表記も自動的に引ける
+CITY_NAMES: Dict[str, List[str]] = {
+    # 日本
+    "Sapporo": ["札幌", "さっぽろ"],
+    "Hakodate": ["函館", "はこだて"],
+    "Asahikawa": ["旭川", "あさひかわ"],
+    "Aomori": ["青森", "あおもり"],
+    "Morioka": ["盛岡", "もりおか"],
+    "Sendai": ["仙台", "せんだい"],
+    "Akita": ["秋田", "あきた"],
+    "Yamagata": ["山形", "やまがた"],
+    "Fukushima": ["福島", "ふくしま"],
+    "Mito": ["水戸", "みと"],
+    "Utsunomiya": ["宇都宮", "うつのみや"],
+    "Nikko": ["日光", "にっこう"],
+    "Maebashi": ["前橋", "まえばし"],
+    "Saitama": ["さいたま", "埼玉"],
+    "Chiba": ["千葉", "ちば"],
+    "Tokyo": ["東京", "とうきょう"],
+    "Yokohama": ["横浜", "よこはま"],
+    "Kawasaki": ["川崎", "かわさき"],
+    "Kamakura": ["鎌倉", "かまくら"],
+    "Niigata": ["新潟", "にいがた"],
+    "Toyama": ["富山", "とやま"],
+    "Kanazawa": ["金沢", "かなざわ"],
+    "Fukui": ["福井", "ふくい"],
+    "Kofu": ["甲府", "こうふ"],
+    "Nagano": ["長野", "ながの"],
+    "Gifu": ["岐阜", "ぎふ"],
+    "Shizuoka": ["静岡", "しずおか"],
+    "Hamamatsu": ["浜松", "はままつ"],
+    "Nagoya": ["名古屋", "なごや"],
+    "Otsu": ["大津", "おおつ"],
+    "Kyoto": ["京都", "きょうと"],
+    "Osaka": ["大阪", "おおさか"],
+    "Kobe": ["神戸", "こうべ"],
+    "Nara": ["奈良", "なら"],
+    "Wakayama": ["和歌山", "わかやま"],
+    "Tottori": ["鳥取", "とっとり"],
+    "Matsue": ["松江", "まつえ"],
+    "Okayama": ["岡山", "おかやま"],
+    "Hiroshima": ["広島", "ひろしま"],
+    "Yamaguchi": ["山口", "やまぐち"],
+    "Tokushima": ["徳島", "とくしま"],
+    "Takamatsu": ["高松", "たかまつ"],
+    "Matsuyama": ["松山", "まつやま"],
+    "Kochi": ["高知", "こうち"],
+    "Fukuoka": ["福岡", "ふくおか"],
+    "Kitakyushu": ["北九州", "きたきゅうしゅう"],
+    "Saga": ["佐賀", "さが"],
+    "Nagasaki": ["長崎", "ながさき"],
+    "Kumamoto": ["熊本", "くまもと"],
+    "Oita": ["大分", "おおいた"],
+    "Miyazaki": ["宮崎", "みやざき"],
+    "Kagoshima": ["鹿児島", "かごしま"],
+    "Okinawa": ["沖縄", "おきなわ"],
+    "Naha": ["那覇", "なは"],
+    # アジア
+    "Seoul": ["ソウル"],
+    "Busan": ["釜山", "プサン"],
+    "Beijing": ["北京", "ペキン"],
+    "Shanghai": ["上海", "シャンハイ"],
+    "Hong Kong": ["香港", "ホンコン"],
+    "Taipei": ["台北", "タイペイ"],
+    "Bangkok": ["バンコク"],
+    "Singapore": ["シンガポール"],
+    "Hanoi": ["ハノイ"],
+    "Ho Chi Minh City": ["ホーチミン"],
+    "Manila": ["マニラ"],
+    "Jakarta": ["ジャカルタ"],
+    "Kuala Lumpur": ["クアラルンプール"],
+    "Delhi": ["デリー"],
+    "Mumbai": ["ムンバイ"],
+    "Dubai": ["ドバイ"],
+    "Istanbul": ["イスタンブール"],
+    # ヨーロッパ
+    "London": ["ロンドン"],
+    "Edinburgh": ["エディンバラ"],
+    "Dublin": ["ダブリン"],
+    "Paris": ["パリ"],
+    "Brussels": ["ブリュッセル"],
+    "Amsterdam": ["アムステルダム"],
+    "Berlin": ["ベルリン"],
+    "Munich": ["ミュンヘン"],
+    "Vienna": ["ウィーン"],
+    "Zurich": ["チューリッヒ"],
+    "Geneva": ["ジュネーブ"],
+    "Prague": ["プラハ"],
+    "Rome": ["ローマ"],
+    "Milan": ["ミラノ"],
+    "Venice": ["ヴェネツィア", "ベネチア"],
+    "Florence": ["フィレンツェ"],
+    "Naples": ["ナポリ"],
+    "Madrid": ["マドリード", "マドリッド"],
+    "Barcelona": ["バルセロナ"],
+    "Lisbon": ["リスボン"],
+    "Athens": ["アテネ"],
+    "Stockholm": ["ストックホルム"],
+    "Oslo": ["オスロ"],
+    "Copenhagen": ["コペンハーゲン"],
+    "Helsinki": ["ヘルシンキ"],
+    "Moscow": ["モスクワ"],
+    # アメリカ・オセアニア・その他
+    "New York": ["ニューヨーク"],
+    "Boston": ["ボストン"],
+    "Washington": ["ワシントン"],
+    "Chicago": ["シカゴ"],
+    "Seattle": ["シアトル"],
+    "San Francisco": ["サンフランシスコ"],
+    "Los Angeles": ["ロサンゼルス", "ロサンジェルス"],
+    "Las Vegas": ["ラスベガス"],
+    "California": ["カリフォルニア"],
+    "Honolulu": ["ホノルル"],
+    "Hawaii": ["ハワイ"],
+    "Toronto": ["トロント"],
+    "Vancouver": ["バンクーバー"],
+    "Mexico City": ["メキシコシティ"],
+    "Sao Paulo": ["サンパウロ"],
+    "Rio de Janeiro": ["リオデジャネイロ"],
+    "Buenos Aires": ["ブエノスアイレス"],
+    "Sydney": ["シドニー"],
+    "Melbourne": ["メルボルン"],
+    "Cairo": ["カイロ"],
+}
+
+# 都市名の後ろに付くことのある行政区分
+ADMINISTRATIVE_SUFFIXES = ("市", "都", "府", "県")
+
+_JAPANESE_PATTERN = re.compile(r'[\u3040-\u30ff\u4e00-\u9fff]')
+
+
+def contains_japanese(text: str) -> bool:
+    """文字列に日本語（かな・漢字）が含まれるか判定"""
+    return bool(_JAPANESE_PATTERN.search(text))
+
+
+def normalize_city_name(city: str) -> str:
+    """
+    辞書引き用に都市名を正規化する
+
+    全角・半角を統一（NFKC）し、カタカナをひらがなに、英字を小文字にそろえる。
+
+    Args:
+        city: 都市名
+
+    Returns:
+        str: 正規化した都市名
+    """
+    text = unicodedata.normalize("NFKC", city).strip().lower()
+    text = " ".join(text.split())
+    # カタカナ（ァ〜ヶ）をひらがなに変換
+    return "".join(chr(ord(ch) - 0x60) if "ァ" <= ch <= "ヶ" else ch for ch in text)
+
+
+def _build_index() -> Dict[str, str]:
+    """正規化した表記 → 英語の都市名の索引を作成"""
+    index = {}
+    for english_name, aliases in CITY_NAMES.items():
+        index[normalize_city_name(english_name)] = english_name
+        for alias in aliases:
+            index[normalize_city_name(alias)] = english_name
+    return index
+
+
+_CITY_INDEX = _build_index()
+
+
+def lookup_english_city_name(city: str) -> Optional[str]:
+    """
+    辞書から都市名の英語表記を引く
+
+    Args:
+        city: 都市名（日本語・英語）
+
+    Returns:
+        Optional[str]: 英語の都市名。辞書にない場合はNone
+    """
+    key = normalize_city_name(city)
+    if key in _CITY_INDEX:
+        return _CITY_INDEX[key]
+
+    # 「東京都」「大阪府」のような行政区分付きの表記
+    for suffix in ADMINISTRATIVE_SUFFIXES:
+        if key.endswith(suffix) and key[:-len(suffix)] in _CITY_INDEX:
+            return _CITY_INDEX[key[:-len(suffix)]]
+
+    return None
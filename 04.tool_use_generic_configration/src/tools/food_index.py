@@ -0,0 +1,247 @@
+"""
+料理情報のオフライン索引
+
+都市と料理記事のコーパス（JSONL）から、ディスク上の索引を構築・検索する。
+
+コーパスは1行1記事のJSONで、以下のキーを持つ（WikiExtractor の --json 出力もそのまま使える）:
+    title: 記事タイトル
+    text または content: 本文
+    url: 記事のURL（省略可）
+    city: 記事が扱う都市名（省略可。英語・日本語どちらでもよい）
+
+索引ディレクトリの構成:
+    meta.json: 記事のメタデータ、語彙、都市名の索引
+    content.bin: 本文（UTF-8）を連結したもの（メモリマップして読む）
+    postings.bin: 語ごとの (記事番号, 出現回数) の列（uint32、メモリマップして読む）
+
+使い方:
+    python -m src.tools.food_index corpus.jsonl --output data/food_index
+"""
+
+import argparse
+import array
+import json
+import math
+import mmap
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.tools.city_names import lookup_english_city_name, normalize_city_name
+
+INDEX_VERSION = 1
+TITLE_WEIGHT = 3  # タイトル中の語は本文の何回分として数えるか
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    索引用に文字列を語に分割する
+
+    英数字は単語単位、日本語（かな・漢字）は文字bigram単位で分割する。
+    """
+    text = normalize_city_name(text)
+    tokens = _WORD_PATTERN.findall(text)
+    for run in _CJK_PATTERN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _city_keys(city: str) -> List[str]:
+    """都市名から索引キー（正規化した表記と英語名）を作る"""
+    keys = {normalize_city_name(city)}
+    english_name = lookup_english_city_name(city)
+    if english_name is not None:
+        keys.add(normalize_city_name(english_name))
+    return list(keys)
+
+
+def _read_corpus(corpus_path: str) -> Iterator[dict]:
+    with open(corpus_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def build_food_index(corpus_path: str, index_dir: str) -> int:
+    """
+    コーパスから索引を構築する
+
+    Args:
+        corpus_path: JSONLコーパスのパス
+        index_dir: 索引の出力先ディレクトリ
+
+    Returns:
+        int: 索引に登録した記事数
+    """
+    os.makedirs(index_dir, exist_ok=True)
+
+    docs = []
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    cities: Dict[str, List[int]] = defaultdict(list)
+    total_length = 0
+
+    with open(os.path.join(index_dir, "content.bin"), "wb") as content_file:
+        offset = 0
+        for record in _read_corpus(corpus_path):
+            title = record.get("title", "")
+            text = record.get("text") or record.get("content") or ""
+            if not text:
+                continue
+
+            doc_id = len(docs)
+            encoded = text.encode("utf-8")
+            content_file.write(encoded)
+
+            term_counts = Counter(tokenize(text))
+            for term in tokenize(title):
+                term_counts[term] += TITLE_WEIGHT
+            length = sum(term_counts.values())
+            total_length += length
+            for term, count in term_counts.items():
+                postings[term].append((doc_id, count))
+
+            city = record.get("city") or ""
+            if city:
+                for key in _city_keys(city):
+                    cities[key].append(doc_id)
+
+            docs.append([title, record.get("url", ""), city, offset, len(encoded), length])
+            offset += len(encoded)
+
+    terms = {}
+    values = array.array("I")
+    for term, entries in postings.items():
+        terms[term] = [len(values), len(entries)]
+        for doc_id, count in entries:
+            values.append(doc_id)
+            values.append(count)
+    with open(os.path.join(index_dir, "postings.bin"), "wb") as f:
+        values.tofile(f)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "avgdl": total_length / len(docs) if docs else 0.0,
+        "docs": docs,
+        "terms": terms,
+        "cities": cities
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    return len(docs)
+
+
+class FoodIndex:
+    def __init__(self, index_dir: str):
+        """
+        構築済みの索引を開く
+
+        Args:
+            index_dir: 索引ディレクトリ
+        """
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported food index version: {meta.get('version')}")
+
+        self._docs = meta["docs"]
+        self._terms = meta["terms"]
+        self._cities = meta["cities"]
+        self._avgdl = meta["avgdl"] or 1.0
+        self._content = self._map(os.path.join(index_dir, "content.bin"))
+        postings = self._map(os.path.join(index_dir, "postings.bin"))
+        self._postings = memoryview(postings).cast("I") if len(postings) else memoryview(b"").cast("I")
+
+    @staticmethod
+    def _map(path: str):
+        """ファイルを読み取り専用でメモリマップする（空ファイルは bytes を返す）"""
+        if os.path.getsize(path) == 0:
+            return b""
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def document(self, doc_id: int) -> dict:
+        """記事を {"title", "content", "url", "city"} で返す"""
+        title, url, city, offset, length, _ = self._docs[doc_id]
+        content = bytes(self._content[offset:offset + length]).decode("utf-8")
+        return {"title": title, "content": content, "url": url, "city": city}
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        BM25で記事を検索する
+
+        Args:
+            query: 検索語
+            limit: 返す件数
+
+        Returns:
+            List[Tuple[int, float]]: (記事番号, スコア) のリスト（スコアの高い順）
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        total_docs = len(self._docs)
+        for term in set(tokenize(query)):
+            entry = self._terms.get(term)
+            if entry is None:
+                continue
+            start, count = entry
+            idf = math.log(1 + (total_docs - count + 0.5) / (count + 0.5))
+            for i in range(start, start + count * 2, 2):
+                doc_id, tf = self._postings[i], self._postings[i + 1]
+                doc_length = self._docs[doc_id][5]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / self._avgdl)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def lookup(self, city: str) -> Optional[dict]:
+        """
+        都市の料理記事を返す
+
+        コーパスで都市が指定された記事を優先し、なければ「<都市名> cuisine」で検索して
+        タイトルか都市名に都市名を含む最上位の記事を返す。
+
+        Args:
+            city: 都市名（英語・日本語）
+
+        Returns:
+            Optional[dict]: {"title", "content", "url", "city"}。見つからない場合はNone
+        """
+        keys = _city_keys(city)
+        for key in keys:
+            doc_ids = self._cities.get(key)
+            if doc_ids:
+                return self.document(doc_ids[0])
+
+        for key in keys:
+            for doc_id, _ in self.search(f"{key} cuisine"):
+                title, _, doc_city = self._docs[doc_id][:3]
+                if key in normalize_city_name(title) or key in normalize_city_name(doc_city):
+                    return self.document(doc_id)
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="料理情報のオフライン索引を構築する")
+    parser.add_argument("corpus", help="JSONLコーパスのパス（1行1記事）")
+    parser.add_argument("--output", default="data/food_index", help="索引の出力先ディレクトリ")
+    args = parser.parse_args(argv)
+
+    count = build_food_index(args.corpus, args.output)
+    print(f"{count} 件の記事を {args.output} に索引しました", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
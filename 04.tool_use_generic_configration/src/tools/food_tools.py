@@ -1,115 +1,255 @@
-from langchain_core.tools import tool
-import wikipedia
+from langchain_core.tools import StructuredTool
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
+import os
+import threading
+from src import config
+from src.tools import wikipedia_client
+from src.tools.food_index import FoodIndex
 from src.utils.logger import CustomLogger
-from src.utils.exceptions import FoodToolError
-from src.tools.weather_tools import convert_to_english_city_name
+from src.utils.tracing import span, traced
+from src.utils.exceptions import BudgetExceededError, DisambiguationError, FoodToolError, PageNotFoundError
+from src.tools.weather_tools import convert_to_english_city_name, aconvert_to_english_city_name
 
 logger = CustomLogger(__name__)
 
-@tool
-def get_food_info(city: str) -> dict:
-    """Wikipediaから指定した街発祥の料理情報を取得"""
+# 検索クエリを並列に実行するスレッドプール
+_search_executor = ThreadPoolExecutor(max_workers=config.WIKIPEDIA_SEARCH_WORKERS, thread_name_prefix="wikipedia-search")
+
+# オフライン索引（初回利用時に読み込む）
+_food_index: Optional[FoodIndex] = None
+_food_index_loaded = False
+_food_index_lock = threading.Lock()
+
+# ページ選択・本文抽出に使うキーワード
+FOOD_PAGE_KEYWORDS = ["料理", "名物", "郷土料理"]
+FOOD_LINE_KEYWORDS = ["料理", "名物", "郷土料理", "特産", "食"]
+
+def _search_queries(english_city: str) -> List[str]:
+    """検索クエリを構築（英語で検索）"""
+    return [
+        f"{english_city} cuisine",
+        f"{english_city} food",
+        f"{english_city} specialty",
+        f"{english_city} local food"
+    ]
+
+def _select_page(search_results: List[str]) -> str:
+    """検索結果から最も関連性の高いページを選択"""
+    # 重複を除去（検索クエリの順序を保つ）
+    search_results = list(dict.fromkeys(search_results))
+    logger.debug(f"Search results: {search_results}")
+
+    if not search_results:
+        logger.warning("No search results found")
+        raise FoodToolError("料理情報が見つかりませんでした。")
+
+    food_pages = [result for result in search_results if any(keyword in result for keyword in FOOD_PAGE_KEYWORDS)]
+    logger.debug(f"Food-related pages: {food_pages}")
+
+    selected_page = food_pages[0] if food_pages else search_results[0]
+    logger.info(f"Selected page: {selected_page}")
+    return selected_page
+
+def _select_option(e: DisambiguationError) -> str:
+    """曖昧さ回避ページの場合は、料理に関連する可能性の高いオプションを選択"""
+    logger.warning(f"Disambiguation error: {str(e)}")
+    if not e.options:
+        raise FoodToolError(f"ページの取得に失敗しました: {str(e)}")
+    food_options = [opt for opt in e.options if any(keyword in opt for keyword in FOOD_PAGE_KEYWORDS)]
+    return food_options[0] if food_options else e.options[0]
+
+def _extract_food_content(page: dict) -> dict:
+    """ページ本文から料理に関連する部分を抽出"""
+    # 料理情報を抽出（最初の500文字）
+    content = page["content"][:500]
+
+    # 料理に関連する部分を抽出
+    food_related_sections = []
+    current_section = ""
+
+    for line in content.split('\n'):
+        if any(keyword in line for keyword in FOOD_LINE_KEYWORDS):
+            if current_section:
+                food_related_sections.append(current_section)
+            current_section = line
+        elif current_section:
+            current_section += "\n" + line
+
+    if current_section:
+        food_related_sections.append(current_section)
+
+    # 料理関連の情報が見つかった場合はそれを使用、なければ全体を使用
+    final_content = "\n".join(food_related_sections) if food_related_sections else content
+
+    result = {
+        "title": page["title"],
+        "content": final_content,
+        "url": page["url"]
+    }
+
+    logger.debug(f"Food info retrieved: {result}")
+    return result
+
+def _truncate_page(page: dict) -> dict:
+    """曖昧さ回避先のページは先頭500文字をそのまま使う"""
+    return {
+        "title": page["title"],
+        "content": page["content"][:500],
+        "url": page["url"]
+    }
+
+def _get_food_index() -> Optional[FoodIndex]:
+    """オフライン索引を返す。索引が構築されていない場合はNone"""
+    global _food_index, _food_index_loaded
+    if not _food_index_loaded:
+        with _food_index_lock:
+            if not _food_index_loaded:
+                if os.path.exists(os.path.join(config.FOOD_INDEX_DIR, "meta.json")):
+                    try:
+                        _food_index = FoodIndex(config.FOOD_INDEX_DIR)
+                        logger.info(f"Food index loaded: {len(_food_index)} documents")
+                    except Exception as e:
+                        logger.error(f"Error loading food index: {str(e)}")
+                _food_index_loaded = True
+    return _food_index
+
+def _lookup_offline(city: str) -> Optional[dict]:
+    """オフライン索引から料理情報を探す。見つからない場合はNone"""
+    food_index = _get_food_index()
+    if food_index is None:
+        return None
+
+    page = food_index.lookup(city)
+    if page is None:
+        return None
+
+    logger.info(f"Food info found in offline index: {page['title']}")
+    return _extract_food_content(page)
+
+def _fetch_food_page(english_city: str) -> dict:
+    """Wikipediaから英語の都市名で料理情報を検索して取得"""
     try:
-        logger.info(f"Getting food info for city: {city}")
-        
-        # city名が日本語かどうか判定し、英語に変換
-        import re
-        if re.search(r'[\u3040-\u30ff\u4e00-\u9fff]', city):
-            english_city = convert_to_english_city_name(city)
-        else:
-            english_city = city
-        logger.debug(f"English city name: {english_city}")
-        
-        import wikipedia
-        wikipedia.set_lang('en')
-        
-        # 検索クエリを構築（英語で検索）
-        search_queries = [
-            f"{english_city} cuisine",
-            f"{english_city} food",
-            f"{english_city} specialty",
-            f"{english_city} local food"
-        ]
-        
+        # 検索クエリを並列に実行し、クエリの順序どおりに結合
         search_results = []
-        for query in search_queries:
-            results = wikipedia.search(query, results=3)
-            search_results.extend(results)
-        
-        # 重複を除去
-        search_results = list(set(search_results))
-        logger.debug(f"Search results: {search_results}")
-        
-        if not search_results:
-            logger.warning("No search results found")
-            raise FoodToolError("料理情報が見つかりませんでした。")
-        
-        # 検索結果から最も関連性の高いページを選択
-        food_pages = [result for result in search_results if any(keyword in result for keyword in ["料理", "名物", "郷土料理"])]
-        logger.debug(f"Food-related pages: {food_pages}")
-        
-        if food_pages:
-            selected_page = food_pages[0]
-        else:
-            selected_page = search_results[0]
-        
-        logger.info(f"Selected page: {selected_page}")
-        
+        with span("food.wikipedia_search", city=english_city):
+            for results in _search_executor.map(lambda query: wikipedia_client.search(query, results=3), _search_queries(english_city)):
+                search_results.extend(results)
+
         # 選択したページの情報を取得
-        page = wikipedia.page(selected_page)
-        
-        # 料理情報を抽出（最初の500文字）
-        content = page.content[:500]
-        
-        # 料理に関連する部分を抽出
-        food_related_sections = []
-        current_section = ""
-        
-        for line in content.split('\n'):
-            if any(keyword in line for keyword in ["料理", "名物", "郷土料理", "特産", "食"]):
-                if current_section:
-                    food_related_sections.append(current_section)
-                current_section = line
-            elif current_section:
-                current_section += "\n" + line
-        
-        if current_section:
-            food_related_sections.append(current_section)
-        
-        # 料理関連の情報が見つかった場合はそれを使用、なければ全体を使用
-        final_content = "\n".join(food_related_sections) if food_related_sections else content
-        
-        result = {
-            "title": page.title,
-            "content": final_content,
-            "url": page.url
-        }
-        
-        logger.debug(f"Food info retrieved: {result}")
-        return result
-        
-    except wikipedia.exceptions.DisambiguationError as e:
-        logger.warning(f"Disambiguation error: {str(e)}")
-        # 曖昧さ回避ページの場合は、料理に関連する可能性の高いオプションを選択
-        food_options = [opt for opt in e.options if any(keyword in opt for keyword in ["料理", "名物", "郷土料理"])]
-        selected_option = food_options[0] if food_options else e.options[0]
-        
+        with span("food.wikipedia_page"):
+            return _extract_food_content(wikipedia_client.page(_select_page(search_results)))
+
+    except DisambiguationError as e:
+        selected_option = _select_option(e)
         try:
-            page = wikipedia.page(selected_option)
-            content = page.content[:500]
-            return {
-                "title": page.title,
-                "content": content,
-                "url": page.url
-            }
+            return _truncate_page(wikipedia_client.page(selected_option))
         except Exception as sub_e:
             logger.error(f"Error processing disambiguation page: {str(sub_e)}")
             raise FoodToolError(f"ページの取得に失敗しました: {str(sub_e)}")
-            
-    except wikipedia.exceptions.PageError as e:
+
+    except PageNotFoundError as e:
         logger.error(f"Page not found: {str(e)}")
         raise FoodToolError(f"ページが見つかりませんでした: {str(e)}")
-        
+
+    except FoodToolError:
+        raise
+
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        raise FoodToolError(f"予期せぬエラーが発生しました: {str(e)}") 
\ No newline at end of file
+        raise FoodToolError(f"予期せぬエラーが発生しました: {str(e)}")
+
+async def _afetch_food_page(english_city: str) -> dict:
+    """_fetch_food_page の非同期版"""
+    try:
+        # 検索クエリを並行に実行し、クエリの順序どおりに結合
+        search_results = []
+        with span("food.wikipedia_search", city=english_city):
+            for results in await asyncio.gather(*(wikipedia_client.asearch(query, results=3) for query in _search_queries(english_city))):
+                search_results.extend(results)
+
+        # 選択したページの情報を取得
+        with span("food.wikipedia_page"):
+            return _extract_food_content(await wikipedia_client.apage(_select_page(search_results)))
+
+    except DisambiguationError as e:
+        selected_option = _select_option(e)
+        try:
+            return _truncate_page(await wikipedia_client.apage(selected_option))
+        except Exception as sub_e:
+            logger.error(f"Error processing disambiguation page: {str(sub_e)}")
+            raise FoodToolError(f"ページの取得に失敗しました: {str(sub_e)}")
+
+    except PageNotFoundError as e:
+        logger.error(f"Page not found: {str(e)}")
+        raise FoodToolError(f"ページが見つかりませんでした: {str(e)}")
+
+    except FoodToolError:
+        raise
+
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise FoodToolError(f"予期せぬエラーが発生しました: {str(e)}")
+
+@traced("tool.get_food_info")
+def _get_food_info(city: str) -> dict:
+    """Wikipediaから指定した街発祥の料理情報を取得"""
+    logger.info(f"Getting food info for city: {city}")
+
+    # オフライン索引を優先（索引の都市名は日本語・英語のどちらでも引ける）
+    result = _lookup_offline(city)
+    if result is not None:
+        return result
+
+    # city名を英語に変換（英語の場合はそのまま）
+    try:
+        english_city = convert_to_english_city_name(city)
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise FoodToolError(f"予期せぬエラーが発生しました: {str(e)}")
+    logger.debug(f"English city name: {english_city}")
+
+    if english_city != city:
+        result = _lookup_offline(english_city)
+        if result is not None:
+            return result
+
+    return _fetch_food_page(english_city)
+
+@traced("tool.get_food_info")
+async def _aget_food_info(city: str) -> dict:
+    """Wikipediaから指定した街発祥の料理情報を非同期に取得"""
+    logger.info(f"Getting food info for city: {city}")
+
+    # オフライン索引を優先（索引の都市名は日本語・英語のどちらでも引ける）
+    result = _lookup_offline(city)
+    if result is not None:
+        return result
+
+    # city名を英語に変換（英語の場合はそのまま）
+    try:
+        english_city = await aconvert_to_english_city_name(city)
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise FoodToolError(f"予期せぬエラーが発生しました: {str(e)}")
+    logger.debug(f"English city name: {english_city}")
+
+    if english_city != city:
+        result = _lookup_offline(english_city)
+        if result is not None:
+            return result
+
+    return await _afetch_food_page(english_city)
+
+# 同期・非同期の両方で呼び出せるツール
+get_food_info = StructuredTool.from_function(
+    func=_get_food_info,
+    coroutine=_aget_food_info,
+    name="get_food_info",
+    description="Wikipediaから指定した街発祥の料理情報を取得"
+)
@@ -0,0 +1,170 @@
+"""
+よく問い合わされる都市の天気情報の先行更新（refresh-ahead）
+
+調整役エージェントが天気を問い合わされた都市を HotCityTracker に記録し、WeatherRefresher が
+一定間隔で上位 N 都市の天気情報を確認して、有効期限が近いものを期限切れの前に取得し直す。
+取得は aprefetch_weather でまとめて行い（都市名の変換は1回のバッチ、取得は並行）、
+利用者の問い合わせと同じ都市の取得が実行中の場合はそれに相乗りする。
+
+問い合わせの回数は確認のたびに減衰させ、最近の問い合わせが多い都市を優先する。
+
+使い方（イベントループ内で）:
+    refresher = WeatherRefresher(hot_cities)
+    refresher.start()
+    ...
+    await refresher.stop()
+"""
+
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src import config
+from src.tools.weather_tools import aprefetch_weather
+from src.utils.logger import CustomLogger
+from src.utils.tracing import span
+
+logger = CustomLogger(__name__)
+
+
+class HotCityTracker:
+    def __init__(self, maxsize: int = 1000, decay: float = 0.5):
+        """
+        都市ごとの天気の問い合わせ回数
+
+        Args:
+            maxsize: 記録する都市数の上限（超えた場合は回数の少ないものから削除）
+            decay: decay() で回数に掛ける係数
+        """
+        self.maxsize = maxsize
+        self.decay_factor = decay
+        # 都市のキー → [回数, 問い合わせの都市名]
+        self._counts: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, city: str) -> None:
+        """
+        問い合わせを1回記録する
+
+        Args:
+            key: 都市のキー（表記の違う同じ都市をまとめる）
+            city: 問い合わせの都市名（更新時の取得に使う）
+        """
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None:
+                if len(self._counts) >= self.maxsize:
+                    del self._counts[min(self._counts, key=lambda name: self._counts[name][0])]
+                self._counts[key] = [1.0, city]
+            else:
+                entry[0] += 1
+                entry[1] = city
+
+    def top(self, n: int) -> List[Tuple[str, float]]:
+        """問い合わせの多い順に n 都市の (都市名, 回数) を返す"""
+        with self._lock:
+            entries = sorted(self._counts.values(), key=lambda entry: entry[0], reverse=True)[:n]
+        return [(city, round(count, 2)) for count, city in entries]
+
+    def decay(self) -> None:
+        """回数を減衰させる（1回未満になった都市は削除する）"""
+        with self._lock:
+            for key in list(self._counts):
+                entry = self._counts[key]
+                entry[0] *= self.decay_factor
+                if entry[0] < 1:
+                    del self._counts[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+class WeatherRefresher:
+    def __init__(
+        self,
+        tracker: HotCityTracker,
+        top_n: int = config.WEATHER_REFRESH_TOP_N,
+        interval: float = config.WEATHER_REFRESH_INTERVAL,
+        refresh_ahead: float = config.WEATHER_REFRESH_AHEAD,
+        max_concurrency: int = config.BATCH_MAX_CONCURRENCY
+    ):
+        """
+        上位の都市の天気情報を期限切れの前に取得し直すバックグラウンド処理
+
+        Args:
+            tracker: 問い合わせ回数の記録
+            top_n: 先行更新する都市数
+            interval: 確認の間隔（秒）
+            refresh_ahead: 有効期限までの残りがこの秒数未満になったら取得し直す
+            max_concurrency: 同時リクエスト数の上限
+        """
+        self.tracker = tracker
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.max_concurrency = max_concurrency
+        self.runs = 0
+        self.refreshed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh_once(self) -> int:
+        """
+        上位の都市を1回確認し、有効期限が近いものを取得し直す
+
+        Returns:
+            int: 取得し直した都市の数
+        """
+        cities = [city for city, _ in self.tracker.top(self.top_n)]
+        self.tracker.decay()
+        self.runs += 1
+        if not cities:
+            return 0
+        with span("weather.refresh", cities=len(cities)):
+            refreshed = await aprefetch_weather(cities, self.max_concurrency, refresh_ahead=self.refresh_ahead)
+        self.refreshed += refreshed
+        if refreshed:
+            logger.info(f"Refreshed weather for {refreshed} of {len(cities)} hot cities")
+        return refreshed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                logger.error(f"Error refreshing hot city weather: {str(e)}", exc_info=e)
+            await asyncio.sleep(self.interval)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """先行更新を開始する（イベントループ内で呼び出す）"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Weather refresher started (top {self.top_n} cities, every {self.interval}s)")
+
+    async def stop(self) -> None:
+        """先行更新を止める"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Weather refresher stopped")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "refreshed": self.refreshed,
+            "hot_cities": self.tracker.top(self.top_n)
+        }
+
+
+# 調整役エージェントが記録する、プロセス全体の問い合わせ回数
+hot_cities = HotCityTracker()
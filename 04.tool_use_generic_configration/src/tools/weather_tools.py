@@ -1,58 +1,385 @@
-from langchain_core.tools import tool
-import requests
+from langchain_core.tools import StructuredTool
+import asyncio
+import httpx
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Union
+from src import config
+from src.tools.city_names import contains_japanese, lookup_english_city_name, normalize_city_name
+from src.utils.cache import BaseCache, create_cache
 from src.utils.logger import CustomLogger
-from src.utils.exceptions import WeatherToolError
+from src.utils.exceptions import BudgetExceededError, CircuitOpenError, WeatherToolError
+from src.utils.http_client import http_client
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import add_event, span, traced
 
 logger = CustomLogger(__name__)
 
-def convert_to_english_city_name(city: str) -> str:
-    """日本語の都市名を英語に変換"""
-    from langchain_openai import ChatOpenAI
-    
-    llm = ChatOpenAI(
-        model="gpt-3.5-turbo",
-        api_key=os.environ["OPEN_AI_KEY"],
-        temperature=0
-    )
-    
-    prompt = f"""以下の日本語の都市名を英語に変換してください。
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+WEATHER_UNITS = "metric"  # 摂氏温度を使用
+WEATHER_LANG = "ja"  # 日本語で天気情報を取得
+
+# OpenWeatherのレスポンスキャッシュ
+weather_cache = create_cache(
+    config.WEATHER_CACHE_BACKEND,
+    ttl=config.WEATHER_CACHE_TTL,
+    maxsize=config.WEATHER_CACHE_MAXSIZE,
+    path=os.path.join(config.CACHE_DIR, "weather.sqlite3"),
+    name="weather",
+    stale_ttl=config.WEATHER_STALE_TTL
+)
+
+# 辞書にない都市名のLLM変換結果（永続化してプロセス間で再利用）
+city_name_cache = create_cache(
+    config.CITY_NAME_CACHE_BACKEND,
+    ttl=config.CITY_NAME_CACHE_TTL,
+    maxsize=config.CITY_NAME_CACHE_MAXSIZE,
+    path=os.path.join(config.CACHE_DIR, "city_names.sqlite3"),
+    name="city_name"
+)
+
+# 同じ都市の実行中の変換・取得に相乗りする（使用量の上限は呼び出し元ごとに判定する）
+city_name_flight = SingleFlight("city_name", unshared_errors=(BudgetExceededError,))
+weather_flight = SingleFlight("weather")
+
+# 期限切れの天気情報を返したときに、裏で取得し直すためのスレッドプール（初回利用時に生成）と、
+# キャッシュキーごとの予定・実行中の取得（同じ都市の取得は1件だけ予定する）
+_revalidate_executor: Optional[ThreadPoolExecutor] = None
+_revalidate_lock = threading.Lock()
+_revalidations: Dict[tuple, Union[Future, asyncio.Future]] = {}
+
+def set_weather_cache(cache: BaseCache) -> None:
+    """天気情報のキャッシュを差し替える"""
+    global weather_cache
+    weather_cache = cache
+
+def _weather_cache_key(english_city: str) -> tuple:
+    """キャッシュキー（正規化した都市名, 単位, 言語）を生成"""
+    return (" ".join(english_city.split()).lower(), WEATHER_UNITS, WEATHER_LANG)
+
+def _is_valid_english_city_name(text: str) -> bool:
+    """LLMの変換結果が英語の都市名として妥当か（説明文や日本語が混ざった場合は次のモデルで変換し直す）"""
+    name = text.strip()
+    return 0 < len(name) <= 60 and not contains_japanese(name) and all(c.isalpha() or c in " .'-" for c in name)
+
+def _city_name_prompt(city: str) -> str:
+    """都市名変換用のプロンプトを生成"""
+    return f"""以下の日本語の都市名を英語に変換してください。
 都市名のみを回答してください。例：東京 → Tokyo
 
 都市名: {city}"""
-    
-    response = llm.invoke(prompt)
-    return response.content.strip()
 
-@tool
-def get_weather(city: str) -> dict:
+def _lookup_city_name(city: str):
+    """
+    LLMを使わずに都市名の英語表記を求める
+
+    Returns:
+        tuple: (英語の都市名またはNone, LLM変換結果のキャッシュキー)
+    """
+    english_city = lookup_english_city_name(city)
+    if english_city is not None:
+        return english_city, None
+
+    # 日本語を含まない場合はそのまま英語名として扱う
+    if not contains_japanese(city):
+        return city.strip(), None
+
+    cache_key = normalize_city_name(city)
+    return city_name_cache.get(cache_key), cache_key
+
+def _translate_city_name(city: str, cache_key: str) -> str:
+    """LLMで都市名を英語に変換し、結果をキャッシュに保存する"""
+    logger.debug(f"City name not in dictionary, asking LLM: {city}")
+    from src import llm_router
+
+    with span("weather.translate_city"):
+        response = llm_router.invoke("translation", _city_name_prompt(city), _is_valid_english_city_name)
+    english_city = response.strip()
+    city_name_cache.set(cache_key, english_city)
+    return english_city
+
+async def _atranslate_city_name(city: str, cache_key: str) -> str:
+    """_translate_city_name の非同期版"""
+    logger.debug(f"City name not in dictionary, asking LLM: {city}")
+    from src import llm_router
+
+    with span("weather.translate_city"):
+        response = await llm_router.ainvoke("translation", _city_name_prompt(city), _is_valid_english_city_name)
+    english_city = response.strip()
+    city_name_cache.set(cache_key, english_city)
+    return english_city
+
+def convert_to_english_city_name(city: str) -> str:
+    """日本語の都市名を英語に変換（辞書 → キャッシュ → LLM の順に参照）"""
+    english_city, cache_key = _lookup_city_name(city)
+    if english_city is not None:
+        return english_city
+    return city_name_flight.do(cache_key, _translate_city_name, city, cache_key)
+
+async def aconvert_to_english_city_name(city: str) -> str:
+    """日本語の都市名を英語に非同期で変換（辞書 → キャッシュ → LLM の順に参照）"""
+    english_city, cache_key = _lookup_city_name(city)
+    if english_city is not None:
+        return english_city
+    return await city_name_flight.ado(cache_key, _atranslate_city_name, city, cache_key)
+
+async def aconvert_to_english_city_names(cities: Iterable[str], max_concurrency: int = config.BATCH_MAX_CONCURRENCY) -> Dict[str, str]:
+    """
+    複数の都市名をまとめて英語に変換する
+
+    辞書・キャッシュにない都市名だけを重複を除いて1回のバッチでLLMに問い合わせ、結果をキャッシュに保存する。
+    変換に失敗した都市名は結果に含めない。
+
+    Args:
+        cities: 都市名
+        max_concurrency: LLMへの同時リクエスト数の上限
+
+    Returns:
+        Dict[str, str]: 都市名 → 英語の都市名
+    """
+    result = {}
+    pending = {}
+    for city in dict.fromkeys(cities):
+        english_city, cache_key = _lookup_city_name(city)
+        if english_city is not None:
+            result[city] = english_city
+        else:
+            pending[city] = cache_key
+
+    if pending:
+        from src import llm_router
+
+        logger.info(f"Converting {len(pending)} city names in batch")
+        with span("weather.translate_city", batch_size=len(pending)):
+            responses = await llm_router.abatch(
+                "translation",
+                [_city_name_prompt(city) for city in pending],
+                _is_valid_english_city_name,
+                max_concurrency=max_concurrency
+            )
+        for (city, cache_key), response in zip(pending.items(), responses):
+            if isinstance(response, Exception):
+                logger.error(f"Error converting city name {city}: {str(response)}")
+                continue
+            english_city = response.strip()
+            city_name_cache.set(cache_key, english_city)
+            result[city] = english_city
+    return result
+
+def _needs_fetch(cache_key: tuple, refresh_ahead: float) -> bool:
+    """キャッシュにないか、有効期限までの残りが refresh_ahead 秒未満かどうか"""
+    entry = weather_cache.peek(cache_key)
+    return entry is None or entry[1] - time.time() < refresh_ahead
+
+async def aprefetch_weather(
+    cities: Iterable[str],
+    max_concurrency: int = config.BATCH_MAX_CONCURRENCY,
+    refresh_ahead: float = 0
+) -> int:
+    """
+    複数の都市の天気情報を並行に取得してキャッシュに保存する
+
+    都市名の変換をまとめて行い、英語名が同じ都市は1回だけ取得する。取得に失敗した都市は
+    ここでは無視する（実際に問い合わせたときにエラーになる）。
+
+    Args:
+        cities: 都市名
+        max_concurrency: 同時リクエスト数の上限
+        refresh_ahead: キャッシュにあっても、有効期限までの残りがこの秒数未満なら取得し直す
+
+    Returns:
+        int: 新たに取得した都市の数
+    """
+    english_cities = await aconvert_to_english_city_names(cities, max_concurrency)
+    missing = [
+        english_city for english_city in dict.fromkeys(english_cities.values())
+        if _needs_fetch(_weather_cache_key(english_city), refresh_ahead)
+    ]
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(english_city: str) -> bool:
+        cache_key = _weather_cache_key(english_city)
+        async with semaphore:
+            try:
+                await weather_flight.ado(cache_key, _afetch_weather, english_city, cache_key)
+                return True
+            except (httpx.HTTPError, CircuitOpenError) as e:
+                logger.warning(f"Weather prefetch failed for {english_city}: {str(e)}")
+                return False
+
+    fetched = await asyncio.gather(*(fetch(english_city) for english_city in missing))
+    return sum(fetched)
+
+def _weather_params(english_city: str) -> dict:
+    """OpenWeather APIのリクエストパラメータを生成"""
+    return {
+        "q": english_city,
+        "appid": os.environ["OPENWEATHER_KEY"],
+        "units": WEATHER_UNITS,
+        "lang": WEATHER_LANG
+    }
+
+def summarize_weather(weather_data: dict, city: Optional[str] = None) -> dict:
+    """
+    OpenWeatherのレスポンスを回答に必要な項目だけに絞る
+
+    Args:
+        weather_data: OpenWeather APIのレスポンス
+        city: 回答に表示する都市名（省略時はレスポンスの都市名）
+
+    Returns:
+        dict: {city, temperature, description, humidity, wind_speed}
+    """
+    return {
+        "city": city or weather_data.get("name", ""),
+        "temperature": weather_data["main"]["temp"],
+        "description": weather_data["weather"][0]["description"],
+        "humidity": weather_data["main"]["humidity"],
+        "wind_speed": weather_data["wind"]["speed"]
+    }
+
+def _fetch_weather(english_city: str, cache_key: tuple) -> dict:
+    """OpenWeather APIから天気情報を取得し、キャッシュに保存する"""
+    with span("weather.openweather_request", city=english_city):
+        response = http_client.get(OPENWEATHER_URL, params=_weather_params(english_city))
+
+    weather_data = response.json()
+    logger.debug(f"Weather data retrieved: {weather_data}")
+    weather_cache.set(cache_key, weather_data)
+    return weather_data
+
+async def _afetch_weather(english_city: str, cache_key: tuple) -> dict:
+    """_fetch_weather の非同期版"""
+    with span("weather.openweather_request", city=english_city):
+        response = await http_client.aget(OPENWEATHER_URL, params=_weather_params(english_city))
+
+    weather_data = response.json()
+    logger.debug(f"Weather data retrieved: {weather_data}")
+    weather_cache.set(cache_key, weather_data)
+    return weather_data
+
+def _log_revalidate_error(english_city: str, error: BaseException) -> None:
+    logger.warning(f"Weather revalidation failed for {english_city}: {str(error)}")
+
+def _get_revalidate_executor() -> ThreadPoolExecutor:
+    """裏での取得用のスレッドプール（WEATHER_STALE_TTL が0の場合は生成しない）"""
+    global _revalidate_executor
+    with _revalidate_lock:
+        if _revalidate_executor is None:
+            _revalidate_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-revalidate")
+        return _revalidate_executor
+
+def _schedule_revalidation(cache_key: tuple, start: Callable[[], Union[Future, asyncio.Future]]) -> None:
+    """
+    裏での取得を start で予定する（同じ都市の取得が予定・実行中であれば何もしない）
+
+    single-flight は同時に実行中の取得しかまとめないため、期限切れの天気情報を返すたびに
+    取得を予定すると、待ち行列に残った取得が前の取得の完了後にそれぞれ実行されてしまう。
+    閉じたイベントループに残ったタスクは実行されないため、予定されていないものとみなす。
+    """
+    with _revalidate_lock:
+        pending = _revalidations.get(cache_key)
+        if pending is not None and not pending.done():
+            if not isinstance(pending, asyncio.Future) or not pending.get_loop().is_closed():
+                return
+        _revalidations[cache_key] = start()
+
+def _revalidate(english_city: str, cache_key: tuple) -> None:
+    """期限切れの天気情報を裏で取得し直す（予定から実行までの間に取得済みであれば何もしない）"""
+    try:
+        if _needs_fetch(cache_key, 0):
+            weather_flight.do(cache_key, _fetch_weather, english_city, cache_key)
+    except Exception as e:
+        _log_revalidate_error(english_city, e)
+
+async def _arevalidate(english_city: str, cache_key: tuple) -> None:
+    """_revalidate の非同期版"""
+    try:
+        if _needs_fetch(cache_key, 0):
+            await weather_flight.ado(cache_key, _afetch_weather, english_city, cache_key)
+    except Exception as e:
+        _log_revalidate_error(english_city, e)
+
+def _stale_weather(cache_key: tuple) -> Optional[dict]:
+    """期限切れ後の保持期間内の天気情報（stale-while-revalidate で返す）。ない場合はNone"""
+    entry = weather_cache.peek(cache_key)
+    if entry is None:
+        return None
+    logger.debug(f"Serving stale weather: {cache_key}")
+    add_event("weather.stale", city=cache_key[0])
+    return entry[0]
+
+@traced("tool.get_weather")
+def _get_weather(city: str) -> dict:
     """OpenWeather APIを使用して実際の天気情報を取得"""
     try:
         logger.info(f"Getting weather for city: {city}")
-        
+
         # 日本語の都市名を英語に変換
         english_city = convert_to_english_city_name(city)
         logger.debug(f"Converted city name: {english_city}")
-        
-        base_url = "https://api.openweathermap.org/data/2.5/weather"
-        params = {
-            "q": english_city,
-            "appid": os.environ["OPENWEATHER_KEY"],
-            "units": "metric",  # 摂氏温度を使用
-            "lang": "ja"  # 日本語で天気情報を取得
-        }
-        
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        
-        weather_data = response.json()
-        logger.debug(f"Weather data retrieved: {weather_data}")
-        
-        return weather_data
-        
-    except requests.exceptions.RequestException as e:
+
+        cache_key = _weather_cache_key(english_city)
+        cached = weather_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Weather cache hit: {cache_key}")
+            return cached
+
+        stale = _stale_weather(cache_key)
+        if stale is not None:
+            executor = _get_revalidate_executor()
+            _schedule_revalidation(cache_key, lambda: executor.submit(_revalidate, english_city, cache_key))
+            return stale
+
+        return weather_flight.do(cache_key, _fetch_weather, english_city, cache_key)
+
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        logger.error(f"Error getting weather data: {str(e)}")
+        raise WeatherToolError(f"天気情報の取得に失敗しました: {str(e)}")
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise WeatherToolError(f"予期せぬエラーが発生しました: {str(e)}")
+
+@traced("tool.get_weather")
+async def _aget_weather(city: str) -> dict:
+    """OpenWeather APIを使用して実際の天気情報を非同期に取得"""
+    try:
+        logger.info(f"Getting weather for city: {city}")
+
+        # 日本語の都市名を英語に変換
+        english_city = await aconvert_to_english_city_name(city)
+        logger.debug(f"Converted city name: {english_city}")
+
+        cache_key = _weather_cache_key(english_city)
+        cached = weather_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Weather cache hit: {cache_key}")
+            return cached
+
+        stale = _stale_weather(cache_key)
+        if stale is not None:
+            _schedule_revalidation(cache_key, lambda: asyncio.ensure_future(_arevalidate(english_city, cache_key)))
+            return stale
+
+        return await weather_flight.ado(cache_key, _afetch_weather, english_city, cache_key)
+
+    except (httpx.HTTPError, CircuitOpenError) as e:
         logger.error(f"Error getting weather data: {str(e)}")
         raise WeatherToolError(f"天気情報の取得に失敗しました: {str(e)}")
+    except BudgetExceededError:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        raise WeatherToolError(f"予期せぬエラーが発生しました: {str(e)}") 
\ No newline at end of file
+        raise WeatherToolError(f"予期せぬエラーが発生しました: {str(e)}")
+
+# 同期・非同期の両方で呼び出せるツール
+get_weather = StructuredTool.from_function(
+    func=_get_weather,
+    coroutine=_aget_weather,
+    name="get_weather",
+    description="OpenWeather APIを使用して実際の天気情報を取得"
+)
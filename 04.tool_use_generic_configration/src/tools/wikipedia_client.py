@@ -0,0 +1,255 @@
+"""
+Wikipedia（MediaWiki API）の簡易クライアント
+
+wikipediaライブラリは内部で requests を直接呼び出すため、共通のHTTPクライアント
+（接続プール・再試行・サーキットブレーカー）を経由するよう必要な機能だけを実装している。
+
+wikipediaライブラリの auto_suggest と同じく、検索結果がない場合は検索候補（「もしかして」）で
+検索し直し、ページが存在しない場合はタイトルで検索した最上位の記事を取得する。
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+from src import config
+from src.utils.cache import create_cache
+from src.utils.exceptions import DisambiguationError, PageNotFoundError
+from src.utils.http_client import http_client
+from src.utils.single_flight import SingleFlight
+
+API_URL = "https://{lang}.wikipedia.org/w/api.php"
+
+# 検索結果とページ本文のキャッシュ（キー: (言語, 検索語/タイトル)）
+search_cache = create_cache(
+    config.WIKIPEDIA_CACHE_BACKEND,
+    ttl=config.WIKIPEDIA_CACHE_TTL,
+    maxsize=config.WIKIPEDIA_CACHE_MAXSIZE,
+    path=os.path.join(config.CACHE_DIR, "wikipedia_search.sqlite3"),
+    name="wikipedia_search"
+)
+page_cache = create_cache(
+    config.WIKIPEDIA_CACHE_BACKEND,
+    ttl=config.WIKIPEDIA_CACHE_TTL,
+    maxsize=config.WIKIPEDIA_CACHE_MAXSIZE,
+    path=os.path.join(config.CACHE_DIR, "wikipedia_pages.sqlite3"),
+    name="wikipedia_page"
+)
+
+# 同じ検索語・タイトルの実行中のリクエストに相乗りする
+search_flight = SingleFlight("wikipedia_search")
+page_flight = SingleFlight("wikipedia_page")
+
+
+def _search_params(query: str, results: int) -> dict:
+    return {
+        "action": "query",
+        "list": "search",
+        "srsearch": query,
+        "srlimit": results,
+        "srprop": "",
+        "srinfo": "suggestion",
+        "format": "json"
+    }
+
+
+def _page_params(title: str) -> dict:
+    return {
+        "action": "query",
+        "prop": "extracts|pageprops|info",
+        "explaintext": 1,
+        "ppprop": "disambiguation",
+        "inprop": "url",
+        "redirects": 1,
+        "titles": title,
+        "format": "json"
+    }
+
+
+def _links_params(title: str) -> dict:
+    return {
+        "action": "query",
+        "prop": "links",
+        "plnamespace": 0,
+        "pllimit": "max",
+        "titles": title,
+        "format": "json"
+    }
+
+
+def _parse_search(data: dict) -> Tuple[List[str], Optional[str]]:
+    """検索結果を (タイトルのリスト, 検索候補) に変換する"""
+    query = data.get("query", {})
+    titles = [item["title"] for item in query.get("search", [])]
+    return titles, query.get("searchinfo", {}).get("suggestion")
+
+
+def _parse_page(title: str, data: dict) -> dict:
+    """
+    ページ取得結果を {"title", "content", "url", "disambiguation"} に変換する
+
+    Raises:
+        PageNotFoundError: ページが存在しない場合
+    """
+    pages = data.get("query", {}).get("pages", {})
+    if not pages:
+        raise PageNotFoundError(f"{title} が見つかりませんでした")
+
+    page = next(iter(pages.values()))
+    if "missing" in page or "invalid" in page:
+        raise PageNotFoundError(f"{title} が見つかりませんでした")
+
+    return {
+        "title": page["title"],
+        "content": page.get("extract", ""),
+        "url": page.get("fullurl", ""),
+        "disambiguation": "disambiguation" in page.get("pageprops", {})
+    }
+
+
+def _parse_links(data: dict) -> List[str]:
+    pages = data.get("query", {}).get("pages", {})
+    return [link["title"] for page in pages.values() for link in page.get("links", [])]
+
+
+def _page_result(page: dict) -> dict:
+    """
+    キャッシュしたページを返す。曖昧さ回避ページの場合は例外を送出する
+
+    Raises:
+        DisambiguationError: 曖昧さ回避ページの場合（options に候補のタイトル）
+    """
+    if page["options"] is not None:
+        raise DisambiguationError(page["title"], page["options"])
+    return {"title": page["title"], "content": page["content"], "url": page["url"]}
+
+
+def _fetch_search(query: str, results: int, lang: str) -> List[str]:
+    """検索してキャッシュに保存する（結果がなく検索候補がある場合は候補で検索し直す）"""
+    url = API_URL.format(lang=lang)
+    titles, suggestion = _parse_search(http_client.get(url, params=_search_params(query, results)).json())
+    if not titles and suggestion:
+        titles, _ = _parse_search(http_client.get(url, params=_search_params(suggestion, results)).json())
+    search_cache.set((lang, query, results), titles)
+    return titles
+
+
+async def _afetch_search(query: str, results: int, lang: str) -> List[str]:
+    """_fetch_search の非同期版"""
+    url = API_URL.format(lang=lang)
+    response = await http_client.aget(url, params=_search_params(query, results))
+    titles, suggestion = _parse_search(response.json())
+    if not titles and suggestion:
+        response = await http_client.aget(url, params=_search_params(suggestion, results))
+        titles, _ = _parse_search(response.json())
+    search_cache.set((lang, query, results), titles)
+    return titles
+
+
+def _suggested_title(title: str, titles: List[str]) -> str:
+    """
+    ページが存在しないタイトルの代わりに取得する記事（タイトルで検索した最上位の記事）
+
+    Raises:
+        PageNotFoundError: 検索しても別の記事が見つからない場合
+    """
+    if not titles or titles[0] == title:
+        raise PageNotFoundError(f"{title} が見つかりませんでした")
+    return titles[0]
+
+
+def _fetch_page(title: str, lang: str, auto_suggest: bool = True) -> dict:
+    """ページを取得してキャッシュに保存する（曖昧さ回避ページの場合は候補も取得する）"""
+    url = API_URL.format(lang=lang)
+    try:
+        result = _parse_page(title, http_client.get(url, params=_page_params(title)).json())
+    except PageNotFoundError:
+        if not auto_suggest:
+            raise
+        result = dict(_fetch_page(_suggested_title(title, search(title, results=1, lang=lang)), lang, False))
+        page_cache.set((lang, title), result)
+        return result
+    result["options"] = None
+    if result.pop("disambiguation"):
+        result["options"] = _parse_links(http_client.get(url, params=_links_params(result["title"])).json())
+    page_cache.set((lang, title), result)
+    return result
+
+
+async def _afetch_page(title: str, lang: str, auto_suggest: bool = True) -> dict:
+    """_fetch_page の非同期版"""
+    url = API_URL.format(lang=lang)
+    try:
+        response = await http_client.aget(url, params=_page_params(title))
+        result = _parse_page(title, response.json())
+    except PageNotFoundError:
+        if not auto_suggest:
+            raise
+        suggested = _suggested_title(title, await asearch(title, results=1, lang=lang))
+        result = dict(await _afetch_page(suggested, lang, False))
+        page_cache.set((lang, title), result)
+        return result
+    result["options"] = None
+    if result.pop("disambiguation"):
+        links_response = await http_client.aget(url, params=_links_params(result["title"]))
+        result["options"] = _parse_links(links_response.json())
+    page_cache.set((lang, title), result)
+    return result
+
+
+def search(query: str, results: int = 3, lang: str = "en") -> List[str]:
+    """
+    記事を検索してタイトルのリストを返す
+
+    Args:
+        query: 検索語
+        results: 取得する件数
+        lang: Wikipediaの言語
+
+    Returns:
+        List[str]: 記事タイトルのリスト
+    """
+    cache_key = (lang, query, results)
+    titles = search_cache.get(cache_key)
+    if titles is None:
+        titles = search_flight.do(cache_key, _fetch_search, query, results, lang)
+    return titles
+
+
+async def asearch(query: str, results: int = 3, lang: str = "en") -> List[str]:
+    """search の非同期版"""
+    cache_key = (lang, query, results)
+    titles = search_cache.get(cache_key)
+    if titles is None:
+        titles = await search_flight.ado(cache_key, _afetch_search, query, results, lang)
+    return titles
+
+
+def page(title: str, lang: str = "en") -> dict:
+    """
+    記事の本文を取得する
+
+    Args:
+        title: 記事タイトル
+        lang: Wikipediaの言語
+
+    Returns:
+        dict: {"title", "content", "url"}（ページが存在しない場合はタイトルで検索した最上位の記事）
+
+    Raises:
+        PageNotFoundError: ページが存在せず、検索しても見つからない場合
+        DisambiguationError: 曖昧さ回避ページの場合（options に候補のタイトル）
+    """
+    cache_key = (lang, title)
+    cached = page_cache.get(cache_key)
+    if cached is None:
+        cached = page_flight.do(cache_key, _fetch_page, title, lang)
+    return _page_result(cached)
+
+
+async def apage(title: str, lang: str = "en") -> dict:
+    """page の非同期版"""
+    cache_key = (lang, title)
+    cached = page_cache.get(cache_key)
+    if cached is None:
+        cached = await page_flight.ado(cache_key, _afetch_page, title, lang)
+    return _page_result(cached)
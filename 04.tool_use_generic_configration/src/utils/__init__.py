@@ -3,21 +3,53 @@ Utilities package for weather and food information retrieval system.
 """
 
 from .logger import CustomLogger
+from .cache import BaseCache, MemoryCache, SQLiteCache, NullCache, create_cache
+from .response_cache import ResponseCache, SemanticIndex
+from .metrics import Counter, Histogram, MetricsRegistry
+from .tracing import Span, Tracer, InMemorySpanExporter
+from .usage import Usage, UsageAccountant
+from .single_flight import SingleFlight
 from .exceptions import (
     AgentError,
     ToolError,
     WeatherToolError,
     FoodToolError,
+    CircuitOpenError,
+    PageNotFoundError,
+    DisambiguationError,
+    ServerOverloadedError,
     AgentExecutionError,
-    AgentInitializationError
+    AgentInitializationError,
+    BudgetExceededError
 )
 
 __all__ = [
     'CustomLogger',
+    'BaseCache',
+    'MemoryCache',
+    'SQLiteCache',
+    'NullCache',
+    'create_cache',
+    'ResponseCache',
+    'SemanticIndex',
+    'Counter',
+    'Histogram',
+    'MetricsRegistry',
+    'Span',
+    'Tracer',
+    'InMemorySpanExporter',
+    'Usage',
+    'UsageAccountant',
+    'SingleFlight',
     'AgentError',
     'ToolError',
     'WeatherToolError',
     'FoodToolError',
+    'CircuitOpenError',
+    'PageNotFoundError',
+    'DisambiguationError',
+    'ServerOverloadedError',
     'AgentExecutionError',
-    'AgentInitializationError'
+    'AgentInitializationError',
+    'BudgetExceededError'
 ] 
\ No newline at end of file
@@ -0,0 +1,304 @@
+"""
+TTL付きキャッシュの実装
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from src.utils.metrics import CACHE_LOOKUPS
+from src.utils.tracing import add_event
+
+
+class CacheStats:
+    def __init__(self, name: Optional[str] = None):
+        """
+        キャッシュのヒット・ミス・追い出し回数
+
+        Args:
+            name: キャッシュ名（指定した場合はメトリクスと現在のスパンにも記録する）
+        """
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hit(self) -> None:
+        self.hits += 1
+        self._record("hit")
+
+    def miss(self) -> None:
+        self.misses += 1
+        self._record("miss")
+
+    def _record(self, result: str) -> None:
+        if self.name is not None:
+            CACHE_LOOKUPS.inc(cache=self.name, result=result)
+            add_event(f"cache.{result}", cache=self.name)
+
+    @property
+    def hit_rate(self) -> float:
+        """ヒット率（0〜1）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        """統計情報を辞書で返す"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate
+        }
+
+
+class BaseCache(ABC):
+    """キャッシュバックエンドの基底クラス"""
+
+    def __init__(self, ttl: float, maxsize: int, stale_ttl: float = 0):
+        """
+        キャッシュの初期化
+
+        Args:
+            ttl: エントリの有効期間（秒）
+            maxsize: 保持するエントリ数の上限（超えた場合は最も古く参照されたものから削除）
+            stale_ttl: 期限切れ後もエントリを削除せずに保持する期間（秒）。get はミスとして扱い、peek で参照できる
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """キーに対応する値を返す。存在しないか期限切れの場合はNone"""
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any) -> None:
+        """値を保存する"""
+
+    @abstractmethod
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        期限切れ後の保持期間内のものも含めてエントリを返す（ヒット・ミスには数えず、参照順も変えない）
+
+        Returns:
+            Optional[Tuple[Any, float]]: (値, 有効期限のUNIX時刻)。保持していない場合はNone
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """すべてのエントリを削除する"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """保持しているエントリ数を返す"""
+
+
+class NullCache(BaseCache):
+    """何も保持しないキャッシュ（キャッシュ無効化用）"""
+
+    def __init__(self):
+        super().__init__(ttl=0, maxsize=0)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        self.stats.miss()
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        pass
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        return None
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class MemoryCache(BaseCache):
+    """プロセス内メモリ上のLRUキャッシュ"""
+
+    def __init__(self, ttl: float, maxsize: int, stale_ttl: float = 0):
+        super().__init__(ttl=ttl, maxsize=maxsize, stale_ttl=stale_ttl)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.miss()
+                return None
+
+            expires_at, value = entry
+            now = time.time()
+            if expires_at < now:
+                if expires_at + self.stale_ttl < now:
+                    del self._data[key]
+                self.stats.miss()
+                return None
+
+            self._data.move_to_end(key)
+            self.stats.hit()
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[0] + self.stale_ttl < time.time():
+            return None
+        expires_at, value = entry
+        return value, expires_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(BaseCache):
+    """SQLiteファイルに保存するLRUキャッシュ（プロセス再起動後も有効）"""
+
+    def __init__(self, path: str, ttl: float, maxsize: int, stale_ttl: float = 0):
+        """
+        SQLiteキャッシュの初期化
+
+        Args:
+            path: SQLiteファイルのパス
+            ttl: エントリの有効期間（秒）
+            maxsize: 保持するエントリ数の上限
+            stale_ttl: 期限切れ後もエントリを削除せずに保持する期間（秒）
+        """
+        super().__init__(ttl=ttl, maxsize=maxsize, stale_ttl=stale_ttl)
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _serialize_key(key: Hashable) -> str:
+        return json.dumps(key, ensure_ascii=False)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        db_key = self._serialize_key(key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (db_key,)
+            ).fetchone()
+            if row is None:
+                self.stats.miss()
+                return None
+
+            value, expires_at = row
+            if expires_at < now:
+                if expires_at + self.stale_ttl < now:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (db_key,))
+                    self._conn.commit()
+                self.stats.miss()
+                return None
+
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, db_key))
+            self._conn.commit()
+            self.stats.hit()
+            return json.loads(value)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (self._serialize_key(key), json.dumps(value, ensure_ascii=False), now + self.ttl, now)
+            )
+            # 上限を超えた分を最終参照の古い順に削除
+            overflow = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.maxsize
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.stats.evictions += overflow
+            self._conn.commit()
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (self._serialize_key(key),)
+            ).fetchone()
+        if row is None or row[1] + self.stale_ttl < time.time():
+            return None
+        value, expires_at = row
+        return json.loads(value), expires_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def create_cache(
+    backend: str,
+    ttl: float,
+    maxsize: int,
+    path: Optional[str] = None,
+    name: Optional[str] = None,
+    stale_ttl: float = 0
+) -> BaseCache:
+    """
+    設定値からキャッシュを生成する
+
+    Args:
+        backend: "memory" / "sqlite" / "none"
+        ttl: エントリの有効期間（秒）
+        maxsize: 保持するエントリ数の上限
+        path: SQLiteファイルのパス（backend が "sqlite" の場合に必須）
+        name: キャッシュ名（ヒット・ミスをメトリクスと現在のスパンに記録する）
+        stale_ttl: 期限切れ後もエントリを保持する期間（秒。peek で参照できる）
+
+    Returns:
+        BaseCache: 生成したキャッシュ
+    """
+    if backend == "memory":
+        cache = MemoryCache(ttl=ttl, maxsize=maxsize, stale_ttl=stale_ttl)
+    elif backend == "sqlite":
+        if path is None:
+            raise ValueError("SQLite cache requires a path")
+        cache = SQLiteCache(path=path, ttl=ttl, maxsize=maxsize, stale_ttl=stale_ttl)
+    elif backend == "none":
+        cache = NullCache()
+    else:
+        raise ValueError(f"Unknown cache backend: {backend}")
+    cache.stats.name = name
+    return cache
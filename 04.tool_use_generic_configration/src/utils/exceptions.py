@@ -14,10 +14,33 @@ class FoodToolError(ToolError):
     """料理情報取得ツールの例外クラス"""
     pass
 
+class CircuitOpenError(ToolError):
+    """接続先への呼び出しが遮断されている（サーキットブレーカーが開いている）場合の例外クラス"""
+    pass
+
+class PageNotFoundError(FoodToolError):
+    """Wikipediaのページが存在しない場合の例外クラス"""
+    pass
+
+class DisambiguationError(FoodToolError):
+    """Wikipediaのページが曖昧さ回避ページだった場合の例外クラス"""
+    def __init__(self, title: str, options: list):
+        super().__init__(f"{title} は曖昧さ回避ページです")
+        self.title = title
+        self.options = options
+
+class ServerOverloadedError(Exception):
+    """サーバーの処理待ちが上限に達した場合の例外クラス"""
+    pass
+
 class AgentExecutionError(AgentError):
     """エージェント実行時の例外クラス"""
     pass
 
 class AgentInitializationError(AgentError):
     """エージェント初期化時の例外クラス"""
+    pass
+
+class BudgetExceededError(AgentError):
+    """クエリのLLM使用量が上限に達した場合の例外クラス"""
     pass 
\ No newline at end of file
@@ -0,0 +1,286 @@
+"""
+ツール共通のHTTPクライアント（接続プール・再試行・サーキットブレーカー）
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src import config
+from src.utils.exceptions import CircuitOpenError
+from src.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__)
+
+# 再試行の対象とするステータスコード
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        接続先ごとのサーキットブレーカー
+
+        連続失敗が failure_threshold 回に達すると遮断（open）し、reset_timeout 秒後に
+        1件だけ試行（half-open）を許可する。試行が成功すれば通常状態（closed）に戻る。
+
+        Args:
+            failure_threshold: 遮断するまでの連続失敗回数
+            reset_timeout: 遮断後、試行を再開するまでの時間（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """リクエストを送ってよいか判定"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_abort(self) -> None:
+        """
+        成功・失敗を記録せずに終わった場合（キャンセルや想定外の例外）に呼び出す
+
+        試行（half-open）中であれば遮断に戻し、reset_timeout 秒後に改めて試行を許可する。
+        これを呼ばないと、他のリクエストを拒否したまま half-open から抜けられなくなる。
+        """
+        with self._lock:
+            if self.state == "half-open":
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    def __init__(
+        self,
+        timeout: float = config.TIMEOUT,
+        max_retries: int = config.MAX_RETRIES,
+        backoff_base: float = config.HTTP_BACKOFF_BASE,
+        backoff_max: float = config.HTTP_BACKOFF_MAX,
+        max_retry_after: float = config.HTTP_MAX_RETRY_AFTER,
+        max_connections: int = config.HTTP_MAX_CONNECTIONS,
+        transport: Optional[httpx.MockTransport] = None
+    ):
+        """
+        ツール共通のHTTPクライアントの初期化
+
+        Args:
+            timeout: リクエストのタイムアウト（秒）
+            max_retries: 再試行の最大回数
+            backoff_base: 再試行の待ち時間の基準値（秒）
+            backoff_max: 再試行の待ち時間の上限（秒）
+            max_retry_after: Retry-After がこれより長い場合は再試行しない（秒）
+            max_connections: 接続プールの上限
+            transport: 同期・非同期の両方に使うトランスポート（テストで応答を差し替える場合に指定）
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._headers = {"User-Agent": config.HTTP_USER_AGENT}
+        self._transport = transport
+        self._client: Optional[httpx.Client] = None
+        # 非同期クライアントの接続はそれを作ったイベントループでしか使えないため、ループごとに作る
+        # （asyncio.run の呼び出しごとや、CoordinatorAgent ごとのループで別のクライアントになる）
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    timeout=self.timeout, limits=self._limits, headers=self._headers, transport=self._transport
+                )
+            return self._client
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """実行中のイベントループの非同期クライアントを返す（イベントループ内で呼び出す）"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    timeout=self.timeout, limits=self._limits, headers=self._headers, transport=self._transport
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        """URLの接続先に対応するサーキットブレーカーを返す"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                    config.CIRCUIT_BREAKER_RESET_TIMEOUT
+                )
+            return self._breakers[host]
+
+    def _check_circuit(self, url: str) -> CircuitBreaker:
+        breaker = self.breaker(url)
+        if not breaker.allow_request():
+            host = urlsplit(url).netloc
+            logger.warning(f"Circuit open for {host}, request rejected")
+            raise CircuitOpenError(f"{host} への接続を一時的に停止しています")
+        return breaker
+
+    def _retry_after(self, response: httpx.Response) -> Optional[float]:
+        """Retry-After ヘッダーを秒数に変換（秒数・HTTP日付の両形式に対応）"""
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _next_delay(self, attempt: int, response: Optional[httpx.Response]) -> Optional[float]:
+        """
+        次の再試行までの待ち時間を返す。再試行しない場合はNone
+
+        Args:
+            attempt: これまでの再試行回数
+            response: 直前のレスポンス（通信エラーの場合はNone）
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        if response is not None:
+            retry_after = self._retry_after(response)
+            if retry_after is not None:
+                return retry_after if retry_after <= self.max_retry_after else None
+
+        # 指数バックオフにジッターを加える（full jitter）
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _handle_response(self, response: httpx.Response, breaker: CircuitBreaker) -> bool:
+        """レスポンスを評価し、再試行が必要ならTrueを返す"""
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            return True
+        # 4xx は接続先の障害ではないためブレーカーには成功として記録する
+        breaker.record_success()
+        response.raise_for_status()
+        return False
+
+    def get(self, url: str, params: Optional[dict] = None) -> httpx.Response:
+        """
+        GETリクエストを送る（失敗時は再試行）
+
+        Args:
+            url: リクエスト先のURL
+            params: クエリパラメータ
+
+        Returns:
+            httpx.Response: 成功したレスポンス
+
+        Raises:
+            CircuitOpenError: 接続先への呼び出しが遮断されている場合
+            httpx.HTTPError: 再試行しても成功しなかった場合
+        """
+        breaker = self._check_circuit(url)
+        try:
+            return self._get(url, params, breaker)
+        except BaseException:
+            breaker.record_abort()
+            raise
+
+    def _get(self, url: str, params: Optional[dict], breaker: CircuitBreaker) -> httpx.Response:
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self._sync_client().get(url, params=params)
+                if not self._handle_response(response, breaker):
+                    return response
+                error: httpx.HTTPError = httpx.HTTPStatusError(
+                    f"Server returned {response.status_code}", request=response.request, response=response
+                )
+            except httpx.TransportError as e:
+                error = e
+
+            delay = self._next_delay(attempt, response)
+            if delay is None:
+                breaker.record_failure()
+                raise error
+            attempt += 1
+            logger.warning(f"Retrying {url} in {delay:.2f}s (attempt {attempt}/{self.max_retries}): {str(error)}")
+            time.sleep(delay)
+
+    async def aget(self, url: str, params: Optional[dict] = None) -> httpx.Response:
+        """get の非同期版"""
+        breaker = self._check_circuit(url)
+        try:
+            return await self._aget(url, params, breaker)
+        except BaseException:
+            # asyncio.wait_for などでキャンセルされた場合も試行中の状態を解除する
+            breaker.record_abort()
+            raise
+
+    async def _aget(self, url: str, params: Optional[dict], breaker: CircuitBreaker) -> httpx.Response:
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await self._get_async_client().get(url, params=params)
+                if not self._handle_response(response, breaker):
+                    return response
+                error: httpx.HTTPError = httpx.HTTPStatusError(
+                    f"Server returned {response.status_code}", request=response.request, response=response
+                )
+            except httpx.TransportError as e:
+                error = e
+
+            delay = self._next_delay(attempt, response)
+            if delay is None:
+                breaker.record_failure()
+                raise error
+            attempt += 1
+            logger.warning(f"Retrying {url} in {delay:.2f}s (attempt {attempt}/{self.max_retries}): {str(error)}")
+            await asyncio.sleep(delay)
+
+    def close(self) -> None:
+        """同期クライアントの接続を閉じる"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+# ツール間で共有するインスタンス
+http_client = HttpClient()
@@ -0,0 +1,206 @@
+"""
+Prometheus形式のメトリクス
+
+カウンターとヒストグラムをプロセス内に保持し、Prometheusのテキスト形式で出力する
+（prometheus_client には依存しない）。HTTPサーバーの GET /metrics で公開する。
+"""
+
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src import config
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        メトリクスの初期化
+
+        Args:
+            name: メトリクス名
+            documentation: 説明（HELP 行に出力する）
+            labelnames: ラベル名
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} requires labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"] + self._samples()
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """HELP・TYPE 行に続くサンプル行を返す"""
+
+
+class Counter(_Metric):
+    """増加のみするカウンター"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """ラベルの組に対応する値を増やす"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """値の分布（累積バケット・合計・件数）"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # ラベルの組 → [各バケットの件数, 合計, 件数]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """値を記録する"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """メトリクスの登録先"""
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def clear(self) -> None:
+        """記録した値をすべて消す（登録したメトリクスは残す）"""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式で出力する"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# プロセス全体で共有する登録先とメトリクス
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.register(Histogram(
+    "agent_stage_duration_seconds",
+    "Duration of each processing stage (span) in seconds",
+    ["stage"],
+    buckets=config.METRICS_LATENCY_BUCKETS
+))
+STAGE_ERRORS = registry.register(Counter(
+    "agent_stage_errors_total",
+    "Number of processing stages (spans) that ended with an exception",
+    ["stage"]
+))
+LLM_REQUESTS = registry.register(Counter(
+    "llm_requests_total",
+    "Number of LLM calls (including cached responses)",
+    ["model"]
+))
+LLM_TOKENS = registry.register(Counter(
+    "llm_tokens_total",
+    "Number of tokens reported by the LLM API",
+    ["model", "type"]
+))
+CACHE_LOOKUPS = registry.register(Counter(
+    "cache_lookups_total",
+    "Number of cache lookups by cache and result",
+    ["cache", "result"]
+))
+SINGLE_FLIGHT_CALLS = registry.register(Counter(
+    "single_flight_calls_total",
+    "Number of coalesced calls by result (executed: ran the work, shared: waited for an in-flight call)",
+    ["name", "result"]
+))
+LLM_ESCALATIONS = registry.register(Counter(
+    "llm_escalations_total",
+    "Number of LLM calls retried with the next model of the route after failing validation",
+    ["call_class", "model"]
+))
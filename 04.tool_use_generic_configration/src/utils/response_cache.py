@@ -0,0 +1,153 @@
+"""
+調整役エージェントの回答キャッシュ
+
+回答は (情報の種類, 正規化した都市名) ごとに保存する。情報の種類ごとにキャッシュを分けるため、
+天気は短く料理は長くといった有効期間を設定でき、「東京の天気と料理」の回答の一部を
+「東京の天気」の質問に再利用できる。
+
+埋め込みベクトルによる類似検索（任意）を有効にすると、辞書で都市名が見つからない質問を
+言い回しの異なる過去の質問の都市名に対応付け、都市名の抽出（LLM呼び出し）を省略する。
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Dict, Hashable, List, Optional
+
+from src.utils.cache import BaseCache, CacheStats, create_cache
+
+
+class SemanticIndex:
+    def __init__(self, embedder, threshold: float, maxsize: int):
+        """
+        質問文の埋め込みベクトルの索引（NumPyによる総当たり検索）
+
+        Args:
+            embedder: embed_query(text) -> List[float] を持つオブジェクト（LangChainのEmbeddings）
+            threshold: 同じ質問とみなすコサイン類似度の下限
+            maxsize: 保持する質問数の上限（超えた場合は古いものから削除）
+        """
+        import numpy as np
+
+        self._np = np
+        self.embedder = embedder
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.stats = CacheStats("response_semantic")
+        self._vectors = None
+        self._cities: "deque[str]" = deque()
+        self._lock = threading.Lock()
+
+    def _normalize(self, embedding: List[float]):
+        vector = self._np.asarray(embedding, dtype=self._np.float32)
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, query: str):
+        """質問文を正規化した埋め込みベクトルに変換"""
+        return self._normalize(self.embedder.embed_query(query))
+
+    async def aembed(self, query: str):
+        """embed の非同期版"""
+        return self._normalize(await self.embedder.aembed_query(query))
+
+    def search(self, vector) -> Optional[str]:
+        """
+        最も類似した質問の都市名を返す
+
+        Args:
+            vector: embed で得たベクトル
+
+        Returns:
+            Optional[str]: 都市名。類似度が閾値未満の場合はNone
+        """
+        with self._lock:
+            if self._vectors is None or not self._cities:
+                self.stats.miss()
+                return None
+            similarities = self._vectors @ vector
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                self.stats.miss()
+                return None
+            self.stats.hit()
+            return self._cities[best]
+
+    def add(self, vector, city: str) -> None:
+        """質問のベクトルと都市名を登録"""
+        with self._lock:
+            row = vector.reshape(1, -1)
+            self._vectors = row if self._vectors is None else self._np.vstack([self._vectors, row])
+            self._cities.append(city)
+            overflow = len(self._cities) - self.maxsize
+            if overflow > 0:
+                for _ in range(overflow):
+                    self._cities.popleft()
+                self._vectors = self._vectors[overflow:]
+                self.stats.evictions += overflow
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._cities.clear()
+
+    def __len__(self) -> int:
+        return len(self._cities)
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        maxsize: int,
+        backend: str = "memory",
+        cache_dir: Optional[str] = None,
+        semantic_index: Optional[SemanticIndex] = None
+    ):
+        """
+        回答キャッシュの初期化
+
+        Args:
+            ttls: 情報の種類ごとの有効期間（秒）。例: {"weather": 300, "food": 604800}
+            maxsize: 情報の種類ごとに保持するエントリ数の上限
+            backend: "memory" / "sqlite" / "none"
+            cache_dir: sqlite の保存先ディレクトリ
+            semantic_index: 類似質問の索引（省略時は完全一致のキーのみ）
+        """
+        self._caches: Dict[str, BaseCache] = {
+            intent: create_cache(
+                backend,
+                ttl=ttl,
+                maxsize=maxsize,
+                path=os.path.join(cache_dir, f"responses_{intent}.sqlite3") if cache_dir else None,
+                name=f"response_{intent}"
+            )
+            for intent, ttl in ttls.items()
+        }
+        self.semantic_index = semantic_index
+
+    def get(self, intent: str, city_key: str, variant: Hashable = None) -> Optional[str]:
+        """キャッシュした回答を返す。存在しないか期限切れの場合はNone"""
+        cache = self._caches.get(intent)
+        if cache is None:
+            return None
+        return cache.get((city_key, variant))
+
+    def set(self, intent: str, city_key: str, value: str, variant: Hashable = None) -> None:
+        """回答を保存する"""
+        cache = self._caches.get(intent)
+        if cache is not None:
+            cache.set((city_key, variant), value)
+
+    def clear(self) -> None:
+        for cache in self._caches.values():
+            cache.clear()
+        if self.semantic_index is not None:
+            self.semantic_index.clear()
+
+    def stats(self) -> dict:
+        """情報の種類ごと（と類似検索）の統計情報を返す"""
+        stats = {intent: cache.stats.to_dict() for intent, cache in self._caches.items()}
+        if self.semantic_index is not None:
+            stats["semantic"] = self.semantic_index.stats.to_dict()
+        return stats
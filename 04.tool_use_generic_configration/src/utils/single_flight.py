@@ -0,0 +1,126 @@
+"""
+同じ処理の同時実行をまとめる（single-flight）
+
+同じキーの処理が実行中のときに呼び出された場合は、新たに実行せずに実行中の処理の
+結果（または例外）を待って受け取る。キャッシュは最初の結果が保存されるまで効かないため、
+同じ都市への問い合わせが同時に集中したとき（台風の日など）に重複するAPI呼び出しをここで防ぐ。
+
+同期（スレッド）と非同期（asyncio）は別々に管理する。非同期では処理をタスクとして実行し、
+待っている呼び出しのどれかがキャンセルされても、他の呼び出しには影響しないようにする。
+処理は最初の呼び出し元のコンテキスト（スパン・使用量の集計先）で実行される。
+
+使い方:
+    weather_flight = SingleFlight("weather")
+    data = weather_flight.do(key, fetch, city)
+    data = await weather_flight.ado(key, afetch, city)
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, Type
+
+from src import config
+from src.utils.metrics import SINGLE_FLIGHT_CALLS
+from src.utils.tracing import add_event
+
+
+class SingleFlight:
+    def __init__(self, name: str, unshared_errors: Tuple[Type[BaseException], ...] = ()):
+        """
+        同時実行をまとめる単位の初期化
+
+        Args:
+            name: 名前（メトリクスとスパンのイベントに記録する）
+            unshared_errors: 呼び出し元ごとの事情による例外（使用量の上限など）。待っていた呼び出しには
+                渡さず、それぞれ自分で実行し直す
+        """
+        self.name = name
+        self.unshared_errors = unshared_errors
+        self._calls: Dict[Hashable, Future] = {}
+        # (イベントループ, キー) → 実行中のタスク
+        self._tasks: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, result: str) -> None:
+        SINGLE_FLIGHT_CALLS.inc(name=self.name, result=result)
+        if result == "shared":
+            add_event("single_flight.shared", flight=self.name)
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        func(*args, **kwargs) を実行する。同じキーの処理が実行中の場合はその結果を待って返す
+
+        Args:
+            key: 同じ処理とみなすキー
+            func: 実行する関数
+
+        Returns:
+            func の戻り値（実行中の処理が例外で終わった場合は同じ例外を送出する）
+        """
+        if not config.SINGLE_FLIGHT_ENABLED:
+            return func(*args, **kwargs)
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            self._record("shared")
+            try:
+                return future.result()
+            except self.unshared_errors:
+                return func(*args, **kwargs)
+
+        self._record("executed")
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result
+
+    async def ado(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """
+        do の非同期版（func はコルーチン関数）
+
+        Args:
+            key: 同じ処理とみなすキー
+            func: 実行するコルーチン関数
+
+        Returns:
+            func の戻り値（実行中の処理が例外で終わった場合は同じ例外を送出する）
+        """
+        if not config.SINGLE_FLIGHT_ENABLED:
+            return await func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            self._record("executed")
+            task = loop.create_task(func(*args, **kwargs))
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda done: self._task_done(task_key, done))
+            return await asyncio.shield(task)
+
+        self._record("shared")
+        try:
+            return await asyncio.shield(task)
+        except self.unshared_errors:
+            return await func(*args, **kwargs)
+
+    def _task_done(self, task_key: Tuple[asyncio.AbstractEventLoop, Hashable], task: asyncio.Task) -> None:
+        if self._tasks.get(task_key) is task:
+            del self._tasks[task_key]
+        # 待っていた呼び出しがすべてキャンセルされた場合も、例外が未取得の警告を出さない
+        if not task.cancelled():
+            task.exception()
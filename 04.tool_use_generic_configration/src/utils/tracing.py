@@ -0,0 +1,280 @@
+"""
+処理段階ごとのトレーシング
+
+OpenTelemetryと同じデータモデル（trace_id / span_id / 親スパン / 属性 / イベント / 状態）のスパンを
+プロセス内で記録し、終了したスパンをメモリ上のエクスポーターに保持する。スパンの所要時間は
+メトリクス（agent_stage_duration_seconds）にも記録する。
+
+現在のスパンは contextvars で管理するため、asyncio のタスクには自動で引き継がれる。
+スレッドプールで実行する関数には propagate() で引き継ぐ。
+
+config.TRACING_OPENTELEMETRY を有効にし opentelemetry-sdk がインストールされている場合は、
+同じスパンをOpenTelemetryのトレーサーにも送る（エクスポーターの設定はアプリケーション側で行う）。
+
+使い方:
+    with span("weather.openweather_request", city=city):
+        ...
+
+    @traced("tool.get_weather")
+    async def _aget_weather(city: str) -> dict:
+        ...
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src import config
+from src.utils.metrics import STAGE_DURATION, STAGE_ERRORS
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Dict[str, Any]):
+        """
+        処理段階1つ分の記録
+
+        Args:
+            name: スパン名（メトリクスの stage ラベルにも使う）
+            trace_id: トレースID（32桁の16進数）
+            parent_span_id: 親スパンのID（ルートの場合はNone）
+            attributes: 属性
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes)
+        self.events: List[dict] = []
+        self.status = "UNSET"
+        self.status_message = ""
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self._start = time.perf_counter()
+        self._otel_span = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        """所要時間（秒）。終了していない場合はNone"""
+        if self.end_time_unix_nano is None:
+            return None
+        return (self.end_time_unix_nano - self.start_time_unix_nano) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append({"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes})
+
+    def to_dict(self) -> dict:
+        """OpenTelemetry（OTLP/JSON）と同じ項目名の辞書で返す"""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "attributes": dict(self.attributes),
+            "events": list(self.events),
+            "status": {"code": self.status, "message": self.status_message}
+        }
+
+
+class InMemorySpanExporter:
+    def __init__(self, maxlen: int):
+        """
+        終了したスパンをメモリに保持するエクスポーター
+
+        Args:
+            maxlen: 保持するスパン数の上限（超えた場合は古いものから削除）
+        """
+        self._spans: "deque[Span]" = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def get_finished_spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        """終了したスパンを終了順に返す（trace_id を指定した場合はそのトレースのみ）"""
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class Tracer:
+    def __init__(self, exporter: InMemorySpanExporter, enabled: bool = True, opentelemetry: bool = False):
+        """
+        スパンの生成と記録
+
+        Args:
+            exporter: 終了したスパンの送り先
+            enabled: 無効の場合はスパンを記録しない（メトリクスも記録しない）
+            opentelemetry: OpenTelemetryのトレーサーにもスパンを送るかどうか
+        """
+        self.exporter = exporter
+        self.enabled = enabled
+        self._otel_tracer = self._create_otel_tracer() if opentelemetry else None
+
+    @staticmethod
+    def _create_otel_tracer():
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            return None
+        return trace.get_tracer("tool_use_generic_configration")
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Optional[Span]:
+        """
+        スパンを開始する（現在のスパンには設定しない。終了は end_span で行う）
+
+        Args:
+            name: スパン名
+            parent: 親スパン（省略時は現在のスパン）
+            **attributes: 属性
+
+        Returns:
+            Optional[Span]: 開始したスパン。トレーシングが無効の場合はNone
+        """
+        if not self.enabled:
+            return None
+        parent = parent or _current_span.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else _new_id(16),
+            parent_span_id=parent.span_id if parent else None,
+            attributes=attributes
+        )
+        if self._otel_tracer is not None:
+            from opentelemetry import trace
+
+            context = trace.set_span_in_context(parent._otel_span) if parent and parent._otel_span else None
+            span._otel_span = self._otel_tracer.start_span(name, context=context, start_time=span.start_time_unix_nano)
+        return span
+
+    def end_span(self, span: Optional[Span], error: Optional[BaseException] = None) -> None:
+        """スパンを終了し、エクスポーターとメトリクスに記録する"""
+        if span is None or span.end_time_unix_nano is not None:
+            return
+        span.end_time_unix_nano = span.start_time_unix_nano + int((time.perf_counter() - span._start) * 1e9)
+        if error is not None:
+            span.status = "ERROR"
+            span.status_message = f"{type(error).__name__}: {error}"
+            STAGE_ERRORS.inc(stage=span.name)
+        elif span.status == "UNSET":
+            span.status = "OK"
+        STAGE_DURATION.observe(span.duration, stage=span.name)
+        self.exporter.export(span)
+        if span._otel_span is not None:
+            self._end_otel_span(span, error)
+
+    @staticmethod
+    def _end_otel_span(span: Span, error: Optional[BaseException]) -> None:
+        from opentelemetry.trace import Status, StatusCode
+
+        otel_span = span._otel_span
+        for key, value in span.attributes.items():
+            if value is not None:
+                otel_span.set_attribute(key, value if isinstance(value, (bool, int, float, str)) else str(value))
+        for event in span.events:
+            otel_span.add_event(event["name"], attributes=event["attributes"], timestamp=event["time_unix_nano"])
+        if error is not None:
+            otel_span.set_status(Status(StatusCode.ERROR, span.status_message))
+        otel_span.end(end_time=span.end_time_unix_nano)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+        """スパンを開始して現在のスパンに設定し、ブロックを抜けたときに終了する（親は省略時は現在のスパン）"""
+        span = self.start_span(name, parent=parent, **attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current_span.reset(token)
+
+
+# プロセス全体で共有するトレーサー
+exporter = InMemorySpanExporter(config.TRACING_MAX_SPANS)
+tracer = Tracer(exporter, enabled=config.TRACING_ENABLED, opentelemetry=config.TRACING_OPENTELEMETRY)
+
+
+def span(name: str, parent: Optional[Span] = None, **attributes: Any):
+    """共有のトレーサーでスパンを記録する（with 文で使う）"""
+    return tracer.span(name, parent=parent, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """現在のスパン（スパンの外ではNone）"""
+    return _current_span.get()
+
+
+def add_event(name: str, **attributes: Any) -> None:
+    """現在のスパンにイベントを記録する（スパンの外では何もしない）"""
+    current = _current_span.get()
+    if current is not None:
+        current.add_event(name, **attributes)
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """現在のスパンに属性を設定する（スパンの外では何もしない）"""
+    current = _current_span.get()
+    if current is not None:
+        current.set_attribute(key, value)
+
+
+def traced(name: str) -> Callable:
+    """関数の呼び出しをスパンとして記録するデコレーター（同期・非同期の両方に使える）"""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    呼び出し元の現在のスパンを引き継いで func を実行する関数を返す
+
+    スレッドプールに渡す関数に使う（スレッドには contextvars が引き継がれないため）。
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,197 @@
+"""
+LLMの使用量（トークン数・推定料金）の集計と上限
+
+クエリごとに UsageAccountant を用意し、track_usage() の中で行われたLLM呼び出しの
+トークン数と推定料金をエージェント別・モデル別に集計する。記録はLLMのコールバック
+（src/llm_registry.py の UsageCallbackHandler）から行う。
+
+上限（トークン数・料金）を超えたクエリでは、次のLLM呼び出しの開始時に
+BudgetExceededError を送出し、エージェントの反復をそこで打ち切る。
+
+現在の集計先とエージェント名は contextvars で管理するため、asyncio のタスクには自動で
+引き継がれる。スレッドプールで実行する関数には src.utils.tracing.propagate() で引き継ぐ。
+
+使い方:
+    accountant = UsageAccountant(token_budget=2000)
+    with track_usage(accountant, agent="CoordinatorAgent"):
+        ...
+    print(accountant.to_dict())
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from src import config
+from src.utils.exceptions import BudgetExceededError
+
+_current_accountant: contextvars.ContextVar[Optional["UsageAccountant"]] = contextvars.ContextVar(
+    "current_usage_accountant", default=None
+)
+_current_agent: contextvars.ContextVar[str] = contextvars.ContextVar("current_usage_agent", default="unknown")
+
+
+def model_price(model: str) -> Optional[tuple]:
+    """モデルの料金（USD / 1,000トークン）。完全一致がなければ最も長く前方一致する設定を使う"""
+    if model in config.LLM_PRICES:
+        return config.LLM_PRICES[model]
+    matches = [name for name in config.LLM_PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    return config.LLM_PRICES[max(matches, key=len)]
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """推定料金（USD）。料金が設定されていないモデルは0"""
+    price = model_price(model)
+    if price is None:
+        return 0.0
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数の概算（APIがトークン数を返さないストリーミング呼び出しに使う）
+
+    英数字はおよそ4文字で1トークン、日本語などはおよそ1文字で1トークンとして数える。
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+class Usage:
+    def __init__(self):
+        """トークン数・推定料金・呼び出し回数の合計"""
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        # トークン数に概算を含むかどうか
+        self.estimated = False
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost: float, estimated: bool = False) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+        self.estimated = self.estimated or estimated
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": round(self.cost, 6),
+            "estimated": self.estimated
+        }
+
+
+class UsageAccountant:
+    def __init__(self, token_budget: Optional[int] = None, cost_budget: Optional[float] = None):
+        """
+        1クエリ分のLLM使用量の集計
+
+        Args:
+            token_budget: トークン数の上限（None の場合は制限しない）
+            cost_budget: 推定料金の上限（USD。None の場合は制限しない）
+        """
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.total = Usage()
+        self.by_agent: Dict[str, Usage] = {}
+        self.by_model: Dict[str, Usage] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        agent: Optional[str] = None,
+        estimated: bool = False
+    ) -> float:
+        """
+        LLM呼び出し1回分の使用量を記録する
+
+        Args:
+            model: モデル名
+            prompt_tokens: プロンプトのトークン数
+            completion_tokens: 補完のトークン数
+            agent: 呼び出したエージェント（省略時は現在のエージェント）
+            estimated: トークン数が概算かどうか
+
+        Returns:
+            float: この呼び出しの推定料金（USD）
+        """
+        agent = agent or _current_agent.get()
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            self.total.add(prompt_tokens, completion_tokens, cost, estimated)
+            self.by_agent.setdefault(agent, Usage()).add(prompt_tokens, completion_tokens, cost, estimated)
+            self.by_model.setdefault(model, Usage()).add(prompt_tokens, completion_tokens, cost, estimated)
+        return cost
+
+    @property
+    def exceeded(self) -> bool:
+        """上限（トークン数・推定料金）に達しているかどうか"""
+        with self._lock:
+            if self.token_budget is not None and self.total.total_tokens >= self.token_budget:
+                return True
+            return self.cost_budget is not None and self.total.cost >= self.cost_budget
+
+    def check_budget(self) -> None:
+        """上限に達している場合は BudgetExceededError を送出する"""
+        if self.exceeded:
+            raise BudgetExceededError(
+                f"Usage budget exceeded: {self.total.total_tokens} tokens, ${self.total.cost:.4f} "
+                f"(budget: {self.token_budget} tokens, ${self.cost_budget})"
+            )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                **self.total.to_dict(),
+                "token_budget": self.token_budget,
+                "cost_budget": self.cost_budget,
+                "by_agent": {name: usage.to_dict() for name, usage in self.by_agent.items()},
+                "by_model": {name: usage.to_dict() for name, usage in self.by_model.items()}
+            }
+
+
+@contextmanager
+def track_usage(accountant: "UsageAccountant", agent: Optional[str] = None) -> Iterator["UsageAccountant"]:
+    """ブロック内のLLM呼び出しの使用量を accountant に集計する"""
+    accountant_token = _current_accountant.set(accountant)
+    agent_token = _current_agent.set(agent) if agent else None
+    try:
+        yield accountant
+    finally:
+        if agent_token is not None:
+            _current_agent.reset(agent_token)
+        _current_accountant.reset(accountant_token)
+
+
+@contextmanager
+def agent_scope(agent: str) -> Iterator[None]:
+    """ブロック内のLLM呼び出しを agent の使用量として集計する"""
+    token = _current_agent.set(agent)
+    try:
+        yield
+    finally:
+        _current_agent.reset(token)
+
+
+def current_accountant() -> Optional["UsageAccountant"]:
+    """現在の集計先（track_usage の外ではNone）"""
+    return _current_accountant.get()
+
+
+def current_agent() -> str:
+    """現在のエージェント名"""
+    return _current_agent.get()
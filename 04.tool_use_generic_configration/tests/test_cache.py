@@ -0,0 +1,101 @@
+"""
+src/utils/cache.py のテスト（時刻を差し替えて有効期限・保持期間を確認する）
+"""
+
+import pytest
+
+from src.utils import cache as cache_module
+from src.utils.cache import MemoryCache, NullCache, SQLiteCache, create_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(ttl=10, maxsize=3, stale_ttl=0):
+        if request.param == "memory":
+            return MemoryCache(ttl=ttl, maxsize=maxsize, stale_ttl=stale_ttl)
+        return SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl=ttl, maxsize=maxsize, stale_ttl=stale_ttl)
+    return make
+
+
+def test_get_returns_value_until_ttl(clock, make_cache):
+    cache = make_cache(ttl=10)
+    cache.set(("tokyo", "metric"), {"temp": 20})
+    clock.advance(9)
+    assert cache.get(("tokyo", "metric")) == {"temp": 20}
+    clock.advance(2)
+    assert cache.get(("tokyo", "metric")) is None
+    assert cache.stats.to_dict()["hits"] == 1
+    assert cache.stats.to_dict()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock, make_cache):
+    cache = make_cache(maxsize=2)
+    cache.set("a", 1)
+    clock.advance(1)
+    cache.set("b", 2)
+    clock.advance(1)
+    assert cache.get("a") == 1  # a を参照したので b が最も古くなる
+    clock.advance(1)
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+
+
+def test_expired_entry_is_kept_for_stale_ttl(clock, make_cache):
+    cache = make_cache(ttl=10, stale_ttl=60)
+    cache.set("osaka", "cloudy")
+    clock.advance(30)
+    # get は期限切れとして扱い、peek は期限とともに返す
+    assert cache.get("osaka") is None
+    assert cache.peek("osaka") == ("cloudy", 1010.0)
+    clock.advance(41)
+    assert cache.peek("osaka") is None
+    assert cache.get("osaka") is None
+    assert len(cache) == 0
+
+
+def test_peek_does_not_count_as_lookup(clock, make_cache):
+    cache = make_cache()
+    cache.set("k", "v")
+    assert cache.peek("k") == ("v", 1010.0)
+    assert cache.peek("missing") is None
+    assert cache.stats.hits == cache.stats.misses == 0
+
+
+def test_null_cache_never_stores():
+    cache = NullCache()
+    cache.set("k", "v")
+    assert cache.get("k") is None
+    assert cache.peek("k") is None
+    assert len(cache) == 0
+
+
+def test_create_cache_validates_backend(tmp_path):
+    assert isinstance(create_cache("memory", ttl=1, maxsize=1), MemoryCache)
+    assert isinstance(create_cache("none", ttl=1, maxsize=1), NullCache)
+    assert isinstance(create_cache("sqlite", ttl=1, maxsize=1, path=str(tmp_path / "c.sqlite3")), SQLiteCache)
+    with pytest.raises(ValueError):
+        create_cache("sqlite", ttl=1, maxsize=1)
+    with pytest.raises(ValueError):
+        create_cache("redis", ttl=1, maxsize=1)
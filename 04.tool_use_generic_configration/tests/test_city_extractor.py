@@ -0,0 +1,52 @@
+"""
+src/tools/city_extractor.py のテスト
+"""
+
+import pytest
+
+from src.tools.city_extractor import CityExtractor, city_extractor
+
+
+def _english(query: str):
+    match = city_extractor.extract(query)
+    return match.english_name if match else None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("日光の天気を教えて", "Nikko"),
+    ("大分の名物は？", "Oita"),
+    ("大分県の料理を教えて", "Oita"),
+    ("東京都の天気", "Tokyo"),
+    ("来週京都に行きます", "Kyoto"),
+    ("京都から大阪へ", "Kyoto"),
+    ("パリの天気は？", "Paris"),
+    ("パリ・ローマの天気", "Paris"),
+    ("weather in Nara?", "Nara"),
+])
+def test_extracts_city(query, expected):
+    assert _english(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "日光浴に向いている場所は？",  # 日光 + 浴
+    "大分前に食べた料理",  # 大分 + 前
+    "パリジェンヌの朝ごはん",  # パリ + ジェンヌ
+    "a narrative about food",  # nara + tive
+    "今日の天気は？",
+])
+def test_does_not_match_part_of_another_word(query):
+    assert city_extractor.extract(query) is None
+
+
+def test_find_all_returns_non_overlapping_matches_in_order():
+    matches = city_extractor.find_all("東京都と大阪府と札幌の天気")
+    assert [match.english_name for match in matches] == ["Tokyo", "Osaka", "Sapporo"]
+    assert matches[0].text == "東京"
+    assert (matches[0].start, matches[0].end) == (0, 2)
+
+
+def test_overlapping_longer_candidate_is_left_to_llm():
+    extractor = CityExtractor({"Tokyo": ["東京"], "Kyotofu": ["京都府"]})
+    # 「東京」と、それに重なるより長い「京都府」のどちらか判断できない
+    assert extractor.extract("東京都府の天気") is None
+    assert extractor.extract("東京の天気").english_name == "Tokyo"
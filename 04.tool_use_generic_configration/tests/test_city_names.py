@@ -0,0 +1,34 @@
+"""
+src/tools/city_names.py のテスト（辞書による都市名の英語変換）
+"""
+
+from src.tools.city_names import contains_japanese, lookup_english_city_name, normalize_city_name
+
+
+def test_normalize_city_name():
+    assert normalize_city_name("  ＴＯＫＹＯ ") == "tokyo"
+    assert normalize_city_name("シドニー") == "しどにー"
+    assert normalize_city_name("New   York") == "new york"
+
+
+def test_lookup_aliases():
+    assert lookup_english_city_name("東京") == "Tokyo"
+    assert lookup_english_city_name("とうきょう") == "Tokyo"
+    assert lookup_english_city_name("tokyo") == "Tokyo"
+    assert lookup_english_city_name("ｼﾄﾞﾆｰ") == "Sydney"
+
+
+def test_lookup_administrative_suffix():
+    assert lookup_english_city_name("東京都") == "Tokyo"
+    assert lookup_english_city_name("大阪府") == "Osaka"
+    assert lookup_english_city_name("京都") == "Kyoto"
+
+
+def test_lookup_unknown_city():
+    assert lookup_english_city_name("存在しない町") is None
+
+
+def test_contains_japanese():
+    assert contains_japanese("東京")
+    assert contains_japanese("カイロ")
+    assert not contains_japanese("Cairo")
@@ -0,0 +1,153 @@
+"""
+src/agents/coordinator_agent.py のテスト（偽のOpenAI・OpenWeatherサーバーに接続する）
+"""
+
+import asyncio
+
+import pytest
+
+from benchmarks.fake_servers import FakeAPI, FakeServer
+from src import llm_registry, llm_router
+from src.agents.base_agent import AgentResponse
+from src.agents.coordinator_agent import CoordinatorAgent
+from src.tools import weather_tools
+from src.utils.cache import NullCache
+from src.utils.response_cache import ResponseCache, SemanticIndex
+from src.utils.tracing import exporter
+
+# 天気の回答キャッシュを使わず、毎回サブエージェントとAPIを呼び出す
+CITIES = ["東京", "大阪", "京都", "札幌", "福岡", "名古屋"]
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    api = FakeAPI()
+    with FakeServer(api) as server:
+        monkeypatch.setenv("OPEN_AI_KEY", "sk-test")
+        monkeypatch.setenv("OPENWEATHER_KEY", "test")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.openai_base_url)
+        monkeypatch.setattr(weather_tools, "OPENWEATHER_URL", server.openweather_url)
+        monkeypatch.setattr(weather_tools, "weather_cache", NullCache())
+        monkeypatch.setattr(llm_registry.llm_cache, "cache", NullCache())
+        llm_registry.configure()
+        yield api
+    llm_registry.configure()
+
+
+def _coordinator() -> CoordinatorAgent:
+    return CoordinatorAgent(response_cache=ResponseCache({"weather": 0, "food": 0}, maxsize=1, backend="none"))
+
+
+def _streamed_answer(coordinator: CoordinatorAgent, query: str) -> str:
+    events = list(coordinator.stream_query(query))
+    assert not [event for event in events if event.type == "error"]
+    return events[-1].data
+
+
+def test_sync_wrappers_of_two_coordinators_share_clients_across_event_loops(fake_api):
+    coordinators = [_coordinator(), _coordinator()]
+    try:
+        for i, city in enumerate(CITIES):
+            if i % 3 == 2:
+                # asyncio.run の呼び出し元も同じ共有のクライアントを使う
+                answer = asyncio.run(coordinators[0].aprocess_query(f"{city}の天気は？"))
+            else:
+                answer = _streamed_answer(coordinators[i % 3], f"{city}の天気は？")
+            assert answer.startswith("天気情報:")
+
+        batch = dict(coordinators[1].process_batch([f"{city}の天気は？" for city in CITIES[:2]]))
+        assert all(answer.startswith("天気情報:") for answer in batch.values())
+    finally:
+        for coordinator in coordinators:
+            coordinator.close()
+
+    # 別のイベントループに結び付いた接続での失敗を、再試行で隠していないこと
+    # （1問あたりツール選択と回答の2回。バッチでは天気情報を先に取得するため、都市ごとに2回）
+    calls = fake_api.calls()
+    assert calls["openai"] == 2 * (len(CITIES) + 2)
+    assert calls["openweather"] == len(CITIES) + 2 * 2
+
+
+def test_batch_answers_carry_batch_usage_and_trace(fake_api):
+    coordinator = _coordinator()
+    exporter.clear()
+    try:
+        answers = dict(coordinator.process_batch(["東京の天気は？", "大阪の天気は？", "とうきょうの気温は？"]))
+    finally:
+        coordinator.close()
+
+    assert sorted(answers) == [0, 1, 2]
+    assert all(isinstance(answer, AgentResponse) for answer in answers.values())
+    # 辞書にない「とうきょう」の都市名の抽出と、同じ都市をまとめた2回分のサブエージェント
+    # （1回あたりLLMを2回）の呼び出しをバッチ全体で集計する
+    usage = answers[0].usage
+    assert usage is answers[2].usage
+    assert usage.by_agent["CoordinatorAgent"].calls == 1
+    assert usage.by_agent["WeatherAgent"].calls == 4
+
+    spans = exporter.get_finished_spans()
+    root = next(span for span in spans if span.name == "CoordinatorAgent.process_batch")
+    children = [span.name for span in spans if span.trace_id == root.trace_id and span.parent_span_id == root.span_id]
+    assert "CoordinatorAgent.prepare_batch" in children
+    assert children.count("CoordinatorAgent.run_intent") == 2
+
+
+class StubEmbedder:
+    """どの質問にも同じベクトルを返す埋め込み（言い回しが同じで都市名だけ異なる質問の最悪の場合）"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text: str):
+        self.calls += 1
+        return [1.0, 0.0]
+
+    async def aembed_query(self, text: str):
+        return self.embed_query(text)
+
+
+@pytest.fixture
+def semantic_coordinator(monkeypatch):
+    embedder = StubEmbedder()
+    index = SemanticIndex(embedder, threshold=0.9, maxsize=10)
+    coordinator = CoordinatorAgent(response_cache=ResponseCache(
+        {"weather": 60, "food": 60}, maxsize=10, backend="memory", semantic_index=index
+    ))
+    extracted = []
+
+    def invoke(call_class, prompt, validate=None):
+        extracted.append(prompt)
+        return "ほげ村"
+
+    async def ainvoke(call_class, prompt, validate=None):
+        return invoke(call_class, prompt, validate)
+
+    monkeypatch.setattr(llm_router, "invoke", invoke)
+    monkeypatch.setattr(llm_router, "ainvoke", ainvoke)
+    yield coordinator, embedder, extracted
+    coordinator.close()
+
+
+def test_dictionary_city_skips_semantic_index(semantic_coordinator):
+    coordinator, embedder, _ = semantic_coordinator
+    # 別の都市の質問が索引にあっても、辞書で見つかる都市名を使う
+    coordinator.response_cache.semantic_index.add(coordinator.response_cache.semantic_index.embed("x"), "京都")
+    embedder.calls = 0
+
+    assert coordinator._resolve_city("大阪の天気は？") == ("大阪", None)
+    assert asyncio.run(coordinator._aresolve_city("大阪の天気は？")) == ("大阪", None)
+    assert embedder.calls == 0
+
+
+def test_semantic_index_stores_only_llm_extracted_cities(semantic_coordinator):
+    coordinator, embedder, extracted = semantic_coordinator
+
+    city, vector = coordinator._resolve_city("ほげ村の天気は？")
+    assert city == "ほげ村" and vector is not None
+    coordinator._remember_city(vector, city, ["weather"])
+    assert len(extracted) == 1
+
+    # 言い回しの異なる質問は、索引の都市名を使いLLMを呼び出さない
+    assert asyncio.run(coordinator._aresolve_city("ほげ村の気温を教えて")) == ("ほげ村", None)
+    assert len(extracted) == 1
+    assert len(coordinator.response_cache.semantic_index) == 1
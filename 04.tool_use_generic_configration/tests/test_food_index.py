@@ -0,0 +1,59 @@
+"""
+src/tools/food_index.py のテスト（オフライン索引の構築と検索）
+"""
+
+import json
+
+import pytest
+
+from src.tools.food_index import FoodIndex, build_food_index, tokenize
+
+CORPUS = [
+    {"title": "Cuisine of Osaka", "text": "Osaka is known for takoyaki and okonomiyaki.", "url": "https://example.com/osaka", "city": "大阪"},
+    {"title": "Sushi", "text": "Sushi is a Japanese dish of vinegared rice.", "url": "https://example.com/sushi"},
+    {"title": "Kyoto cuisine", "text": "Kyoto cuisine includes kaiseki and yudofu."},
+    {"title": "Empty", "text": ""}
+]
+
+
+@pytest.fixture
+def food_index(tmp_path):
+    corpus_path = tmp_path / "corpus.jsonl"
+    corpus_path.write_text("\n".join(json.dumps(record, ensure_ascii=False) for record in CORPUS), encoding="utf-8")
+    count = build_food_index(str(corpus_path), str(tmp_path / "index"))
+    assert count == 3
+    return FoodIndex(str(tmp_path / "index"))
+
+
+def test_tokenize():
+    assert tokenize("Takoyaki 2") == ["takoyaki", "2"]
+    assert tokenize("たこ焼き") == ["たこ", "こ焼", "焼き"]
+    assert tokenize("餅") == ["餅"]
+
+
+def test_search_ranks_matching_documents(food_index):
+    results = food_index.search("vinegared rice")
+    assert [doc_id for doc_id, _ in results] == [1]
+    assert food_index.search("unknownword") == []
+
+
+def test_lookup_by_city_key(food_index):
+    # コーパスでは日本語の都市名だが、英語名でも引ける
+    document = food_index.lookup("Osaka")
+    assert document["title"] == "Cuisine of Osaka"
+    assert document["content"] == CORPUS[0]["text"]
+    assert food_index.lookup("おおさか")["url"] == "https://example.com/osaka"
+
+
+def test_lookup_by_search(food_index):
+    assert food_index.lookup("京都")["title"] == "Kyoto cuisine"
+    assert food_index.lookup("Cairo") is None
+
+
+def test_unsupported_version(tmp_path, food_index):
+    meta_path = tmp_path / "index" / "meta.json"
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    meta["version"] = 0
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+    with pytest.raises(ValueError):
+        FoodIndex(str(tmp_path / "index"))
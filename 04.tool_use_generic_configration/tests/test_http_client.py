@@ -0,0 +1,158 @@
+"""
+src/utils/http_client.py のテスト（httpx.MockTransport で応答を差し替える）
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from src.utils.exceptions import CircuitOpenError
+from src.utils.http_client import CircuitBreaker, HttpClient
+
+URL = "http://api.example.test/data"
+
+
+def _client(handler, **kwargs) -> HttpClient:
+    return HttpClient(backoff_base=0, transport=httpx.MockTransport(handler), **kwargs)
+
+
+def _half_open_ready(client: HttpClient) -> CircuitBreaker:
+    """遮断済みで、次のリクエストで試行（half-open）に入るブレーカー"""
+    breaker = client.breaker(URL)
+    breaker.state = "open"
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+    return breaker
+
+
+def test_breaker_opens_after_threshold_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == "half-open"
+    # 試行中は他のリクエストを通さない
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_retries_server_errors_then_succeeds():
+    statuses = iter([503, 502, 200])
+    client = _client(lambda request: httpx.Response(next(statuses), json={}))
+    assert client.get(URL).status_code == 200
+    assert client.breaker(URL).state == "closed"
+
+
+def test_retry_after_longer_than_limit_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "120"})
+
+    client = _client(handler, max_retry_after=30)
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get(URL)
+    assert len(calls) == 1
+
+
+def test_retry_after_seconds_and_http_date():
+    client = HttpClient()
+    assert client._retry_after(httpx.Response(429, headers={"Retry-After": "3"})) == 3
+    assert client._retry_after(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert client._retry_after(httpx.Response(429)) is None
+
+
+def test_client_error_counts_as_success_for_breaker():
+    client = _client(lambda request: httpx.Response(404))
+    breaker = _half_open_ready(client)
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get(URL)
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_does_not_leave_breaker_half_open():
+    async def slow(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200)
+
+    client = _client(slow)
+    breaker = _half_open_ready(client)
+
+    async def cancel_trial():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.aget(URL), 0.01)
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+
+    # reset_timeout の経過後は改めて試行できる
+    client._client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    breaker.opened_at -= breaker.reset_timeout
+    assert client.get(URL).status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_unexpected_error_during_trial_reopens_breaker():
+    def handler(request):
+        raise httpx.DecodingError("broken body", request=request)
+
+    client = _client(handler)
+    breaker = _half_open_ready(client)
+    with pytest.raises(httpx.DecodingError):
+        client.get(URL)
+    assert breaker.state == "open"
+
+
+@pytest.fixture
+def local_server():
+    """実際に接続を張るローカルのHTTPサーバー（keep-alive の接続がイベントループに結び付く）"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/data"
+    server.shutdown()
+    server.server_close()
+
+
+def test_async_get_works_across_consecutive_event_loops(local_server):
+    client = HttpClient()
+    for _ in range(3):
+        assert asyncio.run(client.aget(local_server)).json() == {"ok": True}
+
+
+def test_async_get_works_on_alternating_live_event_loops(local_server):
+    client = HttpClient()
+    loops = [asyncio.new_event_loop(), asyncio.new_event_loop()]
+    try:
+        for i in range(4):
+            response = loops[i % 2].run_until_complete(client.aget(local_server))
+            assert response.status_code == 200
+    finally:
+        for loop in loops:
+            loop.close()
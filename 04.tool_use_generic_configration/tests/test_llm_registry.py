@@ -0,0 +1,51 @@
+"""
+src/llm_registry.py のテスト（偽のOpenAI APIサーバーに接続する）
+"""
+
+import asyncio
+
+import pytest
+
+from benchmarks.fake_servers import FakeAPI, FakeServer
+from src import llm_registry
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    api = FakeAPI()
+    with FakeServer(api) as server:
+        monkeypatch.setenv("OPEN_AI_KEY", "sk-test")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.openai_base_url)
+        llm_registry.configure()
+        yield api
+    # 偽のサーバーに接続するクライアントを残さない
+    llm_registry.configure()
+
+
+def test_async_calls_work_across_event_loops(fake_openai):
+    # 温度0以外は応答キャッシュを使わないため、毎回APIを呼び出す
+    model = llm_registry.get_chat_model("gpt-3.5-turbo", 0.7)
+    for _ in range(2):
+        assert asyncio.run(model.ainvoke("hello")).content
+
+    loops = [asyncio.new_event_loop(), asyncio.new_event_loop()]
+    try:
+        for i in range(4):
+            assert loops[i % 2].run_until_complete(model.ainvoke("hello")).content
+    finally:
+        for loop in loops:
+            loop.close()
+
+    # 別のループに結び付いた接続での失敗を、OpenAIクライアントの再試行で隠していないこと
+    assert fake_openai.calls()["openai"] == 6
+
+
+def test_openai_clients_are_shared_within_an_event_loop(fake_openai):
+    _, async_client = llm_registry.get_openai_clients()
+
+    async def resolve():
+        return async_client.chat, async_client.chat
+
+    first, second = asyncio.run(resolve())
+    assert first is second
+    assert asyncio.run(resolve())[0] is not first
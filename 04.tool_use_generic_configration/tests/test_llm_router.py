@@ -0,0 +1,141 @@
+"""
+src/llm_router.py のテスト
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import config, llm_router
+
+
+class FakeModel:
+    """プロンプトに対する回答をモデルごとに返す偽のチャットモデル"""
+
+    def __init__(self, name: str, answers: dict, calls: list):
+        self.name = name
+        self.answers = answers
+        self.calls = calls
+
+    def _answer(self, prompt):
+        self.calls.append((self.name, prompt))
+        answer = self.answers[self.name].get(prompt, "")
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(content=answer)
+
+    def invoke(self, prompt):
+        return self._answer(prompt)
+
+    async def ainvoke(self, prompt):
+        return self._answer(prompt)
+
+    async def abatch(self, prompts, config=None, return_exceptions=False):
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self._answer(prompt))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    answers = {"small": {}, "large": {}}
+    calls = []
+    monkeypatch.setattr(
+        llm_router, "get_chat_model", lambda model, temperature: FakeModel(model, answers, calls)
+    )
+    monkeypatch.setitem(config.MODEL_ROUTES, "test", {"models": ["small", "large"], "temperature": 0})
+    return answers, calls
+
+
+def test_get_route():
+    route = llm_router.get_route("extraction")
+    assert route.models == tuple(config.MODEL_ROUTES["extraction"]["models"])
+    with pytest.raises(ValueError):
+        llm_router.get_route("unknown")
+
+
+def test_escalate_stops_at_first_valid_result():
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        return model
+
+    assert llm_router.escalate("extraction", call, validate=lambda r: r == "b", models=["a", "b", "c"]) == "b"
+    assert calls == ["a", "b"]
+
+
+def test_escalate_returns_last_result_when_nothing_validates():
+    result = llm_router.escalate("extraction", lambda model: model, validate=lambda r: False, models=["a", "b"])
+    assert result == "b"
+
+
+def test_escalate_without_validate_uses_first_model():
+    calls = []
+    llm_router.escalate("extraction", lambda model: calls.append(model), models=["a", "b"])
+    assert calls == ["a"]
+
+
+def test_escalate_disabled_uses_first_model_only(monkeypatch):
+    monkeypatch.setattr(config, "MODEL_ESCALATION_ENABLED", False)
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        return ""
+
+    assert llm_router.escalate("extraction", call, validate=llm_router.is_non_empty, models=["a", "b"]) == ""
+    assert calls == ["a"]
+
+
+def test_escalate_propagates_errors_without_switching_model():
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        raise RuntimeError("api error")
+
+    with pytest.raises(RuntimeError):
+        llm_router.escalate("extraction", call, validate=lambda r: True, models=["a", "b"])
+    assert calls == ["a"]
+
+
+def test_aescalate():
+    async def call(model):
+        return "" if model == "a" else "ok"
+
+    result = asyncio.run(llm_router.aescalate("extraction", call, llm_router.is_non_empty, ["a", "b"]))
+    assert result == "ok"
+
+
+def test_invoke_escalates_on_invalid_answer(fake_models):
+    answers, calls = fake_models
+    answers["small"]["q"] = " "
+    answers["large"]["q"] = "Tokyo"
+    assert llm_router.invoke("test", "q", validate=llm_router.is_non_empty) == "Tokyo"
+    assert calls == [("small", "q"), ("large", "q")]
+
+
+def test_ainvoke(fake_models):
+    answers, calls = fake_models
+    answers["small"]["q"] = "Osaka"
+    assert asyncio.run(llm_router.ainvoke("test", "q", validate=llm_router.is_non_empty)) == "Osaka"
+    assert calls == [("small", "q")]
+
+
+def test_abatch_retries_only_invalid_answers(fake_models):
+    answers, calls = fake_models
+    error = RuntimeError("api error")
+    answers["small"].update({"a": "A", "b": "", "c": error})
+    answers["large"].update({"b": "B"})
+
+    results = asyncio.run(llm_router.abatch("test", ["a", "b", "c"], validate=llm_router.is_non_empty))
+    assert results == ["A", "B", error]
+    assert [call for call in calls if call[0] == "large"] == [("large", "b")]
@@ -0,0 +1,70 @@
+"""
+src/agents/native_executor.py のテスト（LLMの応答を差し替え、ツール実行のループだけを確認する）
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from langchain_core.tools import StructuredTool
+
+from src.agents.native_executor import STOPPED_MESSAGE, NativeToolExecutor
+
+
+_running = {"now": 0, "peak": 0}
+_running_lock = threading.Lock()
+
+
+def _slow_lookup(city: str) -> dict:
+    """都市の情報を返す（0.2秒かかる。同時に実行中の数の最大を記録する）"""
+    with _running_lock:
+        _running["now"] += 1
+        _running["peak"] = max(_running["peak"], _running["now"])
+    time.sleep(0.2)
+    with _running_lock:
+        _running["now"] -= 1
+    return {"city": city}
+
+
+def _executor(**kwargs) -> NativeToolExecutor:
+    tool = StructuredTool.from_function(_slow_lookup, name="lookup")
+    return NativeToolExecutor([tool], "system", "gpt-3.5-turbo", 0, **kwargs)
+
+
+def _tool_call(call_id: str, city: str):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name="lookup", arguments=f'{{"city": "{city}"}}'))
+
+
+def test_invoke_runs_tool_calls_of_one_turn_concurrently(monkeypatch):
+    executor = _executor()
+    replies = iter([
+        SimpleNamespace(content=None, tool_calls=[_tool_call("a", "Tokyo"), _tool_call("b", "Osaka"), _tool_call("c", "Kyoto")]),
+        SimpleNamespace(content="done", tool_calls=None),
+    ])
+    sent = []
+
+    def create(client, messages):
+        sent.append(list(messages))
+        return next(replies)
+
+    monkeypatch.setattr(executor, "_create", create)
+    monkeypatch.setattr("src.agents.native_executor.get_openai_clients", lambda: (None, None))
+
+    _running["peak"] = 0
+    assert executor.invoke({"input": "q"}) == {"output": "done"}
+    assert _running["peak"] == 3
+    # 結果はツール呼び出しの順に返す
+    tool_messages = [message for message in sent[1] if message["role"] == "tool"]
+    assert [message["tool_call_id"] for message in tool_messages] == ["a", "b", "c"]
+    assert [message["content"] for message in tool_messages] == [
+        '{"city": "Tokyo"}', '{"city": "Osaka"}', '{"city": "Kyoto"}'
+    ]
+
+
+def test_invoke_stops_after_max_execution_time(monkeypatch):
+    executor = _executor(max_execution_time=0.1)
+    monkeypatch.setattr(executor, "_create", lambda client, messages: SimpleNamespace(
+        content=None, tool_calls=[_tool_call("a", "Tokyo")]
+    ))
+    monkeypatch.setattr("src.agents.native_executor.get_openai_clients", lambda: (None, None))
+    assert executor.invoke({"input": "q"}) == {"output": STOPPED_MESSAGE}
@@ -0,0 +1,122 @@
+"""
+src/utils/response_cache.py のテスト（時刻を差し替えて情報の種類ごとの有効期間を確認する）
+"""
+
+import pytest
+
+from src import config
+from src.agents.coordinator_agent import CoordinatorAgent
+from src.agents.native_executor import STOPPED_MESSAGE
+from src.utils import cache as cache_module
+from src.utils.response_cache import ResponseCache, SemanticIndex
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    return clock
+
+
+class StubEmbedder:
+    """質問文ごとに決めたベクトルを返す埋め込み"""
+
+    def __init__(self, vectors: dict):
+        self.vectors = vectors
+
+    def embed_query(self, text: str):
+        return self.vectors[text]
+
+
+def test_ttl_is_per_intent(clock):
+    cache = ResponseCache({"weather": 300, "food": 3600}, maxsize=10)
+    cache.set("weather", "tokyo", "晴れ")
+    cache.set("food", "tokyo", "寿司")
+    clock.advance(301)
+    assert cache.get("weather", "tokyo") is None
+    assert cache.get("food", "tokyo") == "寿司"
+    clock.advance(3300)
+    assert cache.get("food", "tokyo") is None
+
+
+def test_variant_and_unknown_intent(clock):
+    cache = ResponseCache({"weather": 300}, maxsize=10)
+    cache.set("weather", "tokyo", "晴れ", variant=True)
+    assert cache.get("weather", "tokyo") is None
+    assert cache.get("weather", "tokyo", variant=True) == "晴れ"
+    cache.set("food", "tokyo", "寿司")
+    assert cache.get("food", "tokyo") is None
+    assert set(cache.stats()) == {"weather"}
+
+
+def test_none_backend_stores_nothing():
+    cache = ResponseCache({"weather": 300}, maxsize=10, backend="none")
+    cache.set("weather", "tokyo", "晴れ")
+    assert cache.get("weather", "tokyo") is None
+
+
+def test_semantic_index_threshold():
+    embedder = StubEmbedder({"東京の天気": [1.0, 0.0], "東京の天気を教えて": [0.95, 0.31], "料理は？": [0.0, 1.0]})
+    index = SemanticIndex(embedder, threshold=0.9, maxsize=10)
+    assert index.search(index.embed("東京の天気")) is None
+
+    index.add(index.embed("東京の天気"), "東京")
+    assert index.search(index.embed("東京の天気を教えて")) == "東京"
+    assert index.search(index.embed("料理は？")) is None
+    assert index.stats.to_dict()["hits"] == 1
+
+
+def test_semantic_index_evicts_oldest():
+    embedder = StubEmbedder({"a": [1.0, 0.0, 0.0], "b": [0.0, 1.0, 0.0], "c": [0.0, 0.0, 1.0]})
+    index = SemanticIndex(embedder, threshold=0.9, maxsize=2)
+    for text in ["a", "b", "c"]:
+        index.add(index.embed(text), text.upper())
+    assert len(index) == 2
+    assert index.search(index.embed("a")) is None
+    assert index.search(index.embed("c")) == "C"
+    assert index.stats.to_dict()["evictions"] == 1
+
+
+@pytest.fixture
+def coordinator(clock):
+    coordinator = CoordinatorAgent(response_cache=ResponseCache({"weather": 300, "food": 3600}, maxsize=10))
+    dispatched = []
+
+    def dispatch(intent, city, prose=False):
+        dispatched.append((intent, city))
+        return f"{city}の{intent}"
+
+    coordinator._dispatch_intent = dispatch
+    coordinator.dispatched = dispatched
+    yield coordinator
+    coordinator.close()
+
+
+def test_weather_part_of_combined_answer_is_reused(coordinator):
+    combined = coordinator.process_query("東京の天気と名物料理を教えて")
+    assert combined == "天気情報:\n東京のweather\n\n料理情報:\n東京のfood"
+
+    # 別の言い回し・表記でも、天気の部分をそのまま使う
+    assert coordinator.process_query("とうきょうの気温は？") == "天気情報:\n東京のweather"
+    assert coordinator.dispatched == [("weather", "東京"), ("food", "東京")]
+
+
+def test_failed_results_are_not_cached(coordinator):
+    for name in ("weather_api_error", "food_api_error", "timeout", "budget_exceeded"):
+        assert not coordinator._is_cacheable(config.ERROR_MESSAGES[name])
+    assert not coordinator._is_cacheable("料理情報の取得に失敗しました: HTTP 503")
+    assert not coordinator._is_cacheable(STOPPED_MESSAGE)
+    assert not coordinator._is_cacheable("申し訳ありません。エラーが発生しました: boom")
+    assert not coordinator._is_cacheable("  ")
+    assert coordinator._is_cacheable("東京の現在の天気は晴れです。")
@@ -0,0 +1,130 @@
+"""
+src/server.py のテスト（ASGIアプリケーションを直接呼び出し、調整役エージェントは差し替える）
+"""
+
+import asyncio
+import json
+
+from src.agents.base_agent import AgentResponse
+from src.server import CoordinatorServer
+
+
+class StubCoordinator:
+    """release が設定されるまで回答を返さない調整役エージェント"""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.release = asyncio.Event()
+        self.closed = False
+
+    async def aprocess_query(self, query: str) -> AgentResponse:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await self.release.wait()
+        return AgentResponse(f"{query}の回答")
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _server(coordinator: StubCoordinator, **kwargs) -> CoordinatorServer:
+    server = CoordinatorServer(**kwargs)
+    server.coordinator = coordinator
+    return server
+
+
+async def _request(app, path: str = "/query", query: str = "東京の天気は？", method: str = "POST"):
+    """HTTPリクエストを1件送り、(ステータス, ヘッダー, ボディのJSON) を返す"""
+    scope = {"type": "http", "method": method, "path": path}
+    body = json.dumps({"query": query}).encode()
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    content = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], dict(start["headers"]), json.loads(content)
+
+
+def test_query_returns_answer():
+    async def run():
+        coordinator = StubCoordinator(delay=0.01)
+        return await _request(_server(coordinator))
+
+    status, _, content = asyncio.run(run())
+    assert status == 200
+    assert content["answer"] == "東京の天気は？の回答"
+
+
+def test_full_queue_returns_429_with_retry_after():
+    async def run():
+        coordinator = StubCoordinator()
+        server = _server(coordinator, max_concurrency=1, max_queue=1, queue_timeout=5)
+        active = asyncio.ensure_future(_request(server))
+        waiting = asyncio.ensure_future(_request(server))
+        await asyncio.sleep(0.05)
+        assert (server.limiter.active, server.limiter.waiting) == (1, 1)
+
+        rejected = await _request(server)
+        coordinator.release.set()
+        return rejected, await active, await waiting
+
+    rejected, active, waiting = asyncio.run(run())
+    assert rejected[0] == 429
+    assert rejected[1][b"retry-after"] == b"5"
+    assert active[0] == 200 and waiting[0] == 200
+
+
+def test_queue_timeout_returns_429():
+    async def run():
+        coordinator = StubCoordinator()
+        server = _server(coordinator, max_concurrency=1, max_queue=5, queue_timeout=0.05)
+        active = asyncio.ensure_future(_request(server))
+        await asyncio.sleep(0.01)
+        rejected = await _request(server)
+        coordinator.release.set()
+        await active
+        return rejected, server.limiter.idle()
+
+    (status, headers, content), idle = asyncio.run(run())
+    assert status == 429
+    assert b"retry-after" in headers
+    assert "待ち" in content["error"]
+    assert idle
+
+
+def test_request_timeout_returns_504():
+    async def run():
+        server = _server(StubCoordinator(delay=1), request_timeout=0.05)
+        return await _request(server), server.limiter.idle()
+
+    (status, _, _), idle = asyncio.run(run())
+    assert status == 504
+    assert idle
+
+
+def test_requests_after_lifespan_shutdown_return_503():
+    async def run():
+        coordinator = StubCoordinator(delay=0.01)
+        server = _server(coordinator)
+        lifespan = asyncio.Queue()
+        sent = []
+
+        async def send(message):
+            sent.append(message["type"])
+
+        await lifespan.put({"type": "lifespan.startup"})
+        await lifespan.put({"type": "lifespan.shutdown"})
+        await server({"type": "lifespan"}, lifespan.get, send)
+        return sent, coordinator.closed, await _request(server)
+
+    sent, closed, (status, _, _) = asyncio.run(run())
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert closed
+    assert status == 503
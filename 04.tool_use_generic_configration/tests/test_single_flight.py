@@ -0,0 +1,138 @@
+"""
+src/utils/single_flight.py のテスト
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src import config
+from src.utils.single_flight import SingleFlight
+
+
+class Upstream:
+    """呼び出し回数を数える、時間のかかる処理"""
+
+    def __init__(self, delay: float = 0.1, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return value
+
+    async def acall(self, value):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return value
+
+
+def _run_threads(func, count: int):
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = func()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_with_same_key_run_once():
+    flight = SingleFlight("test")
+    upstream = Upstream()
+    results = _run_threads(lambda: flight.do("tokyo", upstream, "sunny"), 10)
+    assert results == ["sunny"] * 10
+    assert upstream.calls == 1
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+    upstream = Upstream(delay=0.05)
+    results = _run_threads(lambda: flight.do(threading.get_ident(), upstream, "x"), 3)
+    assert results == ["x"] * 3
+    assert upstream.calls == 3
+
+
+def test_error_is_shared_with_waiting_callers():
+    flight = SingleFlight("test")
+    upstream = Upstream(error=ValueError("boom"))
+    results = _run_threads(lambda: flight.do("k", upstream, None), 5)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert upstream.calls == 1
+    # 完了後は新たに実行する
+    with pytest.raises(ValueError):
+        flight.do("k", upstream, None)
+    assert upstream.calls == 2
+
+
+def test_unshared_error_is_retried_by_each_caller():
+    class CallerError(Exception):
+        pass
+
+    flight = SingleFlight("test", unshared_errors=(CallerError,))
+    upstream = Upstream(error=CallerError())
+    results = _run_threads(lambda: flight.do("k", upstream, None), 3)
+    assert all(isinstance(result, CallerError) for result in results)
+    assert upstream.calls == 3
+
+
+def test_disabled_runs_every_call(monkeypatch):
+    monkeypatch.setattr(config, "SINGLE_FLIGHT_ENABLED", False)
+    flight = SingleFlight("test")
+    upstream = Upstream(delay=0.05)
+    _run_threads(lambda: flight.do("k", upstream, "v"), 4)
+    assert upstream.calls == 4
+
+
+def test_async_calls_with_same_key_run_once():
+    flight = SingleFlight("test")
+    upstream = Upstream()
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", upstream.acall, "v") for _ in range(10)))
+
+    assert asyncio.run(main()) == ["v"] * 10
+    assert upstream.calls == 1
+
+
+def test_async_follower_survives_leader_cancellation():
+    flight = SingleFlight("test")
+    upstream = Upstream()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", upstream.acall, "v"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", upstream.acall, "v"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "v"
+    assert upstream.calls == 1
+
+
+def test_async_error_is_shared():
+    flight = SingleFlight("test")
+    upstream = Upstream(error=KeyError("missing"))
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", upstream.acall, None) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, KeyError) for result in results)
+    assert upstream.calls == 1
@@ -0,0 +1,79 @@
+"""
+src/utils/usage.py のテスト（使用量の集計と上限）
+"""
+
+import pytest
+
+from src.utils.exceptions import BudgetExceededError
+from src.utils.usage import (
+    UsageAccountant,
+    agent_scope,
+    current_accountant,
+    current_agent,
+    estimate_cost,
+    estimate_tokens,
+    model_price,
+    track_usage
+)
+
+
+def test_model_price_uses_longest_prefix():
+    assert model_price("gpt-4") == (0.03, 0.06)
+    assert model_price("gpt-4-turbo-2024-04-09") == (0.01, 0.03)
+    assert model_price("gpt-4-0613") == (0.03, 0.06)
+    assert model_price("unknown-model") is None
+
+
+def test_estimate_cost():
+    assert estimate_cost("gpt-4", 1000, 1000) == pytest.approx(0.09)
+    assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("東京") == 2
+
+
+def test_record_aggregates_by_agent_and_model():
+    accountant = UsageAccountant()
+    with track_usage(accountant, agent="CoordinatorAgent"):
+        accountant.record("gpt-3.5-turbo", 100, 20)
+        with agent_scope("WeatherAgent"):
+            accountant.record("gpt-4", 50, 10, estimated=True)
+
+    usage = accountant.to_dict()
+    assert usage["calls"] == 2
+    assert usage["total_tokens"] == 180
+    assert usage["estimated"] is True
+    assert usage["by_agent"]["CoordinatorAgent"]["total_tokens"] == 120
+    assert usage["by_agent"]["WeatherAgent"]["estimated"] is True
+    assert set(usage["by_model"]) == {"gpt-3.5-turbo", "gpt-4"}
+
+
+def test_track_usage_restores_context():
+    accountant = UsageAccountant()
+    assert current_accountant() is None
+    with track_usage(accountant, agent="CoordinatorAgent"):
+        assert current_accountant() is accountant
+        assert current_agent() == "CoordinatorAgent"
+    assert current_accountant() is None
+    assert current_agent() == "unknown"
+
+
+def test_token_budget():
+    accountant = UsageAccountant(token_budget=100)
+    accountant.record("gpt-3.5-turbo", 60, 30)
+    accountant.check_budget()
+    accountant.record("gpt-3.5-turbo", 5, 5)
+    assert accountant.exceeded
+    with pytest.raises(BudgetExceededError):
+        accountant.check_budget()
+
+
+def test_cost_budget():
+    accountant = UsageAccountant(cost_budget=0.01)
+    accountant.record("unknown-model", 10000, 10000)
+    assert not accountant.exceeded
+    accountant.record("gpt-4", 1000, 0)
+    assert accountant.exceeded
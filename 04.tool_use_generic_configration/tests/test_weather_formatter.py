@@ -0,0 +1,25 @@
+"""
+src/formatters/weather_formatter.py のテスト
+"""
+
+import pytest
+
+from src.formatters.weather_formatter import format_weather
+
+SUMMARY = {"city": "Tokyo", "temperature": 21.26, "description": "晴天", "humidity": 40, "wind_speed": 3.0}
+
+
+def test_format_weather_ja():
+    assert format_weather(SUMMARY) == "Tokyoの現在の天気は晴天です。気温は21.3℃、湿度は40%、風速は3.0m/sです。"
+
+
+def test_format_weather_en():
+    summary = dict(SUMMARY, description="clear sky")
+    assert format_weather(summary, locale="en") == (
+        "Current weather in Tokyo: clear sky, 21.3°C, humidity 40%, wind 3.0 m/s."
+    )
+
+
+def test_format_weather_unknown_locale():
+    with pytest.raises(ValueError):
+        format_weather(SUMMARY, locale="fr")
@@ -0,0 +1,92 @@
+"""
+src/tools/weather_refresher.py のテスト（問い合わせ回数の記録と先行更新）
+"""
+
+import asyncio
+
+import pytest
+
+from src.tools import weather_refresher
+from src.tools.weather_refresher import HotCityTracker, WeatherRefresher
+
+
+def test_top_orders_cities_by_count():
+    tracker = HotCityTracker()
+    for _ in range(3):
+        tracker.record("tokyo", "東京")
+    tracker.record("osaka", "大阪")
+    tracker.record("tokyo", "Tokyo")
+    # 都市名は最後の問い合わせの表記を使う
+    assert tracker.top(2) == [("Tokyo", 4.0), ("大阪", 1.0)]
+    assert tracker.top(1) == [("Tokyo", 4.0)]
+
+
+def test_decay_drops_cities_below_one():
+    tracker = HotCityTracker(decay=0.5)
+    for _ in range(4):
+        tracker.record("tokyo", "東京")
+    tracker.record("osaka", "大阪")
+    tracker.decay()
+    assert tracker.top(5) == [("東京", 2.0)]
+    tracker.decay()
+    tracker.decay()
+    assert tracker.top(5) == []
+
+
+def test_least_requested_city_is_evicted():
+    tracker = HotCityTracker(maxsize=2)
+    tracker.record("tokyo", "東京")
+    tracker.record("tokyo", "東京")
+    tracker.record("osaka", "大阪")
+    tracker.record("kyoto", "京都")
+    assert tracker.top(5) == [("東京", 2.0), ("京都", 1.0)]
+
+
+@pytest.fixture
+def prefetch(monkeypatch):
+    calls = []
+
+    async def aprefetch_weather(cities, max_concurrency, refresh_ahead=0):
+        calls.append((list(cities), refresh_ahead))
+        return len(cities) - 1
+
+    monkeypatch.setattr(weather_refresher, "aprefetch_weather", aprefetch_weather)
+    return calls
+
+
+def test_refresh_once_prefetches_top_cities(prefetch):
+    tracker = HotCityTracker()
+    for city, count in [("東京", 3), ("大阪", 2), ("京都", 1)]:
+        for _ in range(count):
+            tracker.record(city, city)
+    refresher = WeatherRefresher(tracker, top_n=2, refresh_ahead=30)
+
+    assert asyncio.run(refresher.refresh_once()) == 1
+    assert prefetch == [(["東京", "大阪"], 30)]
+    # 確認のたびに回数を減衰させる
+    assert tracker.top(5) == [("東京", 1.5), ("大阪", 1.0)]
+    assert refresher.stats()["runs"] == 1
+    assert refresher.stats()["refreshed"] == 1
+
+
+def test_refresh_once_without_hot_cities_does_not_fetch(prefetch):
+    refresher = WeatherRefresher(HotCityTracker())
+    assert asyncio.run(refresher.refresh_once()) == 0
+    assert prefetch == []
+
+
+def test_start_and_stop(prefetch):
+    tracker = HotCityTracker()
+    tracker.record("tokyo", "東京")
+    refresher = WeatherRefresher(tracker, interval=0.01)
+
+    async def run():
+        refresher.start()
+        assert refresher.running
+        await asyncio.sleep(0.05)
+        await refresher.stop()
+
+    asyncio.run(run())
+    assert not refresher.running
+    assert refresher.runs >= 1
+    assert prefetch[0][0] == ["東京"]
@@ -0,0 +1,132 @@
+"""
+src/tools/weather_tools.py のテスト（期限切れの天気情報を返しながら裏で取得し直す）
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from src.tools import weather_tools
+from src.utils import cache as cache_module
+from src.utils.cache import MemoryCache
+from src.utils.http_client import HttpClient
+
+CACHE_KEY = weather_tools._weather_cache_key("Tokyo")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeOpenWeather:
+    """呼び出しのたびに気温を1度上げて返す OpenWeather API"""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.calls += 1
+            temperature = 20 + self.calls
+        # 取得中に次の問い合わせが届くよう、少し時間をかける
+        time.sleep(0.05)
+        return httpx.Response(200, json={
+            "name": "Tokyo",
+            "main": {"temp": temperature, "humidity": 50},
+            "weather": [{"description": "晴天"}],
+            "wind": {"speed": 1.0}
+        })
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def upstream(monkeypatch, clock):
+    upstream = FakeOpenWeather()
+    monkeypatch.setenv("OPENWEATHER_KEY", "test")
+    monkeypatch.setattr(weather_tools, "http_client", HttpClient(transport=httpx.MockTransport(upstream)))
+    monkeypatch.setattr(weather_tools, "weather_cache", MemoryCache(ttl=60, maxsize=10, stale_ttl=600))
+    monkeypatch.setattr(weather_tools, "_revalidations", {})
+    return upstream
+
+
+def _wait_revalidation() -> None:
+    pending = weather_tools._revalidations.get(CACHE_KEY)
+    if pending is not None:
+        pending.result()
+
+
+def test_stale_weather_is_served_while_revalidating(clock, upstream):
+    assert weather_tools._get_weather("東京")["main"]["temp"] == 21
+    clock.advance(61)
+
+    # 期限切れの値をすぐに返し、裏で取得し直した値を次の問い合わせから返す
+    assert weather_tools._get_weather("東京")["main"]["temp"] == 21
+    _wait_revalidation()
+    assert upstream.calls == 2
+    assert weather_tools._get_weather("東京")["main"]["temp"] == 22
+
+
+def test_weather_past_stale_ttl_is_fetched_synchronously(clock, upstream):
+    weather_tools._get_weather("東京")
+    clock.advance(61 + 600)
+    assert weather_tools._get_weather("東京")["main"]["temp"] == 22
+    assert CACHE_KEY not in weather_tools._revalidations
+
+
+def test_burst_of_stale_hits_revalidates_once(clock, upstream):
+    weather_tools._get_weather("東京")
+    clock.advance(61)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.extend(weather_tools._get_weather("Tokyo") for _ in range(5)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _wait_revalidation()
+
+    assert len(results) == 40
+    assert upstream.calls == 2
+
+
+def test_async_burst_of_stale_hits_revalidates_once(clock, upstream):
+    weather_tools._get_weather("東京")
+    clock.advance(61)
+
+    async def burst():
+        results = []
+        for _ in range(4):
+            results += await asyncio.gather(*(weather_tools._aget_weather("Tokyo") for _ in range(10)))
+        await weather_tools._revalidations[CACHE_KEY]
+        return results
+
+    assert len(asyncio.run(burst())) == 40
+    assert upstream.calls == 2
+
+
+def test_queued_revalidation_skips_weather_already_refreshed(clock, upstream):
+    weather_tools._get_weather("東京")
+    clock.advance(61)
+    weather_tools._fetch_weather("Tokyo", CACHE_KEY)
+    weather_tools._revalidate("Tokyo", CACHE_KEY)
+    assert upstream.calls == 2
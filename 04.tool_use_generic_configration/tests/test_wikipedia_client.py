@@ -0,0 +1,64 @@
+"""
+src/tools/wikipedia_client.py のテスト（MediaWiki API の応答を httpx.MockTransport で差し替える）
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src.tools import wikipedia_client
+from src.utils.cache import NullCache
+from src.utils.exceptions import PageNotFoundError
+from src.utils.http_client import HttpClient
+
+# 検索語 → (検索結果, 検索候補)
+SEARCHES = {
+    "Okonomiyaki": (["Okonomiyaki"], None),
+    "Okonomiyak": ([], "Okonomiyaki"),
+    "Nowhere food": ([], None),
+}
+PAGES = {"Okonomiyaki": "Okonomiyaki is a Japanese savory pancake."}
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    params = request.url.params
+    if params.get("list") == "search":
+        titles, suggestion = SEARCHES.get(params["srsearch"], ([], None))
+        query = {"search": [{"ns": 0, "title": title} for title in titles]}
+        if suggestion:
+            query["searchinfo"] = {"suggestion": suggestion}
+        return httpx.Response(200, json={"query": query})
+
+    title = params["titles"]
+    if title not in PAGES:
+        return httpx.Response(200, json={"query": {"pages": {"-1": {"title": title, "missing": ""}}}})
+    page = {"title": title, "extract": PAGES[title], "fullurl": f"https://en.wikipedia.org/wiki/{title}"}
+    return httpx.Response(200, json={"query": {"pages": {"1": page}}})
+
+
+@pytest.fixture(autouse=True)
+def mock_api(monkeypatch):
+    client = HttpClient(transport=httpx.MockTransport(_handler))
+    monkeypatch.setattr(wikipedia_client, "http_client", client)
+    monkeypatch.setattr(wikipedia_client, "search_cache", NullCache())
+    monkeypatch.setattr(wikipedia_client, "page_cache", NullCache())
+
+
+def test_search_retries_with_suggestion():
+    assert wikipedia_client.search("Okonomiyak") == ["Okonomiyaki"]
+    assert asyncio.run(wikipedia_client.asearch("Okonomiyak")) == ["Okonomiyaki"]
+    assert wikipedia_client.search("Nowhere food") == []
+
+
+def test_missing_page_falls_back_to_top_search_result():
+    page = wikipedia_client.page("Okonomiyak")
+    assert page["title"] == "Okonomiyaki"
+    assert asyncio.run(wikipedia_client.apage("Okonomiyak"))["title"] == "Okonomiyaki"
+
+
+def test_missing_page_without_search_result_raises():
+    with pytest.raises(PageNotFoundError):
+        wikipedia_client.page("Nowhere food")
+    with pytest.raises(PageNotFoundError):
+        asyncio.run(wikipedia_client.apage("Nowhere food"))